@@ -0,0 +1,200 @@
+import argparse
+import json
+import logging
+import platform
+import random
+import statistics
+import time
+from datetime import datetime, timezone
+
+import datagen
+from connections import DEFAULT_TARGET, get_connection
+from delete_data import delete_sale, fetch_sales_details, fetch_sales_details_page
+from login import login
+from manage_medicines import fetch_all_medicines
+from purchases import add_purchase
+from sales import add_sale
+
+logger = logging.getLogger(__name__)
+
+# Data sizes the suite can seed before timing; volumes follow datagen.DEFAULT_VOLUMES keys
+SIZES = {
+    'small': {'medicines': 5000, 'customers': 2000, 'sales': 100000, 'purchases': 10000, 'stock_logs': 400000},
+    'medium': {'medicines': 50000, 'customers': 20000, 'sales': 1000000, 'purchases': 50000, 'stock_logs': 4000000},
+    'large': dict(datagen.DEFAULT_VOLUMES),
+}
+
+# Timed calls per operation; full-table reads use HEAVY_ITERATIONS instead
+ITERATIONS = 50
+HEAVY_ITERATIONS = 5
+CART_LINES = 3
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of a list of numbers."""
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    rank = max(1, -(-len(ordered) * pct // 100))
+    return ordered[int(rank) - 1]
+
+def summarize(samples_ms, rows=0, errors=0):
+    """Latency percentiles in ms plus throughput for one operation's timed calls."""
+    seconds = sum(samples_ms) / 1000
+    return {
+        'iterations': len(samples_ms),
+        'errors': errors,
+        'p50_ms': percentile(samples_ms, 50),
+        'p95_ms': percentile(samples_ms, 95),
+        'p99_ms': percentile(samples_ms, 99),
+        'mean_ms': statistics.fmean(samples_ms) if samples_ms else 0.0,
+        'max_ms': max(samples_ms, default=0.0),
+        'rows': rows,
+        'rows_per_sec': rows / seconds if seconds > 0 else 0.0,
+    }
+
+def _time(func, args_list, count_rows):
+    """Call func once per argument tuple; count_rows(result) gives rows handled, or None on error."""
+    samples, rows, errors = [], 0, 0
+    for args in args_list:
+        started = time.perf_counter()
+        result = func(*args)
+        samples.append((time.perf_counter() - started) * 1000)
+        handled = count_rows(result)
+        if handled is None:
+            errors += 1
+        else:
+            rows += handled
+    return summarize(samples, rows, errors)
+
+def _volumes():
+    """Approximate row counts from the planner statistics (exact counts would take longer than the benchmark)."""
+    with get_connection() as (conn, error):
+        if error or not conn:
+            return {}
+        cur = conn.cursor()
+        cur.execute("""
+            SELECT relname, reltuples::bigint FROM pg_class
+            WHERE relkind IN ('r', 'p') AND relname = ANY(%s)
+        """, (list(datagen.DATA_TABLES),))
+        return dict(cur.fetchall())
+
+def _catalog(limit=1000):
+    """
+    Sample of (medicine_id, price) used to build carts, the benchmark cashier's user_id and the
+    newest sale_id. Returns (medicines, user_id, last_sale_id, error).
+    """
+    with get_connection() as (conn, error):
+        if error or not conn:
+            return [], None, 0, error or "No database connection"
+        cur = conn.cursor()
+        cur.execute("SELECT medicine_id, price FROM medicines WHERE quantity > 1000 ORDER BY random() LIMIT %s", (limit,))
+        medicines = cur.fetchall()
+        cur.execute("SELECT user_id FROM users WHERE username = %s", (datagen.BENCH_USERNAME,))
+        row = cur.fetchone()
+        cur.execute("SELECT COALESCE(MAX(sale_id), 0) FROM sales")
+        return medicines, row[0] if row else None, cur.fetchone()[0], None
+
+def _sales_after(sale_id):
+    with get_connection() as (conn, error):
+        if error or not conn:
+            return []
+        cur = conn.cursor()
+        cur.execute("SELECT sale_id FROM sales WHERE sale_id > %s ORDER BY sale_id", (sale_id,))
+        return [row[0] for row in cur.fetchall()]
+
+def run_operations(iterations=ITERATIONS, heavy_iterations=HEAVY_ITERATIONS, rng=None):
+    """Time every hot path once per iteration against the current data. Returns {operation: summary}."""
+    rng = rng or random.Random(42)
+    medicines, user_id, last_sale_id, error = _catalog()
+    if error or not medicines or not user_id:
+        raise RuntimeError(error or "Seed the database first (python datagen.py) so medicines and the benchmark user exist")
+
+    def cart(price_key, total_key):
+        items = []
+        for medicine_id, price in rng.sample(medicines, min(CART_LINES, len(medicines))):
+            price = float(price)
+            items.append({'medicine_id': medicine_id, 'quantity': 1, price_key: price, total_key: price})
+        return items
+
+    ok_rows = lambda rows: lambda result: rows if result[0] else None
+    results = {}
+    results['login'] = _time(login, [(datagen.BENCH_USERNAME, datagen.BENCH_PASSWORD)] * iterations,
+                             lambda result: 1 if result[0] else None)
+    # .uncached measures the query itself rather than the read-through cache
+    results['fetch_all_medicines'] = _time(fetch_all_medicines.uncached, [()] * heavy_iterations,
+                                           lambda result: None if result[1] else len(result[0]))
+    results['fetch_sales_details'] = _time(fetch_sales_details, [()] * heavy_iterations,
+                                           lambda result: None if result[1] else len(result[0]))
+    results['fetch_sales_details_page'] = _time(
+        fetch_sales_details_page, [(None, 200, rng.randint(1, max(last_sale_id, 1))) for _ in range(iterations)],
+        lambda result: None if result[1] else len(result[0]))
+    results['add_sale'] = _time(add_sale, [(None, user_id, cart('price', 'total_price')) for _ in range(iterations)],
+                                ok_rows(CART_LINES))
+    results['add_purchase'] = _time(add_purchase, [(user_id, cart('cost_price', 'total_cost')) for _ in range(iterations)],
+                                    ok_rows(CART_LINES))
+    # Delete the sales this run created, leaving the seeded data as it was
+    results['delete_sale'] = _time(delete_sale, [(sale_id,) for sale_id in _sales_after(last_sale_id)], ok_rows(1))
+    return results
+
+def run(sizes=(), iterations=ITERATIONS, heavy_iterations=HEAVY_ITERATIONS, reseed=False):
+    """
+    Benchmark each named size (seeding it first when reseed is set) or, with no sizes,
+    whatever data the target database holds. Returns the report as a dict.
+    """
+    report = {
+        'generated_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'target': DEFAULT_TARGET,
+        'python': platform.python_version(),
+        'runs': [],
+    }
+    with get_connection() as (conn, error):
+        if error or not conn:
+            raise RuntimeError(error or "No database connection")
+        cur = conn.cursor()
+        cur.execute("SHOW server_version")
+        report['postgres'] = cur.fetchone()[0]
+    for size in sizes or [None]:
+        seeding = None
+        if size and reseed:
+            ok, error = datagen.reset(DEFAULT_TARGET)
+            if error:
+                raise RuntimeError(error)
+            seeding, error = datagen.seed(DEFAULT_TARGET, **SIZES[size])
+            if error:
+                raise RuntimeError(error)
+        logger.info(f"✅ Benchmarking {size or 'current data'}")
+        report['runs'].append({
+            'size': size or 'current',
+            'volumes': _volumes(),
+            'seeding': seeding,
+            'operations': run_operations(iterations, heavy_iterations),
+        })
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Time the hot paths and print JSON results. Uses the database chosen by "
+                    "PHARMACY_DB_TARGET (e.g. PHARMACY_DB_TARGET=test).")
+    parser.add_argument('--sizes', default='', help=f"comma-separated sizes to seed and run: {', '.join(SIZES)}")
+    parser.add_argument('--reseed', action='store_true', help="empty and reseed the database for each size")
+    parser.add_argument('--iterations', type=int, default=ITERATIONS)
+    parser.add_argument('--heavy-iterations', type=int, default=HEAVY_ITERATIONS)
+    parser.add_argument('--output', help="write JSON here instead of stdout")
+    args = parser.parse_args()
+
+    sizes = [size.strip() for size in args.sizes.split(',') if size.strip()]
+    unknown = [size for size in sizes if size not in SIZES]
+    if unknown:
+        parser.error(f"unknown sizes: {', '.join(unknown)}")
+    if sizes and not args.reseed:
+        parser.error("--sizes requires --reseed (without it the current data is benchmarked)")
+    report = run(sizes, args.iterations, args.heavy_iterations, args.reseed)
+    text = json.dumps(report, indent=2, default=str)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+if __name__ == "__main__":
+    main()
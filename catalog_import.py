@@ -0,0 +1,260 @@
+import argparse
+import csv
+import logging
+import time
+from decimal import Decimal, InvalidOperation
+from connections import get_connection
+from logging_setup import timed
+from query_cache import invalidates
+
+logger = logging.getLogger(__name__)
+
+# Rows of each kind listed in a preview
+SAMPLE_ROWS = 20
+
+# medicines.name is varchar(100)
+MAX_NAME_LENGTH = 100
+
+class _CatalogStream:
+    """
+    File-like adapter that feeds catalog rows to COPY as tab-separated text.
+    Rows are validated and consumed lazily, so the catalog is never held in memory.
+    """
+
+    def __init__(self, rows):
+        self._rows = iter(rows)
+        self._buffer = ""
+        self.count = 0
+        self.error = None
+
+    def _format(self, item):
+        line_no = self.count + 1
+        try:
+            name = " ".join(str(item['name']).split())
+            price = Decimal(str(item['price']))
+            quantity = item.get('quantity')
+            quantity = int(quantity) if quantity not in (None, "") else None
+        except KeyError:
+            raise ValueError(f"Invalid catalog row {line_no}: name and price are required")
+        except (TypeError, ValueError, InvalidOperation):
+            raise ValueError(f"Invalid catalog row {line_no}: {item}")
+        if not name or len(name) > MAX_NAME_LENGTH:
+            raise ValueError(f"Invalid name on catalog row {line_no}: names are 1 to {MAX_NAME_LENGTH} characters")
+        if not price.is_finite() or price < 0 or price != price.quantize(Decimal("0.01")):
+            raise ValueError(f"Invalid price for {name} on catalog row {line_no}")
+        if quantity is not None and quantity < 0:
+            raise ValueError(f"Invalid quantity for {name} on catalog row {line_no}")
+        # Whitespace is already collapsed, so only backslashes need escaping for COPY; \N is NULL
+        name = name.replace("\\", "\\\\")
+        quantity = r"\N" if quantity is None else quantity
+        self.count = line_no
+        return f"{line_no}\t{name}\t{price}\t{quantity}\n"
+
+    def read(self, size=-1):
+        while size < 0 or len(self._buffer) < size:
+            item = next(self._rows, None)
+            if item is None:
+                break
+            try:
+                self._buffer += self._format(item)
+            except ValueError as e:
+                # COPY wraps exceptions raised here, so keep the message for the caller
+                self.error = str(e)
+                raise
+        if size < 0:
+            size = len(self._buffer)
+        chunk, self._buffer = self._buffer[:size], self._buffer[size:]
+        return chunk
+
+def _stage(cur, stream):
+    """
+    COPY the catalog into a staging table and classify every row against medicines in one
+    set-based pass. Exact name matches are 'changed' or 'unchanged' by price; otherwise a name
+    that differs from an existing medicine or another row only in case is a 'conflict' (it
+    would create a near-duplicate), as is any repeat of a name within the file; the rest are 'new'.
+    """
+    cur.execute("""
+        CREATE TEMP TABLE catalog_staging (
+            line_no integer NOT NULL,
+            name varchar(100) NOT NULL,
+            price numeric(10, 2) NOT NULL,
+            quantity integer
+        ) ON COMMIT DROP
+    """)
+    cur.copy_expert("COPY catalog_staging (line_no, name, price, quantity) FROM STDIN", stream)
+    cur.execute("""
+        CREATE TEMP TABLE catalog_diff ON COMMIT DROP AS
+        SELECT s.line_no, s.name, s.price, s.quantity, m.medicine_id, m.price AS old_price,
+               CASE
+                   WHEN f.rows > 1 THEN 'conflict'
+                   WHEN m.medicine_id IS NOT NULL THEN CASE WHEN m.price = s.price THEN 'unchanged' ELSE 'changed' END
+                   WHEN c.name IS NOT NULL THEN 'conflict'
+                   ELSE 'new'
+               END AS status,
+               CASE
+                   WHEN f.rows > 1 THEN 'appears ' || f.rows || ' times in the file'
+                   WHEN m.medicine_id IS NULL AND c.name IS NOT NULL THEN 'differs only in case from ' || c.name
+               END AS reason
+        FROM catalog_staging s
+        JOIN (
+            SELECT lower(name) AS folded, COUNT(*) AS rows FROM catalog_staging GROUP BY 1
+        ) f ON f.folded = lower(s.name)
+        LEFT JOIN medicines m ON m.name = s.name
+        LEFT JOIN (
+            SELECT lower(name) AS folded, MIN(name) AS name FROM medicines GROUP BY 1
+        ) c ON c.folded = lower(s.name)
+    """)
+
+def _summary(cur, rows):
+    cur.execute("SELECT status, COUNT(*) FROM catalog_diff GROUP BY status")
+    summary = {'rows': rows, 'new': 0, 'changed': 0, 'unchanged': 0, 'conflict': 0}
+    summary.update(cur.fetchall())
+    cur.execute("SELECT name, price, quantity FROM catalog_diff WHERE status = 'new' ORDER BY line_no LIMIT %s",
+                (SAMPLE_ROWS,))
+    new = cur.fetchall()
+    cur.execute("""
+        SELECT name, old_price, price FROM catalog_diff WHERE status = 'changed'
+        ORDER BY abs(price - old_price) DESC, line_no LIMIT %s
+    """, (SAMPLE_ROWS,))
+    changed = cur.fetchall()
+    cur.execute("SELECT line_no, name, reason FROM catalog_diff WHERE status = 'conflict' ORDER BY line_no LIMIT %s",
+                (SAMPLE_ROWS,))
+    summary['samples'] = {'new': new, 'changed': changed, 'conflict': cur.fetchall()}
+    return summary
+
+def preview_catalog(rows):
+    """
+    Diff a catalog or supplier price list against medicines without changing anything.
+    rows: any iterable of dicts with name and price (and optionally quantity, the opening
+    stock of new medicines); it is streamed into a staging table with COPY, not materialised.
+    Returns (summary, error): summary is {'rows', 'new', 'changed', 'unchanged', 'conflict',
+    'samples': {'new': [(name, price, quantity)], 'changed': [(name, old_price, price)],
+    'conflict': [(row, name, reason)]}}.
+    """
+    stream = _CatalogStream(rows)
+    with get_connection() as (conn, error):
+        if error or not conn:
+            logger.error(f"❌ Failed to preview catalog: {error or 'No connection'}")
+            return None, error or "No database connection"
+        try:
+            cur = conn.cursor()
+            _stage(cur, stream)
+            summary = _summary(cur, stream.count)
+            conn.rollback()
+        except Exception as e:
+            conn.rollback()
+            if stream.error:
+                logger.error(f"❌ {stream.error}")
+                return None, stream.error
+            logger.error(f"❌ Error previewing catalog: {e}")
+            return None, f"Error previewing catalog: {str(e)}"
+    logger.info(f"✅ Previewed catalog: {summary['new']} new, {summary['changed']} changed, "
+                f"{summary['unchanged']} unchanged, {summary['conflict']} conflicting")
+    return summary, None
+
+@invalidates("medicines")
+@timed()
+def import_catalog(rows):
+    """
+    Apply a catalog or supplier price list in one transaction: add the new medicines (logging
+    their opening stock) and update changed prices; conflicting rows are skipped and reported.
+    The diff is recomputed here, so it reflects the catalog at the time of the import rather
+    than at the preview. Returns (report, error): report is the preview_catalog summary plus
+    'seconds' and 'rows_per_sec'.
+    """
+    started = time.perf_counter()
+    stream = _CatalogStream(rows)
+    with get_connection() as (conn, error):
+        if error or not conn:
+            logger.error(f"❌ Failed to import catalog: {error or 'No connection'}")
+            return None, error or "No database connection"
+        try:
+            cur = conn.cursor()
+            _stage(cur, stream)
+            if stream.count == 0:
+                conn.rollback()
+                logger.error("❌ Catalog is empty")
+                return None, "Catalog is empty"
+            # Lock the medicines being repriced in ID order, as checkout does, so a large
+            # import queues behind carts instead of deadlocking with them
+            cur.execute("""
+                SELECT medicine_id FROM medicines
+                WHERE medicine_id IN (SELECT medicine_id FROM catalog_diff WHERE status = 'changed')
+                ORDER BY medicine_id
+                FOR UPDATE
+            """)
+            # A medicine added concurrently under a 'new' name just gets its price updated;
+            # xmax = 0 tells rows this statement inserted from those it updated
+            cur.execute("""
+                WITH upserted AS (
+                    INSERT INTO medicines AS m (name, quantity, price)
+                    SELECT name, COALESCE(quantity, 0), price
+                    FROM catalog_diff
+                    WHERE status IN ('new', 'changed')
+                    ORDER BY line_no
+                    ON CONFLICT (name) DO UPDATE SET price = EXCLUDED.price
+                    WHERE m.price <> EXCLUDED.price
+                    RETURNING m.medicine_id, m.quantity, m.xmax = 0 AS inserted
+                )
+                INSERT INTO stock_logs (medicine_id, change_type, quantity_change)
+                SELECT medicine_id, 'initial', quantity FROM upserted WHERE inserted AND quantity <> 0
+            """)
+            report = _summary(cur, stream.count)
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            if stream.error:
+                logger.error(f"❌ {stream.error}")
+                return None, stream.error
+            logger.error(f"❌ Error importing catalog: {e}")
+            return None, f"Error importing catalog: {str(e)}"
+    seconds = time.perf_counter() - started
+    report['seconds'] = seconds
+    report['rows_per_sec'] = stream.count / seconds if seconds > 0 else float(stream.count)
+    logger.info(f"✅ Imported catalog: {report['new']} new, {report['changed']} repriced, "
+                f"{report['conflict']} conflicting skipped ({stream.count} rows in {seconds:.2f}s, "
+                f"{report['rows_per_sec']:.0f} rows/s)")
+    return report, None
+
+def iter_catalog_csv(path):
+    """Yield catalog rows from a CSV file with name and price (and optionally quantity) columns."""
+    with open(path, newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            yield {key.strip().lower(): (value or "").strip() for key, value in row.items() if key}
+
+def describe(summary):
+    """Human-readable preview of a catalog diff, for the CLI and the manage medicines page."""
+    lines = [f"{summary['rows']} rows: {summary['new']} new, {summary['changed']} price changes, "
+             f"{summary['unchanged']} unchanged, {summary['conflict']} conflicting"]
+    samples = summary['samples']
+    if samples['changed']:
+        lines.append("\nLargest price changes:")
+        lines += [f"  {name}: {old} -> {new}" for name, old, new in samples['changed'][:10]]
+    if samples['new']:
+        lines.append("\nNew medicines:")
+        lines += [f"  {name} at {price}" + (f", {quantity} in stock" if quantity else "")
+                  for name, price, quantity in samples['new'][:10]]
+    if samples['conflict']:
+        lines.append("\nConflicts (skipped):")
+        lines += [f"  row {line_no}: {name} {reason}" for line_no, name, reason in samples['conflict'][:10]]
+    return "\n".join(lines)
+
+def main():
+    parser = argparse.ArgumentParser(description="Import a medicine catalog or supplier price list from CSV")
+    parser.add_argument('command', choices=['preview', 'apply'])
+    parser.add_argument('path', help="CSV with name and price columns, and optionally quantity")
+    args = parser.parse_args()
+
+    if args.command == 'preview':
+        summary, error = preview_catalog(iter_catalog_csv(args.path))
+    else:
+        summary, error = import_catalog(iter_catalog_csv(args.path))
+    if error:
+        print(error)
+        raise SystemExit(1)
+    print(describe(summary))
+    if args.command == 'apply':
+        print(f"\nApplied in {summary['seconds']:.2f}s ({summary['rows_per_sec']:.0f} rows/s)")
+
+if __name__ == "__main__":
+    main()
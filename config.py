@@ -1,20 +1,91 @@
 from configparser import ConfigParser
 import os
+import threading
+import time
 
-def config(filename='database.ini', section='postgresql'):
-    # Create a parser
+# Seconds between mtime checks, so hot paths don't stat the file on every call
+CHECK_INTERVAL = 2.0
+
+# Database targets used for connection routing; 'primary' lives in the legacy [postgresql] section
+DATABASE_SECTIONS = {
+    'primary': 'postgresql',
+    'replica': 'replica',
+    'test': 'test',
+}
+
+# Environment overrides look like PHARMACY_<SECTION>_<KEY>, e.g. PHARMACY_POSTGRESQL_PASSWORD. The section
+# must exist in the file, except the DATABASE_SECTIONS ones, which the environment alone can define
+# (e.g. a replica); see _read_file
+ENV_PREFIX = 'PHARMACY_'
+
+_cache = {}  # filepath -> {'mtime': float, 'checked_at': float, 'sections': dict}
+_cache_lock = threading.Lock()
+
+def _read_file(filepath):
+    """
+    Parse an ini file into {section: {key: value}} and apply environment overrides.
+    Each PHARMACY_ variable goes to the longest known section name that prefixes it, and the
+    rest is the key, so keys may contain underscores. The one restriction: were there both
+    [pool] and [pool_max], PHARMACY_POOL_MAX_SIZE would set size in [pool_max], never max_size in [pool].
+    """
     parser = ConfigParser()
+    parser.read(filepath)
+    sections = {section: dict(parser.items(section)) for section in parser.sections()}
+    # Longest names first, so the first section that matches a variable is the longest one
+    known = sorted(set(sections) | set(DATABASE_SECTIONS.values()), key=len, reverse=True)
+    for name, value in os.environ.items():
+        if not name.startswith(ENV_PREFIX):
+            continue
+        rest = name[len(ENV_PREFIX):]
+        for section in known:
+            prefix = f"{section.upper()}_"
+            if rest.startswith(prefix) and len(rest) > len(prefix):
+                sections.setdefault(section, {})[rest[len(prefix):].lower()] = value
+                break
+    return sections
 
+def load_config(filename='database.ini'):
+    """
+    Return every section of the config file as {section: {key: value}}.
+    The parsed file is cached per process and re-read only when its mtime changes.
+    """
     filepath = os.path.join(os.path.dirname(__file__), filename)
+    now = time.monotonic()
+    with _cache_lock:
+        entry = _cache.get(filepath)
+        if entry and now - entry['checked_at'] < CHECK_INTERVAL:
+            return entry['sections']
+        try:
+            mtime = os.stat(filepath).st_mtime
+        except OSError:
+            mtime = None
+        if not entry or entry['mtime'] != mtime:
+            entry = {'mtime': mtime, 'sections': _read_file(filepath)}
+            _cache[filepath] = entry
+        entry['checked_at'] = now
+        return entry['sections']
 
-    parser.read(filepath)
+def reload_config():
+    """Drop cached files so the next lookup re-reads from disk and the environment."""
+    with _cache_lock:
+        _cache.clear()
 
-    db = {}
-    if parser.has_section(section):
-        params = parser.items(section)
-        for param in params:
-            db[param[0]] = param[1]
-    else:
+def config(filename='database.ini', section='postgresql'):
+    """Return a copy of one config section as a dict. Raises if the section is missing."""
+    sections = load_config(filename)
+    section = DATABASE_SECTIONS.get(section, section)
+    if section not in sections:
         raise Exception(f'Section {section} not found in {filename}')
+    return dict(sections[section])
 
-    return db
+def database_config(target='primary', filename='database.ini'):
+    """
+    Connection parameters for a named target ('primary', 'replica', 'test').
+    A replica that is not configured falls back to the primary.
+    """
+    if target not in DATABASE_SECTIONS:
+        raise ValueError(f"Unknown database target: {target}")
+    sections = load_config(filename)
+    if target == 'replica' and DATABASE_SECTIONS[target] not in sections:
+        target = 'primary'
+    return config(filename, target)
@@ -1,60 +1,285 @@
+import atexit
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
 import psycopg2
-from config import config
+import psycopg2.extensions
+from config import config, database_config
+from logging_setup import setup_logging
+from sql_tracing import TracingConnection, tracing_settings
 import logging
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(levelname)s - %(message)s",
-    handlers=[
-        logging.FileHandler("pharmacy_app.log"),
-        logging.StreamHandler()
-    ]
-)
+# Every entry point imports this module, so configure logging here (see [logging] in database.ini)
+setup_logging()
 logger = logging.getLogger(__name__)
 
-def create_connection():
+# Target used when callers don't name one; PHARMACY_DB_TARGET=test points the app at the test database
+DEFAULT_TARGET = os.environ.get('PHARMACY_DB_TARGET', 'primary')
+
+# Defaults used when database.ini has no [pool] section
+POOL_DEFAULTS = {
+    'min_size': 1,
+    'max_size': 5,
+    'timeout': 10.0,
+    'max_age': 1800.0,
+    'health_check_interval': 30.0,
+}
+
+def create_connection(target=None):
     """
     Establishes a connection to the PostgreSQL database using settings from config.
+    target selects the database section ('primary', 'replica' or 'test').
     Returns a tuple (conn, error): conn is the connection object or None, error is a string or None.
     Callers are responsible for closing the connection using conn.close().
+    Application code should use get_connection() instead, which reuses pooled connections.
     """
     conn = None
     error = None
     try:
-        params = config()
+        params = database_config(target or DEFAULT_TARGET)
         if not params:
             raise ValueError("Configuration is empty or invalid")
-        conn = psycopg2.connect(**params)
+        if tracing_settings()['enabled']:
+            # Opt-in statement tracing: slow statements, N+1 patterns, per-transaction summaries
+            conn = psycopg2.connect(**params, connection_factory=TracingConnection)
+        else:
+            conn = psycopg2.connect(**params)
         logger.info("✅ Connected to the database successfully")
     except (psycopg2.Error, ValueError, Exception) as e:
         error = f"Database connection failed: {str(e)}"
         logger.error(f"❌ {error}")
     return conn, error
 
-def get_user_details(username):
+class ConnectionPool:
+    """
+    Thread-safe pool of database connections.
+    connect: callable returning (conn, error), normally create_connection.
+    min_size: connections opened when the pool is created.
+    max_size: upper bound on open connections (idle + checked out).
+    timeout: seconds checkout() waits for a free connection before giving up.
+    max_age: seconds after which a connection is closed instead of reused.
+    health_check_interval: connections idle longer than this are pinged before reuse.
+    """
+
+    def __init__(self, connect, min_size=1, max_size=5, timeout=10.0, max_age=1800.0, health_check_interval=30.0):
+        if max_size < 1 or min_size < 0 or min_size > max_size:
+            raise ValueError(f"Invalid pool size: min_size={min_size}, max_size={max_size}")
+        self._connect = connect
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_age = max_age
+        self.health_check_interval = health_check_interval
+        self._cond = threading.Condition()
+        self._idle = deque()  # (conn, created_at, returned_at), most recently returned last
+        self._created_at = {}  # conn -> created_at for checked-out connections
+        self._size = 0
+        self._closed = False
+        self._stats = {
+            'checkouts': 0,
+            'waits': 0,
+            'wait_time': 0.0,
+            'exhausted': 0,
+            'created': 0,
+            'discarded': 0,
+            'health_check_failures': 0,
+            'connect_errors': 0,
+        }
+        for _ in range(min_size):
+            conn, error = self._open()
+            if error:
+                break
+            now = time.monotonic()
+            with self._cond:
+                self._size += 1
+                self._idle.append((conn, now, now))
+
+    def _open(self):
+        conn, error = self._connect()
+        with self._cond:
+            if error or not conn:
+                self._stats['connect_errors'] += 1
+            else:
+                self._stats['created'] += 1
+        return conn, error or (None if conn else "No connection")
+
+    def _healthy(self, conn, created_at, returned_at):
+        """Cheap checks on every borrow; a round trip only for long-idle connections."""
+        now = time.monotonic()
+        if conn.closed or now - created_at > self.max_age:
+            return False
+        if now - returned_at > self.health_check_interval:
+            try:
+                cur = conn.cursor()
+                cur.execute("SELECT 1")
+                cur.close()
+                conn.rollback()
+            except psycopg2.Error as e:
+                logger.warning(f"❌ Pooled connection failed health check: {e}")
+                with self._cond:
+                    self._stats['health_check_failures'] += 1
+                return False
+        return True
+
+    def _discard(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+        with self._cond:
+            self._size -= 1
+            self._stats['discarded'] += 1
+            self._cond.notify()
+
+    def checkout(self):
+        """Borrow a connection. Returns (conn, error)."""
+        deadline = time.monotonic() + self.timeout
+        with self._cond:
+            self._stats['checkouts'] += 1
+        waited = False
+        wait_started = None
+        while True:
+            entry = None
+            with self._cond:
+                while True:
+                    if self._closed:
+                        return None, "Connection pool is closed"
+                    if self._idle:
+                        entry = self._idle.pop()
+                        break
+                    if self._size < self.max_size:
+                        self._size += 1
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._stats['exhausted'] += 1
+                        if wait_started is not None:
+                            self._stats['wait_time'] += time.monotonic() - wait_started
+                        logger.error(f"❌ Connection pool exhausted after {self.timeout}s ({self.max_size} connections in use)")
+                        return None, f"Connection pool exhausted: all {self.max_size} connections are busy"
+                    if not waited:
+                        waited = True
+                        wait_started = time.monotonic()
+                        self._stats['waits'] += 1
+                    self._cond.wait(remaining)
+                if wait_started is not None:
+                    self._stats['wait_time'] += time.monotonic() - wait_started
+                    wait_started = None
+
+            if entry is None:
+                conn, error = self._open()
+                if error:
+                    with self._cond:
+                        self._size -= 1
+                        self._cond.notify()
+                    return None, error
+                created_at = time.monotonic()
+            else:
+                conn, created_at, returned_at = entry
+                if not self._healthy(conn, created_at, returned_at):
+                    self._discard(conn)
+                    continue
+            with self._cond:
+                self._created_at[conn] = created_at
+            return conn, None
+
+    def checkin(self, conn, discard=False):
+        """Return a borrowed connection, rolling back any transaction left open."""
+        with self._cond:
+            created_at = self._created_at.pop(conn, None)
+        if created_at is None:
+            logger.warning("❌ Attempted to return a connection that is not checked out from this pool")
+            return
+        if not discard and not conn.closed:
+            if conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                try:
+                    conn.rollback()
+                except psycopg2.Error:
+                    discard = True
+        if discard or conn.closed or self._closed or time.monotonic() - created_at > self.max_age:
+            self._discard(conn)
+            return
+        with self._cond:
+            self._idle.append((conn, created_at, time.monotonic()))
+            self._cond.notify()
+
+    def close(self):
+        """Close idle connections; checked-out ones are closed when returned."""
+        with self._cond:
+            self._closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+            self._cond.notify_all()
+        for conn, _, _ in idle:
+            self._discard(conn)
+
+    def stats(self):
+        """Snapshot of pool counters and current occupancy."""
+        with self._cond:
+            stats = dict(self._stats)
+            stats['size'] = self._size
+            stats['idle'] = len(self._idle)
+            stats['in_use'] = self._size - len(self._idle)
+            stats['max_size'] = self.max_size
+        return stats
+
+_pools = {}
+_pool_lock = threading.Lock()
+
+def _pool_settings():
+    """Read the optional [pool] section of database.ini, falling back to POOL_DEFAULTS."""
+    settings = dict(POOL_DEFAULTS)
+    try:
+        params = config(section='pool')
+    except Exception:
+        params = {}
+    for key, default in POOL_DEFAULTS.items():
+        if key in params:
+            settings[key] = type(default)(params[key])
+    return settings
+
+def get_pool(target=None):
+    """Return the process-wide pool for a database target, creating it on first use."""
+    target = target or DEFAULT_TARGET
+    pool = _pools.get(target)
+    if pool is None:
+        with _pool_lock:
+            pool = _pools.get(target)
+            if pool is None:
+                settings = _pool_settings()
+                pool = ConnectionPool(lambda: create_connection(target), **settings)
+                _pools[target] = pool
+                logger.info(f"✅ Connection pool for {target} ready (min {settings['min_size']}, max {settings['max_size']})")
+    return pool
+
+@contextmanager
+def get_connection(target=None):
     """
-    Fetch user details (user_id, username, role_name) for a given username.
-    Returns a tuple (user_id, username, role_name) or None if not found or on error.
+    Borrow a pooled connection for the duration of a with-block.
+    Yields (conn, error) like create_connection(); the connection is returned to the
+    pool on exit and any uncommitted transaction is rolled back.
     """
-    conn, error = create_connection()
-    if error or not conn:
-        logger.error(f"❌ Failed to fetch user details: {error or 'No connection'}")
-        return None
+    pool = get_pool(target)
+    conn, error = pool.checkout()
     try:
-        cur = conn.cursor()
-        cur.execute(
-            "SELECT user_id, username, role_name FROM users JOIN roles ON users.role_id = roles.role_id WHERE username = %s",
-            (username,)
-        )
-        result = cur.fetchone()
-        conn.close()
-        if result:
-            logger.info(f"✅ Fetched user details for {username}")
-            return result
-        logger.warning(f"❌ No user found for username {username}")
-        return None
-    except Exception as e:
-        logger.error(f"❌ Error fetching user details: {e}")
-        conn.close()
-        return None
\ No newline at end of file
+        yield conn, error
+    finally:
+        if conn:
+            pool.checkin(conn)
+
+def pool_stats(target=None):
+    """Counters for a target's pool, or an empty dict before first use."""
+    pool = _pools.get(target or DEFAULT_TARGET)
+    return pool.stats() if pool is not None else {}
+
+def close_pool():
+    """Close every pool (registered to run at exit)."""
+    with _pool_lock:
+        for pool in _pools.values():
+            pool.close()
+        _pools.clear()
+
+atexit.register(close_pool)
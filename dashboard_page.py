@@ -1,23 +1,98 @@
+import importlib
+import logging
+import sys
+import time
 import tkinter as tk
 from tkinter import messagebox
-from connections import get_user_details
-from manage_users_page import show_manage_users
-from manage_medicines_page import show_manage_medicines
-from sales_page import show_sales_page
 
-from delete_data_page import show_delete_data_page  # Add import
+logger = logging.getLogger(__name__)
 
-def show_dashboard(username, login_callback=None):
+# Dashboard buttons. A page's module, and the data modules it pulls in, are imported on its
+# first click, so a cashier's terminal never loads the owner pages. Each button shows only
+# when the session has the page's permission (session.ROLE_PERMISSIONS).
+PAGES = [
+    {"text": "Sales", "module": "sales_page", "function": "show_sales_page", "permission": "sales"},
+    {"text": "Manage Medicines", "module": "manage_medicines_page", "function": "show_manage_medicines", "permission": "manage_medicines"},
+    {"text": "Delete Data", "module": "delete_data_page", "function": "show_delete_data_page", "permission": "delete_data"},
+    {"text": "Manage Users", "module": "manage_users_page", "function": "show_manage_users", "permission": "manage_users"},
+    {"text": "Export Data", "module": "exports_page", "function": "show_exports_page", "permission": "reports"},
+]
+
+def open_page(page, session):
+    """Import the page's module on first use, then open the page."""
+    try:
+        started = time.perf_counter()
+        loaded = page["module"] in sys.modules
+        show = getattr(importlib.import_module(page["module"]), page["function"])
+        if not loaded:
+            logger.info(f"✅ Loaded {page['module']} in {(time.perf_counter() - started) * 1000:.0f} ms")
+    except Exception as e:
+        messagebox.showerror("Error", f"Could not open {page['text']}: {str(e)}")
+        logger.error(f"❌ Failed to load {page['module']}: {e}", exc_info=True)
+        return
+    show(session)
+
+def show_kpi_panel(parent):
+    """
+    Today's figures, refreshed in the background every few seconds ([dashboard] in database.ini).
+    Returns a function that stops the refreshes; call it before destroying the window.
+    """
+    # Only owners see the panel, so only they import the KPI code
+    from db_executor import TaskRunner
+    from kpis import KpiTracker, dashboard_settings
+
+    settings = dashboard_settings()
+    tracker = KpiTracker(settings['low_stock_threshold'], settings['top_sellers'])
+    runner = TaskRunner(parent)
+    state = {'after_id': None}
+
+    panel = tk.Frame(parent, bg="#81f77c", bd=2, relief="flat")
+    panel.pack(pady=10)
+    figures = {}
+    for column, (key, title) in enumerate([
+        ("revenue", "Today's Revenue"),
+        ("sales", "Sales Today"),
+        ("low_stock", f"Low Stock (≤ {settings['low_stock_threshold']})"),
+        ("top_sellers", "Top Sellers Today"),
+    ]):
+        tk.Label(panel, text=title, font=("Helvetica", 14, "bold"), bg="#81f77c", fg="#333").grid(row=0, column=column, padx=30, pady=(10, 0))
+        figures[key] = tk.Label(panel, text="…", font=("Helvetica", 20 if key != "top_sellers" else 12),
+                                bg="#81f77c", fg="#333", justify="left")
+        figures[key].grid(row=1, column=column, padx=30, pady=(0, 10), sticky="n")
+
+    def show_kpis(result):
+        kpis, error = result
+        if error:
+            figures["revenue"].config(text="—")
+            figures["top_sellers"].config(text=error, fg="red", wraplength=300)
+            return
+        figures["revenue"].config(text=f"{kpis['revenue']:,.2f}")
+        figures["sales"].config(text=str(kpis['sales']))
+        figures["low_stock"].config(text=str(kpis['low_stock']), fg="red" if kpis['low_stock'] else "#333")
+        figures["top_sellers"].config(fg="#333", text="\n".join(
+            f"{name} × {quantity}" for _, name, quantity in kpis['top_sellers']) or "No sales yet")
+
+    def refresh():
+        # Coalesced: a refresh still running when the next is due simply runs once more
+        runner.submit(tracker.refresh, callback=show_kpis, key="kpis")
+        state['after_id'] = parent.after(int(settings['refresh_seconds'] * 1000), refresh)
+
+    def stop():
+        if state['after_id'] is not None:
+            parent.after_cancel(state['after_id'])
+            state['after_id'] = None
+        runner.close()
+
+    refresh()
+    return stop
+
+def show_dashboard(session, login_callback=None):
     """
     Display the dashboard with role-based buttons.
+    session: Session returned by login.login().
     login_callback: Function to call on logout (e.g., show login page).
     """
-    user_data = get_user_details(username)
-    if not user_data:
-        messagebox.showerror("Error", "Failed to fetch user details.")
-        return
-
-    user_id, username, role = user_data
+    username, role = session.username, session.role
 
     # Main Dashboard Window
     dashboard = tk.Tk()
@@ -35,25 +110,20 @@ def show_dashboard(username, login_callback=None):
     )
     welcome_label.pack(pady=20)
 
+    # Live figures for owners
+    stop_kpis = show_kpi_panel(dashboard) if session.can("reports") else (lambda: None)
+
     # Button Frame for centering
     button_frame = tk.Frame(dashboard, bg="#dafad9")
     button_frame.pack(pady=20)
 
     # Button Configurations
     buttons = [
-        
-        {"text": "Sales", "command": lambda: show_sales_page(username), "width": 30},
-       
+        {"text": page["text"], "command": lambda page=page: open_page(page, session), "width": 30}
+        for page in PAGES
+        if session.can(page["permission"])
     ]
 
-    # Owner-specific buttons
-    if role.lower() == 'owner':
-        buttons.extend([
-            {"text": "Manage Medicines", "command": lambda: show_manage_medicines(username), "width": 30},
-            {"text": "Delete Data", "command": lambda: show_delete_data_page(username), "width": 30},  # Updated
-            {"text": "Manage Users", "command": lambda: show_manage_users(username), "width": 30},
-        ])
-
     # Create Buttons
     for btn in buttons:
         tk.Button(
@@ -71,13 +141,14 @@ def show_dashboard(username, login_callback=None):
         button_frame,
         text="Logout",
         width=20,
-        command=lambda: logout(dashboard, login_callback),
+        command=lambda: (stop_kpis(), logout(dashboard, login_callback)),
         bg="red",
         fg="white",
         font=("Helvetica", 20, "bold"),
         relief="flat"
     ).pack(pady=30)
 
+    dashboard.protocol("WM_DELETE_WINDOW", lambda: (stop_kpis(), dashboard.destroy()))
     dashboard.mainloop()
 
 def logout(dashboard, login_callback):
@@ -87,4 +158,4 @@ def logout(dashboard, login_callback):
         login_callback()
 
 # Example usage (replace with login page call)
-#show_dashboard("admin", lambda: print("Show login page"))
\ No newline at end of file
+#session, error = login("admin", "admin"); show_dashboard(session, lambda: print("Show login page"))
\ No newline at end of file
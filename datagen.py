@@ -0,0 +1,253 @@
+import argparse
+import logging
+import time
+from datetime import date, timedelta
+from connections import get_connection
+from passwords import hash_password
+from stock_partitions import ensure_partitions
+
+logger = logging.getLogger(__name__)
+
+# Default volumes; override any of them with the matching command-line option
+DEFAULT_VOLUMES = {
+    'medicines': 50000,
+    'customers': 20000,
+    'sales': 5000000,
+    'purchases': 200000,
+    'stock_logs': 20000000,
+}
+
+# Rows generated per statement; each batch commits, so progress survives an interrupt
+BATCH_SIZE = 500000
+
+# Days of history the generated sales, purchases and stock movements are spread over
+HISTORY_DAYS = 730
+
+# Account the benchmarks log in with
+BENCH_USERNAME = 'bench_cashier'
+BENCH_PASSWORD = 'bench'
+
+# Tables emptied by reset(); users and roles are kept
+DATA_TABLES = ('sales_daily', 'sales_daily_medicines', 'sales_details', 'sales', 'purchase_details', 'purchases',
+               'stock_logs', 'medicines', 'customers')
+
+def _batches(total, size=BATCH_SIZE):
+    """(first, last) 1-based bounds covering 1..total."""
+    for start in range(1, total + 1, size):
+        yield start, min(start + size - 1, total)
+
+def _reserve_ids(cur, table, column, count):
+    """
+    Reserve count consecutive ids from a serial column and return the one before the first,
+    so generated rows can use explicit ids base + g and their children can refer to them.
+    """
+    cur.execute(f"LOCK TABLE {table} IN SHARE ROW EXCLUSIVE MODE")
+    cur.execute(f"SELECT COALESCE(MAX({column}), 0) FROM {table}")
+    base = cur.fetchone()[0]
+    cur.execute("SELECT setval(pg_get_serial_sequence(%s, %s), %s)", (table, column, base + count))
+    return base
+
+def _ensure_bench_user(cur):
+    """Create (or reset the password of) the cashier account the benchmarks log in with."""
+    cur.execute("INSERT INTO roles (role_name) VALUES ('cashier') ON CONFLICT (role_name) DO NOTHING")
+    cur.execute("""
+        INSERT INTO users (username, password, role_id)
+        SELECT %s, %s, role_id FROM roles WHERE role_name = 'cashier'
+        ON CONFLICT (username) DO UPDATE SET password = EXCLUDED.password
+        RETURNING user_id
+    """, (BENCH_USERNAME, hash_password(BENCH_PASSWORD)))
+    return cur.fetchone()[0]
+
+def reset(target='test'):
+    """Empty the data tables (not users or roles). Refuses to touch the primary database."""
+    if target == 'primary':
+        return False, "Refusing to reset the primary database"
+    with get_connection(target) as (conn, error):
+        if error or not conn:
+            return False, error or "No database connection"
+        try:
+            cur = conn.cursor()
+            cur.execute(f"TRUNCATE {', '.join(DATA_TABLES)} RESTART IDENTITY CASCADE")
+            conn.commit()
+            logger.info(f"✅ Emptied {', '.join(DATA_TABLES)}")
+            return True, None
+        except Exception as e:
+            conn.rollback()
+            logger.error(f"❌ Error resetting benchmark data: {e}")
+            return False, f"Error resetting benchmark data: {str(e)}"
+
+def seed(target='test', **volumes):
+    """
+    Append synthetic data to a database entirely on the server with generate_series, so
+    millions of rows load at bulk-insert speed without leaving PostgreSQL.
+    volumes: counts per table (see DEFAULT_VOLUMES); new rows are added to existing ones.
+    Medicine popularity is uniform here; loadgen.py models skewed demand.
+    Returns (report, error): report maps each table to {'rows', 'seconds', 'rows_per_sec'}.
+    """
+    volumes = {**DEFAULT_VOLUMES, **{k: v for k, v in volumes.items() if v is not None}}
+    report = {}
+    with get_connection(target) as (conn, error):
+        if error or not conn:
+            logger.error(f"❌ Failed to seed: {error or 'No connection'}")
+            return None, error or "No database connection"
+        fast = False
+        try:
+            cur = conn.cursor()
+            run = int(time.time())
+
+            def timed(table, rows, statements):
+                started = time.perf_counter()
+                for first, last in _batches(rows):
+                    for sql, params in statements(first, last):
+                        cur.execute(sql, params)
+                    conn.commit()
+                seconds = time.perf_counter() - started
+                report[table] = {'rows': rows, 'seconds': seconds,
+                                 'rows_per_sec': rows / seconds if seconds > 0 else float(rows)}
+                logger.info(f"✅ Seeded {rows} {table} in {seconds:.1f}s")
+
+            bench_user = _ensure_bench_user(cur)
+            conn.commit()
+            # Generated rows only reference existing parents, so skip the per-row foreign key
+            # triggers where allowed (superusers); this roughly triples insert speed
+            try:
+                cur.execute("SET session_replication_role = replica")
+                conn.commit()
+                fast = True
+            except Exception:
+                conn.rollback()
+                fast = False
+
+            timed('medicines', volumes['medicines'], lambda first, last: [("""
+                INSERT INTO medicines (name, quantity, price)
+                SELECT format('Medicine %%s-%%s', %(run)s, g),
+                       100000 + (g %% 5000),
+                       round((1 + (g * 7919 %% 20000) / 100.0)::numeric, 2)
+                FROM generate_series(%(first)s, %(last)s) g
+            """, {'run': run, 'first': first, 'last': last})])
+
+            timed('customers', volumes['customers'], lambda first, last: [("""
+                INSERT INTO customers (name)
+                SELECT format('Customer %%s', g) FROM generate_series(%(first)s, %(last)s) g
+            """, {'first': first, 'last': last})])
+
+            # Dense 0-based lookup tables, so generated rows pick parents with n = expr % count
+            counts = {}
+            for table, source in (('medicines', "SELECT medicine_id, price FROM medicines ORDER BY medicine_id"),
+                                  ('customers', "SELECT customer_id FROM customers ORDER BY customer_id"),
+                                  ('users', "SELECT user_id FROM users ORDER BY user_id")):
+                cur.execute(f"DROP TABLE IF EXISTS seed_{table}")
+                cur.execute(f"CREATE TEMP TABLE seed_{table} AS SELECT row_number() OVER () - 1 AS n, s.* FROM ({source}) s")
+                counts[table] = cur.rowcount
+                cur.execute(f"ALTER TABLE seed_{table} ADD PRIMARY KEY (n)")
+                cur.execute(f"ANALYZE seed_{table}")
+            conn.commit()
+            if not counts['medicines']:
+                return None, "Seeding sales needs at least one medicine"
+            common = {'medicines': counts['medicines'], 'customers': max(counts['customers'], 1),
+                      'users': counts['users'], 'days': HISTORY_DAYS}
+
+            # Each sale has 1-4 distinct medicines: consecutive offsets k never collide modulo
+            # the catalog size as long as there are no more lines than medicines
+            line = """
+                CROSS JOIN LATERAL generate_series(1, 1 + g %% LEAST(4, %(medicines)s)) k
+                JOIN seed_medicines m ON m.n = (g * 7919 + k) %% %(medicines)s
+            """
+            base = _reserve_ids(cur, 'sales', 'sale_id', volumes['sales'])
+            conn.commit()
+            timed('sales', volumes['sales'], lambda first, last: [(f"""
+                INSERT INTO sales (sale_id, customer_id, user_id, total_amount, sale_date)
+                SELECT %(base)s + g, c.customer_id, u.user_id,
+                       SUM((1 + (g + k) %% 5) * m.price),
+                       now() - make_interval(secs => (g * 7919 %% (%(days)s * 86400)))
+                FROM generate_series(%(first)s::bigint, %(last)s) g
+                {line}
+                LEFT JOIN seed_customers c ON c.n = g %% %(customers)s
+                JOIN seed_users u ON u.n = g %% %(users)s
+                GROUP BY g, c.customer_id, u.user_id
+            """, {**common, 'base': base, 'first': first, 'last': last}), (f"""
+                INSERT INTO sales_details (sale_id, medicine_id, quantity, selling_price)
+                SELECT %(base)s + g, m.medicine_id, 1 + (g + k) %% 5, m.price
+                FROM generate_series(%(first)s::bigint, %(last)s) g
+                {line}
+            """, {**common, 'base': base, 'first': first, 'last': last})] + (
+                # Triggers are off in replica mode, so roll the batch up here instead
+                [("SELECT sales_daily_backfill(%s, %s)", (base + first, base + last))] if fast else []))
+
+            base = _reserve_ids(cur, 'purchases', 'purchase_id', volumes['purchases'])
+            conn.commit()
+            timed('purchases', volumes['purchases'], lambda first, last: [(f"""
+                INSERT INTO purchases (purchase_id, user_id, total_amount, purchase_date)
+                SELECT %(base)s + g, u.user_id,
+                       SUM((1 + (g + k) %% 5) * 10 * round(m.price * 0.7, 2)),
+                       now() - make_interval(secs => (g * 104729 %% (%(days)s * 86400)))
+                FROM generate_series(%(first)s::bigint, %(last)s) g
+                {line}
+                JOIN seed_users u ON u.n = g %% %(users)s
+                GROUP BY g, u.user_id
+            """, {**common, 'base': base, 'first': first, 'last': last}), (f"""
+                INSERT INTO purchase_details (purchase_id, medicine_id, quantity, cost_price)
+                SELECT %(base)s + g, m.medicine_id, (1 + (g + k) %% 5) * 10, round(m.price * 0.7, 2)
+                FROM generate_series(%(first)s::bigint, %(last)s) g
+                {line}
+            """, {**common, 'base': base, 'first': first, 'last': last})])
+
+            # Monthly partitions for the whole window, so no rows land in the default partition
+            created, error = ensure_partitions(since=date.today() - timedelta(days=HISTORY_DAYS))
+            if error:
+                return report, error
+            # Oldest first, spread evenly over the history window
+            timed('stock_logs', volumes['stock_logs'], lambda first, last: [("""
+                INSERT INTO stock_logs (medicine_id, change_type, quantity_change, created_at)
+                SELECT m.medicine_id,
+                       (ARRAY['sale', 'sale', 'sale', 'purchase', 'sale_deletion']::stock_change_type[])[1 + g %% 5],
+                       CASE WHEN g %% 5 < 3 THEN -(1 + g %% 5) ELSE 1 + g %% 50 END,
+                       now() - make_interval(secs => (%(days)s * 86400.0) * (%(total)s - g) / GREATEST(%(total)s, 1))
+                FROM generate_series(%(first)s::bigint, %(last)s) g
+                JOIN seed_medicines m ON m.n = (g * 7919) %% %(medicines)s
+            """, {**common, 'first': first, 'last': last, 'total': volumes['stock_logs']})])
+
+            for table in ('medicines', 'customers', 'users'):
+                cur.execute(f"DROP TABLE seed_{table}")
+            cur.execute("ANALYZE")
+            conn.commit()
+            report['bench_user_id'] = bench_user
+            return report, None
+        except Exception as e:
+            conn.rollback()
+            logger.error(f"❌ Error seeding benchmark data: {e}")
+            return report or None, f"Error seeding benchmark data: {str(e)}"
+        finally:
+            # The connection goes back to the pool: on every exit, turn triggers and foreign
+            # keys back on, or close it so the pool discards it
+            if fast:
+                try:
+                    conn.rollback()
+                    conn.cursor().execute("RESET session_replication_role")
+                    conn.commit()
+                except Exception:
+                    conn.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Seed a database with synthetic pharmacy data")
+    parser.add_argument('--target', default='test', help="database target from database.ini (default: test)")
+    parser.add_argument('--reset', action='store_true', help="empty the data tables first")
+    for table, count in DEFAULT_VOLUMES.items():
+        parser.add_argument(f'--{table.replace("_", "-")}', type=int, dest=table, help=f"rows to add (default {count})")
+    args = parser.parse_args()
+
+    if args.reset:
+        ok, error = reset(args.target)
+        if error:
+            print(error)
+            raise SystemExit(1)
+    report, error = seed(args.target, **{table: getattr(args, table) for table in DEFAULT_VOLUMES})
+    for table, stats in (report or {}).items():
+        if isinstance(stats, dict):
+            print(f"{table:<12} {stats['rows']:>10} rows  {stats['seconds']:7.1f}s  {stats['rows_per_sec']:>10.0f} rows/s")
+    if error:
+        print(error)
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+import atexit
+import itertools
+import logging
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from connections import get_pool
+
+logger = logging.getLogger(__name__)
+
+# How often a window checks for finished background calls while any are in flight
+POLL_INTERVAL_MS = 50
+
+_executor = None
+_executor_lock = threading.Lock()
+
+def get_executor():
+    """
+    Return the process-wide worker pool for database calls, creating it on first use.
+    It has as many workers as the connection pool has connections, so a busy UI never
+    queues more concurrent calls than there are connections to serve them.
+    """
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                workers = get_pool().max_size
+                _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="db")
+                logger.info(f"✅ Background database executor ready ({workers} workers)")
+    return _executor
+
+def shutdown_executor():
+    """Stop accepting work and drop queued calls (registered to run at exit)."""
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+
+atexit.register(shutdown_executor)
+
+def busy_indicator(window, label, text="⏳ Working..."):
+    """Return an on_busy callback that shows text in label and a wait cursor on window."""
+    def on_busy(busy):
+        try:
+            label.config(text=text if busy else "")
+            window.config(cursor="watch" if busy else "")
+        except Exception:
+            pass  # The window is being destroyed
+    return on_busy
+
+class TaskRunner:
+    """
+    Runs data-layer calls for one Tk window on the shared executor and delivers their
+    results back on the Tk thread (Tk widgets must only be touched from that thread).
+    Results are handed over through a queue that the window polls with after() while
+    calls are in flight.
+    on_busy: optional callable(busy) invoked when the window goes from idle to busy and back.
+    """
+
+    def __init__(self, widget, on_busy=None, poll_ms=POLL_INTERVAL_MS):
+        self.widget = widget
+        self.on_busy = on_busy
+        self.poll_ms = poll_ms
+        self._results = queue.Queue()
+        self._tokens = itertools.count(1)
+        self._tasks = {}  # token -> (key, future, callback, on_error)
+        self._inflight = {}  # key -> token of the running call
+        self._rerun = {}  # key -> latest (func, args, kwargs, callback, on_error) requested meanwhile
+        self._poll_id = None
+        self._closed = False
+
+    def submit(self, func, *args, callback=None, on_error=None, key=None, coalesce=True, **kwargs):
+        """
+        Run func(*args, **kwargs) in the background. callback(result) runs on the Tk thread
+        with func's return value; on_error(exception) runs if func raised (by default the
+        exception is logged).
+        key: identifies repeatable work such as 'refresh'. While a call with the same key is
+        in flight, another submit either schedules one rerun with the latest arguments once
+        it finishes (coalesce=True, for reads) or is ignored (coalesce=False, for writes that
+        must not be sent twice).
+        Returns True if the call was started or scheduled, False if it was ignored.
+        """
+        if self._closed:
+            return False
+        if key is not None and key in self._inflight:
+            if not coalesce:
+                logger.info(f"✅ Ignored repeated {key} request while one is in flight")
+                return False
+            self._rerun[key] = (func, args, kwargs, callback, on_error)
+            return True
+        self._start(key, func, args, kwargs, callback, on_error)
+        return True
+
+    def _start(self, key, func, args, kwargs, callback, on_error):
+        token = next(self._tokens)
+        was_idle = not self._tasks
+        results = self._results
+
+        def run():
+            try:
+                results.put((token, func(*args, **kwargs), None))
+            except BaseException as e:
+                results.put((token, None, e))
+
+        try:
+            future = get_executor().submit(run)
+        except RuntimeError as e:  # Executor already shut down (application exiting)
+            logger.error(f"❌ Could not start background call: {e}")
+            return
+        self._tasks[token] = (key, future, callback, on_error)
+        if key is not None:
+            self._inflight[key] = token
+        if was_idle:
+            self._set_busy(True)
+        if self._poll_id is None:
+            self._poll_id = self.widget.after(self.poll_ms, self._poll)
+
+    def _poll(self):
+        self._poll_id = None
+        if self._closed:
+            return
+        while True:
+            try:
+                token, result, exc = self._results.get_nowait()
+            except queue.Empty:
+                break
+            self._finish(token, result, exc)
+            if self._closed:  # A callback closed the window
+                return
+        if self._tasks:
+            if self._poll_id is None:  # A rerun started by a callback may already have scheduled one
+                self._poll_id = self.widget.after(self.poll_ms, self._poll)
+        else:
+            self._set_busy(False)
+
+    def _finish(self, token, result, exc):
+        key, _, callback, on_error = self._tasks.pop(token)
+        if key is not None and self._inflight.get(key) == token:
+            del self._inflight[key]
+        try:
+            if exc is not None:
+                if on_error:
+                    on_error(exc)
+                else:
+                    logger.error(f"❌ Background call failed: {exc}", exc_info=exc)
+            elif callback:
+                callback(result)
+        except Exception as e:
+            logger.error(f"❌ Error in background call callback: {e}", exc_info=True)
+        if key is not None and key in self._rerun and not self._closed:
+            func, args, kwargs, callback, on_error = self._rerun.pop(key)
+            self._start(key, func, args, kwargs, callback, on_error)
+
+    def _set_busy(self, busy):
+        if self.on_busy:
+            self.on_busy(busy)
+
+    def busy(self, key=None):
+        """True while any call (or the call with key) is in flight."""
+        return key in self._inflight if key is not None else bool(self._tasks)
+
+    def close(self):
+        """
+        Cancel calls that have not started yet and drop the results of running ones.
+        Call before destroying the window; running calls finish on their own, since a
+        database statement cannot be safely interrupted from another thread.
+        """
+        self._closed = True
+        if self._poll_id is not None:
+            try:
+                self.widget.after_cancel(self._poll_id)
+            except Exception:
+                pass
+            self._poll_id = None
+        cancelled = sum(1 for _, future, _, _ in self._tasks.values() if future.cancel())
+        if self._tasks:
+            logger.info(f"✅ Closed task runner: {cancelled} queued call(s) cancelled, "
+                        f"{len(self._tasks) - cancelled} left to finish in the background")
+        self._tasks.clear()
+        self._inflight.clear()
+        self._rerun.clear()
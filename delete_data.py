@@ -1,73 +1,151 @@
 import logging
-from connections import create_connection
+from connections import get_connection
+from metrics import measured
+from query_cache import invalidates
 
-# Use existing logger (configured in dashboard.py)
+# Logging is configured by logging_setup (through connections)
 logger = logging.getLogger(__name__)
 
+# Rows fetched per page when browsing sales details
+SALES_DETAILS_PAGE_SIZE = 200
+
+@measured()
 def fetch_sales_details():
     """Fetch all sales details for the Treeview. Returns (details, error)."""
-    conn, error = create_connection()
-    if error or not conn:
-        logger.error(f"❌ Failed to fetch sales details: {error or 'No connection'}")
-        return [], error or "No database connection"
-    try:
-        cur = conn.cursor()
-        cur.execute("""
-            SELECT sd.sale_id, sd.medicine_id, m.name, sd.quantity, sd.selling_price
-            FROM sales_details sd
-            JOIN medicines m ON sd.medicine_id = m.medicine_id
-            ORDER BY sd.sale_id, sd.medicine_id
-        """)
-        details = cur.fetchall()
-        logger.info("✅ Successfully fetched sales details")
-        return details, None
-    except Exception as e:
-        logger.error(f"❌ Error fetching sales details: {e}")
-        return [], f"Error fetching sales details: {str(e)}"
-    finally:
-        conn.close()
+    with get_connection() as (conn, error):
+        if error or not conn:
+            logger.error(f"❌ Failed to fetch sales details: {error or 'No connection'}")
+            return [], error or "No database connection"
+        try:
+            cur = conn.cursor()
+            cur.execute("""
+                SELECT sd.sale_id, sd.medicine_id, m.name, sd.quantity, sd.selling_price
+                FROM sales_details sd
+                JOIN medicines m ON sd.medicine_id = m.medicine_id
+                ORDER BY sd.sale_id, sd.medicine_id
+            """)
+            details = cur.fetchall()
+            logger.info("✅ Successfully fetched sales details")
+            return details, None
+        except Exception as e:
+            logger.error(f"❌ Error fetching sales details: {e}")
+            return [], f"Error fetching sales details: {str(e)}"
 
-def delete_sale(sale_id):
-    """Delete a sale and its details, restoring stock. Returns (success, error)."""
-    if not sale_id:
+@measured()
+def fetch_sales_details_page(after=None, page_size=SALES_DETAILS_PAGE_SIZE, from_sale_id=None):
+    """
+    Fetch one page of sales details in (sale_id, medicine_id) order using keyset pagination.
+    after: (sale_id, medicine_id) of the last row already shown, or None for the first page.
+    from_sale_id: start the first page at this sale instead of the oldest one.
+    Returns (details, error); fewer than page_size rows means there are no more pages.
+    """
+    if page_size <= 0:
+        logger.error(f"❌ Invalid page size: {page_size}")
+        return [], "Page size must be positive"
+    conditions, params = [], []
+    if after is not None:
+        conditions.append("(sd.sale_id, sd.medicine_id) > (%s, %s)")
+        params.extend(after)
+    if from_sale_id is not None:
+        conditions.append("sd.sale_id >= %s")
+        params.append(from_sale_id)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    with get_connection() as (conn, error):
+        if error or not conn:
+            logger.error(f"❌ Failed to fetch sales details: {error or 'No connection'}")
+            return [], error or "No database connection"
+        try:
+            cur = conn.cursor()
+            cur.execute(f"""
+                SELECT sd.sale_id, sd.medicine_id, m.name, sd.quantity, sd.selling_price
+                FROM sales_details sd
+                JOIN medicines m ON sd.medicine_id = m.medicine_id
+                {where}
+                ORDER BY sd.sale_id, sd.medicine_id
+                LIMIT %s
+            """, params + [page_size])
+            details = cur.fetchall()
+            logger.info(f"✅ Fetched {len(details)} sales details")
+            return details, None
+        except Exception as e:
+            logger.error(f"❌ Error fetching sales details: {e}")
+            return [], f"Error fetching sales details: {str(e)}"
+
+@measured()
+@invalidates("medicines")
+def delete_sales(sale_ids):
+    """
+    Delete many sales and their details, restoring stock, in a constant number of statements.
+    Returns (result, error): result is {'deleted': [sale_id, ...], 'missing': [sale_id, ...]}.
+    """
+    sale_ids = sorted({int(sale_id) for sale_id in sale_ids or [] if sale_id})
+    if not sale_ids:
         logger.error("❌ No sale_id provided")
-        return False, "No sale_id provided"
-    conn, error = create_connection()
-    if error or not conn:
-        logger.error(f"❌ Failed to delete sale: {error or 'No connection'}")
-        return False, error or "No database connection"
-    try:
-        cur = conn.cursor()
-        # Fetch sales_details to restore stock
-        cur.execute("SELECT medicine_id, quantity FROM sales_details WHERE sale_id = %s", (sale_id,))
-        sale_details = cur.fetchall()
-        if not sale_details:
-            logger.warning(f"❌ No sale found with sale_id: {sale_id}")
-            conn.close()
-            return False, f"No sale found with sale_id: {sale_id}"
-        # Restore stock and log to stock_logs
-        for medicine_id, quantity in sale_details:
+        return None, "No sale_id provided"
+    with get_connection() as (conn, error):
+        if error or not conn:
+            logger.error(f"❌ Failed to delete sales: {error or 'No connection'}")
+            return None, error or "No database connection"
+        try:
+            cur = conn.cursor()
+            # Lock the headers first so concurrent deletes cannot restore the same stock twice
             cur.execute("""
-                UPDATE medicines SET quantity = quantity + %s WHERE medicine_id = %s
-            """, (quantity, medicine_id))
+                SELECT sale_id FROM sales
+                WHERE sale_id = ANY(%s)
+                ORDER BY sale_id
+                FOR UPDATE
+            """, (sale_ids,))
+            found = [row[0] for row in cur.fetchall()]
+            missing = sorted(set(sale_ids) - set(found))
+            if not found:
+                conn.rollback()
+                logger.warning(f"❌ No sales found with sale_ids: {sale_ids}")
+                return None, f"No sale found with sale_id: {', '.join(str(s) for s in sale_ids)}"
+            # Restore stock with one aggregated UPDATE and write the compensating log rows
             cur.execute("""
+                WITH restored AS (
+                    SELECT medicine_id, SUM(quantity) AS quantity
+                    FROM sales_details
+                    WHERE sale_id = ANY(%(sale_ids)s)
+                    GROUP BY medicine_id
+                ),
+                locked AS (
+                    SELECT medicine_id FROM medicines
+                    WHERE medicine_id IN (SELECT medicine_id FROM restored)
+                    ORDER BY medicine_id
+                    FOR UPDATE
+                ),
+                stock AS (
+                    UPDATE medicines m
+                    SET quantity = m.quantity + r.quantity
+                    FROM restored r
+                    JOIN locked l ON l.medicine_id = r.medicine_id
+                    WHERE m.medicine_id = r.medicine_id
+                )
                 INSERT INTO stock_logs (medicine_id, change_type, quantity_change)
-                VALUES (%s, %s, %s)
-            """, (medicine_id, 'sale_deletion', quantity))
-        # Delete from sales_details
-        cur.execute("DELETE FROM sales_details WHERE sale_id = %s", (sale_id,))
-        # Delete from sales
-        cur.execute("DELETE FROM sales WHERE sale_id = %s", (sale_id,))
-        if cur.rowcount == 0:
+                SELECT medicine_id, 'sale_deletion', quantity
+                FROM sales_details
+                WHERE sale_id = ANY(%(sale_ids)s)
+                ORDER BY sale_id, medicine_id
+            """, {'sale_ids': found})
+            cur.execute("DELETE FROM sales_details WHERE sale_id = ANY(%s)", (found,))
+            cur.execute("DELETE FROM sales WHERE sale_id = ANY(%s)", (found,))
+            conn.commit()
+            if missing:
+                logger.warning(f"❌ No sales found with sale_ids: {missing}")
+            logger.info(f"✅ Deleted {len(found)} sale(s): {found}")
+            return {'deleted': found, 'missing': missing}, None
+        except Exception as e:
             conn.rollback()
-            logger.warning(f"❌ No sale found with sale_id: {sale_id}")
-            return False, f"No sale found with sale_id: {sale_id}"
-        conn.commit()
-        logger.info(f"✅ Deleted sale ID: {sale_id}")
-        return True, None
-    except Exception as e:
-        conn.rollback()
-        logger.error(f"❌ Error deleting sale: {e}")
-        return False, f"Error deleting sale: {str(e)}"
-    finally:
-        conn.close()
\ No newline at end of file
+            logger.error(f"❌ Error deleting sales: {e}")
+            return None, f"Error deleting sales: {str(e)}"
+
+def delete_sale(sale_id):
+    """Delete a sale and its details, restoring stock. Returns (success, error)."""
+    if not sale_id:
+        logger.error("❌ No sale_id provided")
+        return False, "No sale_id provided"
+    result, error = delete_sales([sale_id])
+    if error:
+        return False, error
+    return True, None
@@ -1,13 +1,13 @@
 import tkinter as tk
 from tkinter import messagebox, ttk
 import logging
-from delete_data import fetch_sales_details, delete_sale
-from connections import get_user_details, create_connection
+from delete_data import fetch_sales_details_page, delete_sales, SALES_DETAILS_PAGE_SIZE
+from db_executor import TaskRunner, busy_indicator
 
-# Use existing logger (configured in dashboard.py)
+# Logging is configured by logging_setup (through connections)
 logger = logging.getLogger(__name__)
 
-def show_delete_data_page(username):
+def show_delete_data_page(session):
     window = tk.Toplevel()
     window.title("Delete Data")
     window.geometry("1000x600")
@@ -21,57 +21,145 @@ def show_delete_data_page(username):
     main_frame = tk.Frame(window, bg="#d7f7f2")
     main_frame.pack(pady=10, fill=tk.BOTH, expand=True)
 
-    # Verify owner role
-    user_data = get_user_details(username)
-    if not user_data:
-        error_label.config(text="Failed to fetch user details.")
-        logger.error(f"❌ Failed to fetch user details for {username}")
-        main_frame.pack_forget()
-        tk.Button(window, text="Close", command=window.destroy, bg="#FF4444", fg="white", font=("Helvetica", 14)).pack(pady=10)
-        return
-    user_id, username, role = user_data
-    if role.lower() != 'owner':
-        error_label.config(text="Unauthorized access. Owner privileges required.")
-        logger.error(f"❌ Unauthorized access for {username}: role is {role}")
+    # Verify owner role (the session re-checks its version stamp at most once a minute)
+    allowed, error = session.authorize("delete_data")
+    if not allowed:
+        error_label.config(text=error)
         main_frame.pack_forget()
         tk.Button(window, text="Close", command=window.destroy, bg="#FF4444", fg="white", font=("Helvetica", 14)).pack(pady=10)
         return
 
-    # Treeview to display all sales details
+    # Jump to a sale ID
+    jump_frame = tk.Frame(main_frame, bg="#d7f7f2")
+    jump_frame.pack(pady=5)
+    tk.Label(jump_frame, text="Go to Sale ID:", bg="#d7f7f2", font=("Helvetica", 12)).pack(side=tk.LEFT, padx=5)
+    jump_entry = tk.Entry(jump_frame, font=("Helvetica", 12), width=12)
+    jump_entry.pack(side=tk.LEFT, padx=5)
+    status_label = tk.Label(main_frame, text="", bg="#d7f7f2", font=("Helvetica", 10))
+
+    # Treeview to display sales details, loaded one page at a time
     tree_frame = tk.Frame(main_frame)
     tree_frame.pack(pady=10, fill=tk.BOTH, expand=True)
+    status_label.pack()
     columns = ("Sale ID", "Medicine ID", "Medicine Name", "Quantity", "Selling Price")
-    tree = ttk.Treeview(tree_frame, columns=columns, show="headings")
+    tree = ttk.Treeview(tree_frame, columns=columns, show="headings", selectmode="extended")
     tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
     column_widths = {"Sale ID": 100, "Medicine ID": 100, "Medicine Name": 200, "Quantity": 100, "Selling Price": 120}
     for col in columns:
         tree.heading(col, text=col)
         tree.column(col, width=column_widths[col], anchor="center")
 
-    # Scrollbar
-    scrollbar = ttk.Scrollbar(tree_frame, orient="vertical", command=tree.yview)
-    scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-    tree.configure(yscrollcommand=scrollbar.set)
+    # Database calls run in the background; the status label shows while one is in flight
+    busy_label = tk.Label(main_frame, text="", bg="#d7f7f2", font=("Helvetica", 10))
+    busy_label.pack()
+    runner = TaskRunner(window, on_busy=busy_indicator(window, busy_label))
+
+    # Paging state: key of the last loaded row, starting sale and whether the end was reached
+    paging = {"after": None, "from_sale_id": None, "exhausted": False, "loading": False, "pending": False,
+              "generation": 0}
 
-    def refresh_sales_details():
-        """Populate Treeview with all sales details."""
+    def load_next_page():
+        """Fetch the next page of sales details in the background."""
+        paging["pending"] = False
+        if paging["exhausted"] or paging["loading"]:
+            return
+        paging["loading"] = True
+        generation = paging["generation"]
+        from_sale_id = paging["from_sale_id"] if paging["after"] is None else None
+        runner.submit(fetch_sales_details_page, paging["after"], SALES_DETAILS_PAGE_SIZE, from_sale_id,
+                      callback=lambda result: show_page(generation, result),
+                      on_error=lambda e: show_page(generation, None, e))
+
+    def show_page(generation, result, exc=None):
+        """Append a fetched page to the Treeview, unless the view was reset meanwhile."""
+        if generation != paging["generation"]:
+            return  # refresh_sales_details() started over while this page was loading
         try:
-            for row in tree.get_children():
-                tree.delete(row)
-            details, error = fetch_sales_details()
+            if exc is not None:
+                raise exc
+            details, error = result
             if error:
                 error_label.config(text=error)
                 logger.error(f"❌ Failed to fetch sales details: {error}")
                 return
             for detail in details:
                 tree.insert("", "end", values=detail)
+            if details:
+                paging["after"] = (details[-1][0], details[-1][1])
+            paging["exhausted"] = len(details) < SALES_DETAILS_PAGE_SIZE
+            status_label.config(text=f"{len(tree.get_children())} rows loaded" + (" (end)" if paging["exhausted"] else ""))
+        except Exception as e:
+            error_label.config(text=f"Unexpected error: {str(e)}")
+            logger.error(f"❌ Unexpected error in load_next_page: {e}", exc_info=True)
+        finally:
+            paging["loading"] = False
+
+    def on_tree_scroll(first, last):
+        """Keep the scrollbar in sync and load more rows when the view nears the end."""
+        scrollbar.set(first, last)
+        if float(last) >= 0.9 and not paging["exhausted"] and not paging["pending"]:
+            paging["pending"] = True
+            window.after_idle(load_next_page)
+
+    # Scrollbar
+    scrollbar = ttk.Scrollbar(tree_frame, orient="vertical", command=tree.yview)
+    scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+    tree.configure(yscrollcommand=on_tree_scroll)
+
+    def refresh_sales_details(from_sale_id=None):
+        """Clear the Treeview and load the first page, optionally starting at a sale ID."""
+        try:
+            for row in tree.get_children():
+                tree.delete(row)
+            # A new generation makes any page still in flight be ignored when it arrives
+            paging.update(after=None, from_sale_id=from_sale_id, exhausted=False, loading=False,
+                          generation=paging["generation"] + 1)
+            load_next_page()
             logger.info("✅ Refreshed sales details in Treeview")
         except Exception as e:
             error_label.config(text=f"Unexpected error: {str(e)}")
             logger.error(f"❌ Unexpected error in refresh_sales_details: {e}", exc_info=True)
 
+    def handle_jump():
+        """Show sales details starting at the entered sale ID (blank shows everything)."""
+        value = jump_entry.get().strip()
+        if not value:
+            refresh_sales_details()
+            return
+        try:
+            sale_id = int(value)
+        except ValueError:
+            error_label.config(text="Sale ID must be a number.")
+            logger.warning(f"❌ Invalid sale ID entered: {value}")
+            return
+        error_label.config(text="")
+        refresh_sales_details(sale_id)
+
+    tk.Button(jump_frame, text="Go", command=handle_jump, bg="#2196F3", fg="white", font=("Helvetica", 12)).pack(side=tk.LEFT, padx=5)
+    jump_entry.bind("<Return>", lambda event: handle_jump())
+
+    def sales_deleted(outcome):
+        result, error = outcome
+        if result:
+            message = f"✅ Deleted {len(result['deleted'])} sale(s) successfully."
+            if result['missing']:
+                message += f"\nAlready removed: {', '.join(str(s) for s in result['missing'])}"
+            messagebox.showinfo("Success", message)
+            logger.info(f"✅ Sale IDs {result['deleted']} deleted successfully")
+            error_label.config(text="")
+            refresh_sales_details(paging["from_sale_id"])
+        else:
+            error_label.config(text=error or "Failed to delete sale.")
+            messagebox.showerror("Error", error or "Failed to delete sale.")
+            logger.error(f"❌ Failed to delete sale: {error}")
+
+    def delete_failed(e):
+        error_label.config(text=f"Unexpected error: {str(e)}")
+        messagebox.showerror("Error", f"Unexpected error: {str(e)}")
+        logger.error(f"❌ Unexpected error in handle_delete_sale: {e}", exc_info=e)
+
     def handle_delete_sale():
-        """Delete the sale corresponding to the selected sales detail."""
+        """Delete every sale that has at least one selected sales detail."""
         try:
             selected = tree.selection()
             if not selected:
@@ -79,33 +167,31 @@ def show_delete_data_page(username):
                 messagebox.showwarning("Warning", "Please select a sale to delete.")
                 logger.warning("❌ No sale selected for deletion")
                 return
-            # Get sale_id from the first selected row
-            sale_id = tree.item(selected[0])['values'][0]
-            if not messagebox.askyesno("Confirm", f"Are you sure you want to delete Sale ID {sale_id}?"):
+            # Several detail rows can belong to the same sale
+            sale_ids = sorted({tree.item(item)['values'][0] for item in selected})
+            if len(sale_ids) == 1:
+                prompt = f"Are you sure you want to delete Sale ID {sale_ids[0]}?"
+            else:
+                prompt = f"Are you sure you want to delete {len(sale_ids)} sales ({', '.join(str(s) for s in sale_ids)})?"
+            if not messagebox.askyesno("Confirm", prompt):
                 logger.info("✅ Sale deletion cancelled by user")
                 return
-            success, error = delete_sale(sale_id)
-            if success:
-                messagebox.showinfo("Success", "✅ Sale deleted successfully.")
-                logger.info(f"✅ Sale ID {sale_id} deleted successfully")
-                error_label.config(text="")
-                refresh_sales_details()
-            else:
-                error_label.config(text=error or "Failed to delete sale.")
-                messagebox.showerror("Error", error or "Failed to delete sale.")
-                logger.error(f"❌ Failed to delete sale: {error}")
+            if not runner.submit(delete_sales, sale_ids, callback=sales_deleted, on_error=delete_failed,
+                                 key="delete", coalesce=False):
+                error_label.config(text="A deletion is already in progress.")
         except Exception as e:
             error_label.config(text=f"Unexpected error: {str(e)}")
             messagebox.showerror("Error", f"Unexpected error: {str(e)}")
             logger.error(f"❌ Unexpected error in handle_delete_sale: {e}", exc_info=True)
 
     # Delete button
-    tk.Button(main_frame, text="Delete Selected Sale", command=handle_delete_sale, bg="#FF4444", fg="white", font=("Helvetica", 14)).pack(pady=10)
+    tk.Button(main_frame, text="Delete Selected Sales", command=handle_delete_sale, bg="#FF4444", fg="white", font=("Helvetica", 14)).pack(pady=10)
 
     # Initial population of Treeview
     refresh_sales_details()
 
     def on_close():
+        runner.close()
         window.destroy()
         logger.info("✅ Delete data page closed")
     window.protocol("WM_DELETE_WINDOW", on_close)
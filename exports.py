@@ -0,0 +1,174 @@
+import argparse
+import gzip
+import logging
+import os
+import time
+from datetime import date, timedelta
+from connections import get_connection
+
+logger = logging.getLogger(__name__)
+
+# Rows per Parquet row group, and per round trip of the server-side cursor feeding it
+CHUNK_ROWS = 50000
+
+# Each export: the query, the column its date filters apply to, and Parquet column types
+# (CSV goes through COPY and needs none)
+EXPORTS = {
+    'sales': {
+        'sql': """
+            SELECT s.sale_id, s.sale_date, s.customer_id, s.user_id, d.medicine_id, m.name AS medicine_name,
+                   d.quantity, d.selling_price, d.quantity * d.selling_price AS line_total
+            FROM sales_details d
+            JOIN sales s ON s.sale_id = d.sale_id
+            JOIN medicines m ON m.medicine_id = d.medicine_id
+        """,
+        'date_column': 's.sale_date',
+        'order_by': 's.sale_id, d.medicine_id',
+        'types': ['int32', 'timestamp', 'int32', 'int32', 'int32', 'string', 'int32', 'price', 'amount'],
+    },
+    'purchases': {
+        'sql': """
+            SELECT p.purchase_id, p.purchase_date, p.user_id, d.medicine_id, m.name AS medicine_name,
+                   d.quantity, d.cost_price, d.quantity * d.cost_price AS line_total
+            FROM purchase_details d
+            JOIN purchases p ON p.purchase_id = d.purchase_id
+            JOIN medicines m ON m.medicine_id = d.medicine_id
+        """,
+        'date_column': 'p.purchase_date',
+        'order_by': 'p.purchase_id, d.medicine_id',
+        'types': ['int32', 'timestamp', 'int32', 'int32', 'string', 'int32', 'price', 'amount'],
+    },
+    'stock_logs': {
+        'sql': """
+            SELECT l.log_id, l.created_at, l.medicine_id, l.change_type::text AS change_type, l.quantity_change
+            FROM stock_logs l
+        """,
+        'date_column': 'l.created_at',  # Filters prune the monthly partitions
+        'order_by': 'l.log_id',
+        'types': ['int32', 'timestamp', 'int32', 'string', 'int32'],
+    },
+}
+
+FORMATS = ('csv', 'csv.gz', 'parquet')
+
+def _format(path):
+    for fmt in sorted(FORMATS, key=len, reverse=True):
+        if path.lower().endswith('.' + fmt):
+            return fmt
+    return None
+
+def _as_date(value):
+    return date.fromisoformat(value) if isinstance(value, str) else value
+
+def _query(cur, name, start, end):
+    """The export's SELECT with its date filters bound; start and end are inclusive dates."""
+    spec = EXPORTS[name]
+    conditions, params = [], []
+    if start:
+        conditions.append(f"{spec['date_column']} >= %s")
+        params.append(start)
+    if end:
+        conditions.append(f"{spec['date_column']} < %s")
+        params.append(end + timedelta(days=1))
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    # COPY takes no parameters, so bind them client-side
+    return cur.mogrify(f"{spec['sql']} {where} ORDER BY {spec['order_by']}", params).decode()
+
+def _write_csv(cur, sql, path, compress):
+    opener = gzip.open if compress else open
+    with opener(path, 'wb') as f:
+        cur.copy_expert(f"COPY ({sql}) TO STDOUT WITH (FORMAT csv, HEADER)", f, size=1 << 16)
+    return cur.rowcount
+
+def _write_parquet(conn, sql, path, types):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    arrow_types = {
+        'int32': pa.int32(),
+        'string': pa.string(),
+        'timestamp': pa.timestamp('us'),
+        'price': pa.decimal128(10, 2),
+        'amount': pa.decimal128(14, 2),
+    }
+    rows = 0
+    # A named cursor keeps the result on the server; fetchmany pulls one chunk at a time
+    with conn.cursor(name='export') as cur:
+        cur.itersize = CHUNK_ROWS
+        cur.execute(sql)
+        chunk = cur.fetchmany(CHUNK_ROWS)
+        schema = pa.schema([(column.name, arrow_types[t]) for column, t in zip(cur.description, types)])
+        with pq.ParquetWriter(path, schema, compression='zstd') as writer:
+            while chunk:
+                columns = list(zip(*chunk))
+                writer.write_table(pa.Table.from_arrays(
+                    [pa.array(values, type=field.type) for values, field in zip(columns, schema)], schema=schema))
+                rows += len(chunk)
+                chunk = cur.fetchmany(CHUNK_ROWS)
+    return rows
+
+def export(name, path, start=None, end=None):
+    """
+    Stream one export to a file without holding it in memory: CSV (optionally .csv.gz) through
+    COPY TO STDOUT, Parquet through a server-side cursor in CHUNK_ROWS row groups (needs pyarrow).
+    name: a key of EXPORTS. start/end: inclusive dates (or ISO strings) to filter on.
+    The file appears under path only once complete.
+    Returns (report, error): report is {'export', 'path', 'rows', 'bytes', 'seconds'}.
+    """
+    if name not in EXPORTS:
+        return None, f"Unknown export: {name} (choose from {', '.join(EXPORTS)})"
+    fmt = _format(path)
+    if fmt is None:
+        return None, f"Export file must end in {', '.join('.' + f for f in FORMATS)}"
+    if fmt == 'parquet':
+        try:
+            import pyarrow.parquet  # noqa: F401
+        except ImportError:
+            return None, "Parquet export needs pyarrow (pip install pyarrow); CSV works without it"
+    try:
+        start, end = _as_date(start), _as_date(end)
+    except ValueError as e:
+        return None, f"Invalid date: {e}"
+    started = time.perf_counter()
+    partial = path + '.partial'
+    with get_connection() as (conn, error):
+        if error or not conn:
+            logger.error(f"❌ Failed to export {name}: {error or 'No connection'}")
+            return None, error or "No database connection"
+        try:
+            cur = conn.cursor()
+            # One consistent view even though the export takes a while
+            cur.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ READ ONLY")
+            sql = _query(cur, name, start, end)
+            if fmt == 'parquet':
+                rows = _write_parquet(conn, sql, partial, EXPORTS[name]['types'])
+            else:
+                rows = _write_csv(cur, sql, partial, fmt == 'csv.gz')
+            conn.rollback()
+            os.replace(partial, path)
+        except Exception as e:
+            conn.rollback()
+            if os.path.exists(partial):
+                os.remove(partial)
+            logger.error(f"❌ Error exporting {name}: {e}")
+            return None, f"Error exporting {name}: {str(e)}"
+    seconds = time.perf_counter() - started
+    report = {'export': name, 'path': path, 'rows': rows, 'bytes': os.path.getsize(path), 'seconds': seconds}
+    logger.info(f"✅ Exported {rows} {name} rows to {path} in {seconds:.1f}s")
+    return report, None
+
+def main():
+    parser = argparse.ArgumentParser(description="Export sales, purchases or the stock ledger to CSV or Parquet")
+    parser.add_argument('export', choices=list(EXPORTS))
+    parser.add_argument('path', help="output file: .csv, .csv.gz or .parquet")
+    parser.add_argument('--from', dest='start', type=date.fromisoformat, help="first day (YYYY-MM-DD)")
+    parser.add_argument('--to', dest='end', type=date.fromisoformat, help="last day, inclusive")
+    args = parser.parse_args()
+
+    report, error = export(args.export, args.path, args.start, args.end)
+    if error:
+        print(error)
+        raise SystemExit(1)
+    print(f"{report['rows']} rows -> {report['path']} ({report['bytes'] / 1048576:.1f} MiB, {report['seconds']:.1f}s)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+import tkinter as tk
+from tkinter import filedialog, messagebox, ttk
+import logging
+from datetime import date
+from exports import EXPORTS, export
+from db_executor import TaskRunner, busy_indicator
+
+logger = logging.getLogger(__name__)
+
+FILE_TYPES = [("CSV", "*.csv"), ("Compressed CSV", "*.csv.gz"), ("Parquet", "*.parquet")]
+
+def show_exports_page(session):
+    window = tk.Toplevel()
+    window.title("Export Data")
+    window.geometry("600x400")
+    window.configure(bg="#d7f7f2")
+
+    # Error label
+    error_label = tk.Label(window, text="", bg="#d7f7f2", fg="red", font=("Helvetica", 12), wraplength=550)
+    error_label.pack(pady=10)
+
+    # Main frame
+    main_frame = tk.Frame(window, bg="#d7f7f2")
+    main_frame.pack(pady=10, fill=tk.BOTH, expand=True)
+
+    # Verify owner role (the session re-checks its version stamp at most once a minute)
+    allowed, error = session.authorize("reports")
+    if not allowed:
+        error_label.config(text=error)
+        main_frame.pack_forget()
+        tk.Button(window, text="Close", command=window.destroy, bg="#FF4444", fg="white", font=("Helvetica", 14)).pack(pady=10)
+        return
+
+    form = tk.Frame(main_frame, bg="#d7f7f2")
+    form.pack(pady=10)
+    tk.Label(form, text="Data:", bg="#d7f7f2", font=("Helvetica", 12)).grid(row=0, column=0, padx=10, pady=5, sticky="e")
+    export_choice = ttk.Combobox(form, values=list(EXPORTS), state="readonly", font=("Helvetica", 12), width=18)
+    export_choice.current(0)
+    export_choice.grid(row=0, column=1, padx=10, pady=5)
+    tk.Label(form, text="From (YYYY-MM-DD):", bg="#d7f7f2", font=("Helvetica", 12)).grid(row=1, column=0, padx=10, pady=5, sticky="e")
+    from_entry = tk.Entry(form, font=("Helvetica", 12), width=20)
+    from_entry.grid(row=1, column=1, padx=10, pady=5)
+    tk.Label(form, text="To (YYYY-MM-DD):", bg="#d7f7f2", font=("Helvetica", 12)).grid(row=2, column=0, padx=10, pady=5, sticky="e")
+    to_entry = tk.Entry(form, font=("Helvetica", 12), width=20)
+    to_entry.insert(0, date.today().isoformat())
+    to_entry.grid(row=2, column=1, padx=10, pady=5)
+    tk.Label(main_frame, text="Leave a date empty to export from the beginning or up to today.",
+             bg="#d7f7f2", font=("Helvetica", 10)).pack()
+
+    # Exports run in the background; the status label shows while one is in flight
+    status_label = tk.Label(main_frame, text="", bg="#d7f7f2", font=("Helvetica", 10))
+    status_label.pack()
+    runner = TaskRunner(window, on_busy=busy_indicator(window, status_label, "⏳ Exporting..."))
+
+    def export_finished(result):
+        report, error = result
+        if error:
+            error_label.config(text=error)
+            messagebox.showerror("Export Failed", error)
+            return
+        error_label.config(text="")
+        messagebox.showinfo("Export Complete",
+                            f"Exported {report['rows']} rows to\n{report['path']}\n({report['bytes'] / 1048576:.1f} MiB)")
+
+    def handle_export():
+        name = export_choice.get()
+        try:
+            start = date.fromisoformat(from_entry.get().strip()) if from_entry.get().strip() else None
+            end = date.fromisoformat(to_entry.get().strip()) if to_entry.get().strip() else None
+        except ValueError:
+            error_label.config(text="Dates must look like 2025-03-31")
+            return
+        if start and end and start > end:
+            error_label.config(text="The start date is after the end date")
+            return
+        path = filedialog.asksaveasfilename(parent=window, title="Export to", filetypes=FILE_TYPES,
+                                            defaultextension=".csv", initialfile=f"{name}.csv")
+        if not path:
+            return
+        if not runner.submit(export, name, path, start, end, callback=export_finished, key="export", coalesce=False):
+            error_label.config(text="An export is already running.")
+
+    tk.Button(main_frame, text="Export", command=handle_export, bg="#81f77c", font=("Helvetica", 14), width=15).pack(pady=15)
+
+    def on_close():
+        runner.close()
+        window.destroy()
+        logger.info("✅ Export page closed")
+    window.protocol("WM_DELETE_WINDOW", on_close)
+
+    logger.info("✅ Export page opened")
+    window.mainloop()
@@ -0,0 +1,219 @@
+import heapq
+import logging
+import time
+from decimal import Decimal
+from connections import get_connection
+from config import config
+
+logger = logging.getLogger(__name__)
+
+# Defaults used when database.ini has no [dashboard] section
+DASHBOARD_DEFAULTS = {
+    'low_stock_threshold': 10,  # medicines at or below this quantity count as low on stock
+    'refresh_seconds': 5.0,
+    'top_sellers': 5,
+}
+
+# Ids this far below the newest may still belong to uncommitted inserts when totals are loaded
+LOAD_LOOKBACK = 1000
+
+# Seconds a missing id is looked for again before it is taken for a rolled-back insert
+GAP_GRACE = 60.0
+
+# Larger jumps in an id sequence are not tracked as gaps (e.g. ids reserved by a bulk load)
+MAX_GAPS = 10000
+
+# Full reload interval; also picks up medicines deleted since, which leave no log rows
+RELOAD_SECONDS = 600.0
+
+def dashboard_settings():
+    """Read the optional [dashboard] section of database.ini, falling back to DASHBOARD_DEFAULTS."""
+    settings = dict(DASHBOARD_DEFAULTS)
+    try:
+        params = config(section='dashboard')
+    except Exception:
+        params = {}
+    for key, default in DASHBOARD_DEFAULTS.items():
+        if key in params:
+            settings[key] = type(default)(params[key])
+    return settings
+
+class Watermark:
+    """
+    Highest id folded so far, plus the ids below it that were missing when it advanced.
+    Ids are handed out at insert but become visible at commit, so a lower id can appear after
+    a higher one; missing ids are looked for again until GAP_GRACE has passed.
+    """
+
+    def __init__(self, last_id, pending=()):
+        now = time.monotonic()
+        self.last_id = last_id
+        self.pending = {i: now for i in pending}
+
+    def advance(self, seen):
+        """Record the ids returned by a query for id > last_id OR id = ANY(pending)."""
+        now = time.monotonic()
+        seen = set(seen)
+        for i in seen:
+            self.pending.pop(i, None)
+        top = max(seen, default=self.last_id)
+        if top > self.last_id:
+            if top - self.last_id <= MAX_GAPS:
+                for i in range(self.last_id + 1, top):
+                    if i not in seen:
+                        self.pending[i] = now
+            self.last_id = top
+        self.pending = {i: t for i, t in self.pending.items() if now - t < GAP_GRACE}
+
+class KpiTracker:
+    """
+    Today's revenue, sale count, top sellers and low-stock count for the dashboard.
+    refresh() loads the totals once, from the sales_daily rollups and current stock, then only
+    reads sales and stock_logs rows newer than the last ones seen and folds them into running
+    totals, so each refresh costs O(new rows). Not thread-safe: run one refresh at a time.
+    """
+
+    def __init__(self, low_stock_threshold=None, top_sellers=None):
+        settings = dashboard_settings()
+        self.threshold = settings['low_stock_threshold'] if low_stock_threshold is None else low_stock_threshold
+        self.top_n = settings['top_sellers'] if top_sellers is None else top_sellers
+        self.day = None
+        self.loaded_at = 0.0
+        self.revenue = Decimal(0)
+        self.sales = 0
+        self.sold = {}  # medicine_id -> quantity sold today
+        self.stock = {}  # medicine_id -> quantity
+        self.low = set()  # medicine_ids at or below the threshold
+        self.names = {}
+        self.sales_mark = None
+        self.logs_mark = None
+
+    def _set_stock(self, medicine_id, quantity):
+        self.stock[medicine_id] = quantity
+        if quantity <= self.threshold:
+            self.low.add(medicine_id)
+        else:
+            self.low.discard(medicine_id)
+
+    def _load_sales(self, cur):
+        cur.execute("SELECT COALESCE(SUM(transactions), 0), COALESCE(SUM(revenue), 0) FROM sales_daily WHERE day = %s",
+                    (self.day,))
+        self.sales, self.revenue = cur.fetchone()
+        cur.execute("SELECT medicine_id, quantity FROM sales_daily_medicines WHERE day = %s AND quantity > 0", (self.day,))
+        self.sold = dict(cur.fetchall())
+        return 1 + len(self.sold)
+
+    def _recent_ids(self, cur, sql):
+        """Watermark at the newest visible id, with the invisible ones just below it pending."""
+        cur.execute(sql)
+        ids = [row[0] for row in cur.fetchall()]
+        if not ids:
+            return Watermark(0), 0
+        top = ids[0]
+        visible = set(ids)
+        return Watermark(top, [i for i in range(max(top - LOAD_LOOKBACK, 0) + 1, top) if i not in visible]), len(ids)
+
+    def _load(self, cur, today):
+        """Everything from scratch, within one REPEATABLE READ snapshot so the parts agree."""
+        self.day = today
+        rows = self._load_sales(cur)
+        cur.execute("SELECT medicine_id, quantity FROM medicines")
+        self.stock, self.low = {}, set()
+        for medicine_id, quantity in cur.fetchall():
+            self._set_stock(medicine_id, quantity)
+        rows += len(self.stock)
+        self.sales_mark, read = self._recent_ids(cur, f"""
+            SELECT sale_id FROM sales
+            WHERE sale_id > (SELECT COALESCE(MAX(sale_id), 0) FROM sales) - {LOAD_LOOKBACK}
+            ORDER BY sale_id DESC
+        """)
+        rows += read
+        self.logs_mark, read = self._recent_ids(cur, f"""
+            SELECT log_id FROM stock_logs
+            WHERE log_id > (SELECT COALESCE(MAX(log_id), 0) FROM stock_logs) - {LOAD_LOOKBACK}
+            ORDER BY log_id DESC
+        """)
+        self.loaded_at = time.monotonic()
+        return rows + read
+
+    def _fold(self, cur):
+        """Add sales and stock movements committed since the last refresh."""
+        cur.execute("""
+            SELECT s.sale_id, s.sale_date::date, s.total_amount, d.medicine_id, d.quantity
+            FROM sales s
+            LEFT JOIN sales_details d ON d.sale_id = s.sale_id
+            WHERE s.sale_id > %s OR s.sale_id = ANY(%s)
+            ORDER BY s.sale_id
+        """, (self.sales_mark.last_id, list(self.sales_mark.pending)))
+        rows = cur.fetchall()
+        counted = set()
+        for sale_id, day, total, medicine_id, quantity in rows:
+            if day != self.day:
+                continue
+            if sale_id not in counted:
+                counted.add(sale_id)
+                self.sales += 1
+                self.revenue += total
+            if medicine_id is not None:
+                self.sold[medicine_id] = self.sold.get(medicine_id, 0) + quantity
+        self.sales_mark.advance(row[0] for row in rows)
+
+        cur.execute("""
+            SELECT log_id, medicine_id, change_type, quantity_change
+            FROM stock_logs
+            WHERE log_id > %s OR log_id = ANY(%s)
+        """, (self.logs_mark.last_id, list(self.logs_mark.pending)))
+        logs = cur.fetchall()
+        deleted_sales = False
+        for _, medicine_id, change_type, change in logs:
+            self._set_stock(medicine_id, self.stock.get(medicine_id, 0) + change)
+            deleted_sales = deleted_sales or change_type == 'sale_deletion'
+        self.logs_mark.advance(row[0] for row in logs)
+        read = len(rows) + len(logs)
+        # A deleted sale leaves only stock rows behind; take today's totals from the rollups,
+        # which agree with the watermark because both come from this transaction's snapshot
+        if deleted_sales:
+            read += self._load_sales(cur)
+        return read
+
+    def _top_sellers(self, cur):
+        top = heapq.nlargest(self.top_n, self.sold.items(), key=lambda item: (item[1], -item[0]))
+        missing = [medicine_id for medicine_id, _ in top if medicine_id not in self.names]
+        if missing:
+            cur.execute("SELECT medicine_id, name FROM medicines WHERE medicine_id = ANY(%s)", (missing,))
+            self.names.update(cur.fetchall())
+        return [(medicine_id, self.names.get(medicine_id, f"#{medicine_id}"), quantity) for medicine_id, quantity in top]
+
+    def refresh(self):
+        """
+        Bring the totals up to date. Returns (kpis, error): kpis is {'day', 'revenue', 'sales',
+        'top_sellers': [(medicine_id, name, quantity)], 'low_stock', 'rows_read'}.
+        """
+        with get_connection() as (conn, error):
+            if error or not conn:
+                logger.error(f"❌ Failed to refresh dashboard figures: {error or 'No connection'}")
+                return None, error or "No database connection"
+            try:
+                cur = conn.cursor()
+                cur.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ")
+                cur.execute("SELECT current_date")
+                today = cur.fetchone()[0]
+                if today != self.day or time.monotonic() - self.loaded_at > RELOAD_SECONDS:
+                    rows_read = self._load(cur, today)
+                else:
+                    rows_read = self._fold(cur)
+                top_sellers = self._top_sellers(cur)
+                conn.rollback()
+                return {
+                    'day': self.day,
+                    'revenue': self.revenue,
+                    'sales': self.sales,
+                    'top_sellers': top_sellers,
+                    'low_stock': len(self.low),
+                    'rows_read': rows_read,
+                }, None
+            except Exception as e:
+                conn.rollback()
+                self.day = None  # Start over next time rather than fold onto half-updated totals
+                logger.error(f"❌ Error refreshing dashboard figures: {e}")
+                return None, f"Error refreshing dashboard figures: {str(e)}"
@@ -0,0 +1,283 @@
+import argparse
+import bisect
+import itertools
+import json
+import logging
+import os
+import random
+import threading
+import time
+from collections import defaultdict
+
+logger = logging.getLogger(__name__)
+
+# Defaults for a shift with every cashier terminal busy
+TERMINALS = 12
+DURATION = 30.0
+CATALOG_SIZE = 2000  # medicines carts are drawn from
+ZIPF_EXPONENT = 1.1  # popularity of rank r is proportional to 1 / r ** s
+MAX_CART_LINES = 6
+MAX_LINE_QUANTITY = 3
+OPERATION_MIX = {'sale': 0.85, 'purchase': 0.10, 'delete': 0.05}
+LOCK_SAMPLE_INTERVAL = 0.1
+TERMINAL_USERNAME = 'loadgen_terminal_'  # cashier accounts loadgen_terminal_1..N, created on demand
+
+class ZipfSampler:
+    """Draw items with Zipf-skewed popularity: the first item is the most popular."""
+
+    def __init__(self, items, exponent=ZIPF_EXPONENT):
+        self.items = list(items)
+        self._cumulative = list(itertools.accumulate(1 / rank ** exponent for rank in range(1, len(self.items) + 1)))
+
+    def sample(self, rng):
+        return self.items[bisect.bisect(self._cumulative, rng.random() * self._cumulative[-1])]
+
+    def sample_distinct(self, rng, count):
+        count = min(count, len(self.items))
+        chosen = {}
+        while len(chosen) < count:
+            item = self.sample(rng)
+            chosen[item[0]] = item
+        return list(chosen.values())
+
+def _classify(success, error):
+    """Outcome of one data-layer call: ok, rejected (business rule), deadlock or error."""
+    if success:
+        return 'ok'
+    message = (error or '').lower()
+    if 'deadlock' in message:
+        return 'deadlock'
+    if 'not enough stock' in message or 'no sale found' in message:
+        return 'rejected'
+    return 'error'
+
+class LockMonitor(threading.Thread):
+    """Samples pg_stat_activity on its own connection to see how many sessions wait on locks."""
+
+    def __init__(self, interval=LOCK_SAMPLE_INTERVAL):
+        super().__init__(daemon=True, name="lock-monitor")
+        self.interval = interval
+        self.samples = []
+        self.stopped = threading.Event()
+
+    def run(self):
+        from connections import create_connection
+        conn, error = create_connection()
+        if error:
+            logger.error(f"❌ Lock monitor disabled: {error}")
+            return
+        conn.autocommit = True
+        cur = conn.cursor()
+        try:
+            while not self.stopped.wait(self.interval):
+                cur.execute("""
+                    SELECT COUNT(*) FROM pg_stat_activity
+                    WHERE datname = current_database() AND wait_event_type = 'Lock'
+                """)
+                self.samples.append(cur.fetchone()[0])
+        finally:
+            conn.close()
+
+    def summary(self):
+        samples = self.samples or [0]
+        return {
+            'samples': len(self.samples),
+            'mean_waiting': sum(samples) / len(samples),
+            'max_waiting': max(samples),
+            'time_with_waiters': sum(1 for s in samples if s) / len(samples),
+        }
+
+def _snapshot(cur, medicine_ids):
+    cur.execute("SELECT (SELECT COALESCE(MAX(log_id), 0) FROM stock_logs), (SELECT COALESCE(MAX(sale_id), 0) FROM sales)")
+    last_log_id, last_sale_id = cur.fetchone()
+    cur.execute("SELECT medicine_id, quantity FROM medicines WHERE medicine_id = ANY(%s)", (medicine_ids,))
+    return last_log_id, last_sale_id, dict(cur.fetchall())
+
+def _deadlocks(cur):
+    cur.execute("SELECT deadlocks FROM pg_stat_database WHERE datname = current_database()")
+    return cur.fetchone()[0]
+
+def run(terminals=TERMINALS, duration=DURATION, catalog_size=CATALOG_SIZE, exponent=ZIPF_EXPONENT,
+        hot_stock=None, seed=1):
+    """
+    Simulate terminals concurrent cashiers for duration seconds, each running Zipf-skewed carts
+    through sales.add_sale, plus occasional purchases.add_purchase and delete_data.delete_sale.
+    Threads are enough: every terminal spends its time waiting on PostgreSQL, not Python.
+    hot_stock: if set, the 10 most popular medicines start with this much stock, so carts race
+    for the last units and the oversell checks have something to catch.
+    Returns a report dict.
+    """
+    # Every terminal needs its own connection, as it would on a real till
+    os.environ['PHARMACY_POOL_MAX_SIZE'] = str(terminals + 1)
+    os.environ['PHARMACY_POOL_TIMEOUT'] = str(max(duration, 30.0))
+    from config import reload_config
+    reload_config()
+    from benchmark import summarize
+    from passwords import hash_password
+    from connections import get_connection
+    from delete_data import delete_sale
+    from purchases import add_purchase
+    from sales import add_sale
+
+    with get_connection() as (conn, error):
+        if error or not conn:
+            raise RuntimeError(error or "No database connection")
+        cur = conn.cursor()
+        cur.execute("SELECT medicine_id, price FROM medicines ORDER BY medicine_id LIMIT %s", (catalog_size,))
+        catalog = [(medicine_id, float(price)) for medicine_id, price in cur.fetchall()]
+        if not catalog:
+            raise RuntimeError("The database needs medicines (see datagen.py)")
+        # One cashier per terminal, as in the shop; per-cashier rows (sales_daily) never collide
+        cur.execute("INSERT INTO roles (role_name) VALUES ('cashier') ON CONFLICT (role_name) DO NOTHING")
+        cur.execute("""
+            INSERT INTO users (username, password, role_id)
+            SELECT %s || n, %s, role_id
+            FROM roles, generate_series(1, %s) n
+            WHERE role_name = 'cashier'
+            ON CONFLICT (username) DO NOTHING
+        """, (TERMINAL_USERNAME, hash_password(os.urandom(16).hex()), terminals))
+        cur.execute("SELECT user_id FROM users WHERE username = ANY(%s) ORDER BY user_id",
+                    ([f"{TERMINAL_USERNAME}{n}" for n in range(1, terminals + 1)],))
+        user_ids = [row[0] for row in cur.fetchall()]
+        # Popularity follows a shuffled order, so the hot medicines are spread over the table
+        random.Random(seed).shuffle(catalog)
+        if hot_stock is not None:
+            cur.execute("UPDATE medicines SET quantity = %s WHERE medicine_id = ANY(%s)",
+                        (hot_stock, [m for m, _ in catalog[:10]]))
+        conn.commit()
+        medicine_ids = [m for m, _ in catalog]
+        last_log_id, last_sale_id, before = _snapshot(cur, medicine_ids)
+        deadlocks_before = _deadlocks(cur)
+        conn.commit()
+
+    sampler = ZipfSampler(catalog, exponent)
+    operations = list(OPERATION_MIX)
+    weights = [OPERATION_MIX[op] for op in operations]
+    latencies = defaultdict(list)
+    outcomes = defaultdict(lambda: defaultdict(int))
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+
+    def recent_sale(rng):
+        with get_connection() as (conn, error):
+            if error or not conn:
+                return None
+            cur = conn.cursor()
+            cur.execute("SELECT sale_id FROM sales WHERE sale_id > %s ORDER BY sale_id DESC LIMIT 20", (last_sale_id,))
+            rows = cur.fetchall()
+            conn.rollback()
+            return rng.choice(rows)[0] if rows else None
+
+    def terminal(number):
+        rng = random.Random(seed * 1000 + number)
+        user_id = user_ids[number]
+        while time.monotonic() < deadline:
+            op = rng.choices(operations, weights)[0]
+            lines = sampler.sample_distinct(rng, rng.randint(1, MAX_CART_LINES))
+            if op == 'sale':
+                cart = []
+                for medicine_id, price in lines:
+                    quantity = rng.randint(1, MAX_LINE_QUANTITY)
+                    cart.append({'medicine_id': medicine_id, 'quantity': quantity, 'price': price, 'total_price': quantity * price})
+                call = lambda: add_sale(None, user_id, cart)
+            elif op == 'purchase':
+                cart = []
+                for medicine_id, price in lines:
+                    quantity = rng.randint(10, 50)
+                    cost = round(price * 0.7, 2)
+                    cart.append({'medicine_id': medicine_id, 'quantity': quantity, 'cost_price': cost, 'total_cost': quantity * cost})
+                call = lambda: add_purchase(user_id, cart)
+            else:
+                sale_id = recent_sale(rng)
+                if sale_id is None:
+                    continue
+                call = lambda: delete_sale(sale_id)
+            started = time.perf_counter()
+            success, error = call()
+            elapsed = (time.perf_counter() - started) * 1000
+            with lock:
+                latencies[op].append(elapsed)
+                outcomes[op][_classify(success, error)] += 1
+
+    monitor = LockMonitor()
+    monitor.start()
+    started = time.perf_counter()
+    threads = [threading.Thread(target=terminal, args=(n,), name=f"terminal-{n}") for n in range(terminals)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - started
+    monitor.stopped.set()
+    monitor.join()
+
+    time.sleep(1.0)  # Let the statistics collector publish the deadlock counter
+    with get_connection() as (conn, error):
+        if error or not conn:
+            raise RuntimeError(error or "No database connection")
+        cur = conn.cursor()
+        deadlocks = _deadlocks(cur) - deadlocks_before
+        cur.execute("SELECT medicine_id, quantity FROM medicines WHERE quantity < 0 ORDER BY medicine_id")
+        negative = cur.fetchall()
+        # Stock must equal its starting value plus every ledger movement written during the run;
+        # a mismatch means an update was lost or stock moved without a log row
+        cur.execute("""
+            SELECT m.medicine_id, m.quantity, COALESCE(SUM(l.quantity_change), 0)
+            FROM medicines m
+            LEFT JOIN stock_logs l ON l.medicine_id = m.medicine_id AND l.log_id > %s
+            WHERE m.medicine_id = ANY(%s)
+            GROUP BY m.medicine_id, m.quantity
+        """, (last_log_id, medicine_ids))
+        drift = [
+            {'medicine_id': medicine_id, 'expected': before[medicine_id] + delta, 'actual': quantity}
+            for medicine_id, quantity, delta in cur.fetchall()
+            if medicine_id in before and before[medicine_id] + delta != quantity
+        ]
+        conn.rollback()
+
+    completed = sum(sum(counts.values()) for counts in outcomes.values())
+    return {
+        'terminals': terminals,
+        'duration_s': wall,
+        'zipf_exponent': exponent,
+        'throughput_per_sec': completed / wall if wall > 0 else 0.0,
+        'sales_per_sec': outcomes['sale']['ok'] / wall if wall > 0 else 0.0,
+        'operations': {
+            op: {**summarize(latencies[op]), 'outcomes': dict(outcomes[op])} for op in operations if latencies[op]
+        },
+        'lock_waits': monitor.summary(),
+        'deadlocks': {'server': deadlocks, 'client': sum(counts['deadlock'] for counts in outcomes.values())},
+        'anomalies': {'negative_stock': [list(row) for row in negative], 'ledger_drift': drift},
+    }
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Simulate concurrent cashier terminals against the database chosen by PHARMACY_DB_TARGET")
+    parser.add_argument('--terminals', type=int, default=TERMINALS)
+    parser.add_argument('--duration', type=float, default=DURATION, help="seconds")
+    parser.add_argument('--catalog', type=int, default=CATALOG_SIZE, help="medicines carts are drawn from")
+    parser.add_argument('--zipf', type=float, default=ZIPF_EXPONENT, help="popularity skew exponent")
+    parser.add_argument('--hot-stock', type=int, help="start the 10 most popular medicines with this much stock")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--json', action='store_true', help="print the full report as JSON")
+    args = parser.parse_args()
+
+    report = run(args.terminals, args.duration, args.catalog, args.zipf, args.hot_stock, args.seed)
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    print(f"{report['terminals']} terminals, {report['duration_s']:.1f}s: "
+          f"{report['throughput_per_sec']:.1f} ops/s, {report['sales_per_sec']:.1f} sales/s")
+    for op, stats in report['operations'].items():
+        outcomes = ', '.join(f"{k} {v}" for k, v in sorted(stats['outcomes'].items()))
+        print(f"  {op:<9} p50 {stats['p50_ms']:7.1f} ms  p95 {stats['p95_ms']:7.1f} ms  "
+              f"p99 {stats['p99_ms']:7.1f} ms  ({outcomes})")
+    waits = report['lock_waits']
+    print(f"  lock waits: mean {waits['mean_waiting']:.2f} sessions, max {waits['max_waiting']}, "
+          f"{waits['time_with_waiters']:.0%} of samples")
+    print(f"  deadlocks: {report['deadlocks']['server']} (server), {report['deadlocks']['client']} (seen by terminals)")
+    anomalies = report['anomalies']
+    print(f"  anomalies: {len(anomalies['negative_stock'])} negative stock, {len(anomalies['ledger_drift'])} ledger drift")
+
+if __name__ == "__main__":
+    main()
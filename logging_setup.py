@@ -0,0 +1,173 @@
+import atexit
+import copy
+import functools
+import json
+import logging
+import logging.handlers
+import queue
+import threading
+import time
+from datetime import datetime, timezone
+from config import config
+
+logger = logging.getLogger(__name__)
+
+# Defaults used when database.ini has no [logging] section
+LOGGING_DEFAULTS = {
+    'level': 'INFO',
+    'file': 'pharmacy_app.log',
+    'format': 'text',  # 'text' or 'json' (one JSON object per line)
+    'max_bytes': 10 * 1024 * 1024,  # rotate at this size...
+    'rotate_when': '',  # ...or by time instead, e.g. 'midnight' or 'h' (see TimedRotatingFileHandler)
+    'backup_count': 5,
+    'console': True,
+}
+
+TEXT_FORMAT = "%(asctime)s - %(levelname)s - %(message)s"
+
+_listener = None
+_setup_lock = threading.Lock()
+
+def _as_bool(value):
+    return value if isinstance(value, bool) else str(value).strip().lower() in ('1', 'true', 'yes', 'on')
+
+def logging_settings():
+    """Read the optional [logging] section of database.ini, falling back to LOGGING_DEFAULTS."""
+    settings = dict(LOGGING_DEFAULTS)
+    try:
+        params = config(section='logging')
+    except Exception:
+        params = {}
+    for key, default in LOGGING_DEFAULTS.items():
+        if key in params:
+            settings[key] = _as_bool(params[key]) if isinstance(default, bool) else type(default)(params[key])
+    return settings
+
+def module_levels():
+    """
+    Per-logger levels from the optional [log_levels] section, e.g. sales = WARNING keeps the
+    checkout path quiet in production while everything else stays at the [logging] level.
+    """
+    try:
+        params = config(section='log_levels')
+    except Exception:
+        return {}
+    return {name: value.strip().upper() for name, value in params.items()}
+
+class JsonFormatter(logging.Formatter):
+    """
+    One JSON object per line. operation defaults to module.function; duration_ms appears when
+    the call passed it (see timed()).
+    """
+
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'operation': getattr(record, 'operation', f"{record.module}.{record.funcName}"),
+            'message': record.getMessage(),
+            'thread': record.threadName,
+        }
+        duration_ms = getattr(record, 'duration_ms', None)
+        if duration_ms is not None:
+            entry['duration_ms'] = round(duration_ms, 3)
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """
+    The stock prepare() formats the whole record, tracebacks included, on the calling thread.
+    The queue never leaves this process, so only merge the arguments (they may change after
+    the call returns) and leave formatting to the listener thread.
+    """
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+def _file_handler(settings):
+    if settings['rotate_when']:
+        handler = logging.handlers.TimedRotatingFileHandler(
+            settings['file'], when=settings['rotate_when'], backupCount=settings['backup_count'], encoding='utf-8')
+    else:
+        handler = logging.handlers.RotatingFileHandler(
+            settings['file'], maxBytes=settings['max_bytes'], backupCount=settings['backup_count'], encoding='utf-8')
+    return handler
+
+def setup_logging():
+    """
+    Route every log record through an in-memory queue to a background thread that does the
+    formatting and disk I/O, so logging never blocks a checkout on the file system.
+    Safe to call more than once; only the first call configures anything. Records still
+    queued at exit are written out before the process ends.
+    """
+    global _listener
+    with _setup_lock:
+        if _listener is not None:
+            return _listener
+        settings = logging_settings()
+        formatter = JsonFormatter() if settings['format'] == 'json' else logging.Formatter(TEXT_FORMAT)
+        handlers = [_file_handler(settings)]
+        if settings['console']:
+            handlers.append(logging.StreamHandler())
+        for handler in handlers:
+            handler.setFormatter(formatter)
+
+        records = queue.SimpleQueue()
+        root = logging.getLogger()
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        root.addHandler(_QueueHandler(records))
+        _listener = logging.handlers.QueueListener(records, *handlers, respect_handler_level=True)
+        _listener.start()
+        atexit.register(stop_logging)
+        try:
+            root.setLevel(settings['level'].upper())
+        except ValueError as e:
+            logger.error(f"❌ Invalid [logging] level: {e}")
+        for name, level in module_levels().items():
+            try:
+                logging.getLogger(name).setLevel(level)
+            except ValueError as e:
+                logger.error(f"❌ Invalid [log_levels] level for {name}: {e}")
+        return _listener
+
+def stop_logging():
+    """Write out queued records and close the log files."""
+    global _listener
+    with _setup_lock:
+        listener, _listener = _listener, None
+    if listener is not None:
+        listener.stop()
+        for handler in listener.handlers:
+            handler.close()
+
+def timed(operation=None, level=logging.DEBUG):
+    """
+    Decorator that logs how long each call took, as a record carrying operation and duration_ms
+    (fields of their own in JSON logs). At the default DEBUG level it costs a level check unless
+    enabled for the module in [log_levels].
+    """
+    def decorator(func):
+        name = operation or f"{func.__module__}.{func.__name__}"
+        log = logging.getLogger(func.__module__)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not log.isEnabledFor(level):
+                return func(*args, **kwargs)
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                duration_ms = (time.perf_counter() - started) * 1000
+                log.log(level, f"✅ {name} took {duration_ms:.1f} ms",
+                        extra={'operation': name, 'duration_ms': duration_ms})
+        return wrapper
+    return decorator
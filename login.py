@@ -1,31 +1,89 @@
-from connections import create_connection
+import hmac
+import logging
+from connections import get_connection
+from metrics import measured
+from passwords import SECURITY_DEFAULTS, dummy_verify, hash_password, is_hashed, needs_rehash, security_settings, verify_password
+from session import Session
 
-def login(username, password):
-    conn, error = create_connection()  # ✅ Unpack the tuple properly
-    if error or not conn:
-        print(f"❌ Database connection failed: {error}")
-        return None, None
+logger = logging.getLogger(__name__)
 
+def _security_settings():
+    """security_settings(), or the defaults when [security] is malformed, so a bad value cannot lock everyone out."""
     try:
-        cur = conn.cursor()
-        query = """
-            SELECT u.user_id, u.username, r.role_name
-            FROM users u
-            JOIN roles r ON u.role_id = r.role_id
-            WHERE u.username = %s AND u.password = %s
-        """
-        cur.execute(query, (username, password))
-        result = cur.fetchone()
-        conn.close()
-
-        if result:
-            user_id, username, role = result
-            return username, role
-        else:
-            print("❌ Invalid username or password.")
-            return None, None
-
-    except Exception as e:
-        print("❌ Query error:", e)
-        conn.close()
-        return None, None
+        return security_settings()
+    except ValueError as e:
+        logger.error(f"❌ Invalid [security] settings, using defaults: {e}")
+        return dict(SECURITY_DEFAULTS)
+
+def _check_password(password, stored):
+    """Verify against a hash, or against a legacy plaintext password stored before hashing."""
+    if is_hashed(stored):
+        return verify_password(password, stored)
+    return hmac.compare_digest(password.encode('utf-8'), stored.encode('utf-8'))
+
+def _rehash(user_id, password, stored, settings):
+    """
+    Store a fresh hash after a successful login with a plaintext or outdated hash.
+    The update only applies if the password hasn't changed meanwhile. Returns the new
+    session_version (bumped by the users trigger), or None if nothing was updated.
+    """
+    new_hash = hash_password(password, settings)  # Hash before borrowing a connection; it takes a while
+    with get_connection() as (conn, error):
+        if error or not conn:
+            logger.error(f"❌ Could not upgrade password hash: {error}")
+            return None
+        try:
+            cur = conn.cursor()
+            cur.execute(
+                "UPDATE users SET password = %s WHERE user_id = %s AND password = %s RETURNING session_version",
+                (new_hash, user_id, stored)
+            )
+            row = cur.fetchone()
+            conn.commit()
+            return row[0] if row else None
+        except Exception as e:
+            logger.error(f"❌ Could not upgrade password hash: {e}")
+            return None
+
+@measured()
+def login(username, password):
+    """
+    Check credentials and start a session.
+    The stored hash is fetched by username and verified here, outside the database, after
+    the pooled connection has been returned. Legacy plaintext passwords and hashes made with
+    older cost settings are upgraded transparently.
+    Returns (session, error): session is a Session or None, error is a string or None.
+    """
+    with get_connection() as (conn, error):  # ✅ Borrow a pooled connection
+        if error or not conn:
+            logger.error(f"❌ Database connection failed: {error}")
+            return None, f"Database connection failed: {error}"
+
+        try:
+            cur = conn.cursor()
+            query = """
+                SELECT u.user_id, u.username, r.role_name, u.session_version, u.password
+                FROM users u
+                JOIN roles r ON u.role_id = r.role_id
+                WHERE u.username = %s
+            """
+            cur.execute(query, (username,))
+            result = cur.fetchone()
+        except Exception as e:
+            logger.error(f"❌ Query error: {e}")
+            return None, f"Login failed: {str(e)}"
+
+    if not result:
+        dummy_verify(password, _security_settings())  # Unknown users take as long as wrong passwords
+        logger.warning("❌ Invalid username or password.")
+        return None, "Invalid username or password."
+
+    user_id, username, role, version, stored = result
+    if not _check_password(password, stored):
+        logger.warning("❌ Invalid username or password.")
+        return None, "Invalid username or password."
+
+    settings = _security_settings()
+    if needs_rehash(stored, settings):
+        version = _rehash(user_id, password, stored, settings) or version
+    return Session(user_id, username, role, version), None
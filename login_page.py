@@ -1,7 +1,59 @@
+import startup_timing
+startup_timing.enable_from_environment()  # First, so the report covers every import after it
+
+import threading
 import tkinter as tk
 from tkinter import messagebox
-from login import login
-from dashboard_page import show_dashboard
+
+# The data layer, psycopg2 and the pages are not imported here: the schema check runs on a
+# background thread once the window is up, and the dashboard is imported on login
+# done is set by the startup thread; shown, ready and reported only on the Tk thread
+startup = {'done': False, 'error': None, 'shown': False, 'ready': False, 'reported': False}
+
+def prepare_database():
+    """Off the UI thread: metrics, schema upgrade, housekeeping, and importing login so the first click is quick."""
+    try:
+        from metrics import start_metrics
+        from migrate import upgrade
+        from db_executor import get_executor
+        from stock_history import ensure_snapshot
+        from stock_partitions import ensure_partitions
+        import login  # noqa: F401
+
+        # Per-operation latency on localhost /metrics and/or a snapshot file ([metrics] in database.ini)
+        start_metrics()
+        applied, schema_error = upgrade()
+        if not schema_error:
+            # Upcoming stock_logs partitions and the daily stock snapshot; only one terminal does each
+            get_executor().submit(ensure_partitions)
+            get_executor().submit(ensure_snapshot)
+        startup['error'] = schema_error
+    except Exception as e:
+        startup['error'] = str(e)
+    startup['done'] = True
+
+def startup_milestone(label):
+    """Mark label; the report is printed once, after both the window and the database are ready."""
+    startup_timing.mark(label)
+    if startup['shown'] and startup['ready'] and not startup['reported']:
+        startup['reported'] = True
+        startup_timing.print_report()
+
+def on_first_map(event):
+    if event.widget is root and not startup['shown']:
+        startup['shown'] = True
+        startup_milestone("login window shown")
+
+def wait_for_database():
+    """Poll from the Tk thread until prepare_database() finishes, then enable Login."""
+    if not startup['done']:
+        root.after(50, wait_for_database)
+        return
+    login_btn.config(state="normal", text="Login")
+    startup['ready'] = True
+    startup_milestone("database ready")
+    if startup['error']:
+        messagebox.showerror("Database Error", f"Could not update the database schema:\n{startup['error']}")
 
 def handle_login():
     username = entry_username.get()
@@ -11,20 +63,28 @@ def handle_login():
         messagebox.showerror("Input Error", "Both fields are required!")
         return
 
-    # Get both username and role
-    user, role = login(username, password)
+    # Already imported by prepare_database(); this only looks it up
+    from login import login
 
-    if user and role:
+    # The session carries user_id, username, role and permissions to every page
+    session, error = login(username, password)
+
+    if session:
+        from dashboard_page import show_dashboard
         root.destroy()  # ✅ Close login window
-        show_dashboard(user, role)  # ✅ Pass both values to dashboard
+        show_dashboard(session)  # ✅ Pages reuse the session instead of looking the user up again
     else:
-        messagebox.showerror("Login Failed", "Invalid username or password.")
+        messagebox.showerror("Login Failed", error or "Invalid username or password.")
 
 # --- GUI Setup ---
 root = tk.Tk()
 root.title("Pharmacy Management Login")
 root.geometry("1920x1080")
 root.config(bg="#dafad9")
+root.bind("<Map>", on_first_map)
+
+# --- Bring the database schema up to date in the background; Login waits for it ---
+threading.Thread(target=prepare_database, name="startup", daemon=True).start()
 
 # --- Login Frame ---
 frame = tk.Frame(root, bg="#81f77c", bd=2, relief="flat")
@@ -57,11 +117,12 @@ entry_password = tk.Entry(frame, font=("Helvetica", 12), show="*", bg="#ecfceb",
 entry_password.place(x=100, y=153, width=230, height=30)
 
 # --- Login Button ---
-login_btn = tk.Button(frame, text="Login", font=("Helvetica", 15, "bold"), bg="#ff0008", fg="#fff", relief="flat", command=handle_login)
+login_btn = tk.Button(frame, text="Connecting…", state="disabled", font=("Helvetica", 15, "bold"), bg="#ff0008", fg="#fff", relief="flat", command=handle_login)
 login_btn.place(x=163, y=210, width=120, height=45)
 
 # --- Footer ---
 footer = tk.Label(root, text="Pharmacy Management System", font=("Helvetica", 10), bg="#E8F0FE", fg="#333")
 footer.pack(side="bottom", pady=10)
 
+wait_for_database()
 root.mainloop()
@@ -1,31 +1,36 @@
 import logging
-from connections import create_connection
+from connections import get_connection
+from metrics import measured
+from query_cache import cached, invalidates
 
-# Configure logging (move to dashboard.py)
+# Logging is configured by logging_setup (through connections)
 logger = logging.getLogger(__name__)
 
+@measured()
+@cached("medicines")
 def fetch_all_medicines():
     """Fetch all medicines. Returns (medicines, error)."""
-    conn, error = create_connection()
-    if error or not conn:
-        logger.error(f"❌ Failed to fetch medicines: {error or 'No connection'}")
-        return [], error or "No database connection"
-    try:
-        cur = conn.cursor()
-        cur.execute("""
-            SELECT medicine_id, name, quantity, price
-            FROM medicines
-            ORDER BY medicine_id
-        """)
-        medicines = cur.fetchall()
-        logger.info("✅ Successfully fetched medicines")
-        return medicines, None
-    except Exception as e:
-        logger.error(f"❌ Error fetching medicines: {e}")
-        return [], f"Error fetching medicines: {str(e)}"
-    finally:
-        conn.close()
+    with get_connection() as (conn, error):
+        if error or not conn:
+            logger.error(f"❌ Failed to fetch medicines: {error or 'No connection'}")
+            return [], error or "No database connection"
+        try:
+            cur = conn.cursor()
+            cur.execute("""
+                SELECT medicine_id, name, quantity, price
+                FROM medicines
+                WHERE retired_at IS NULL
+                ORDER BY medicine_id
+            """)
+            medicines = cur.fetchall()
+            logger.info("✅ Successfully fetched medicines")
+            return medicines, None
+        except Exception as e:
+            logger.error(f"❌ Error fetching medicines: {e}")
+            return [], f"Error fetching medicines: {str(e)}"
 
+@measured()
+@invalidates("medicines")
 def add_medicine(name, quantity, price):
     """Add a new medicine. Returns (success, error)."""
     if not name or quantity is None or price is None:
@@ -34,30 +39,40 @@ def add_medicine(name, quantity, price):
     if quantity < 0 or price < 0:
         logger.error("❌ Quantity and price must be non-negative")
         return False, "Quantity and price must be non-negative"
-    conn, error = create_connection()
-    if error or not conn:
-        logger.error(f"❌ Failed to add medicine: {error or 'No connection'}")
-        return False, error or "No database connection"
-    try:
-        cur = conn.cursor()
-        # Check if name is unique
-        cur.execute("SELECT medicine_id FROM medicines WHERE name = %s", (name,))
-        if cur.fetchone():
-            logger.error(f"❌ Medicine name already exists: {name}")
-            return False, f"Medicine name already exists: {name}"
-        cur.execute("""
-            INSERT INTO medicines (name, quantity, price)
-            VALUES (%s, %s, %s)
-        """, (name, quantity, price))
-        conn.commit()
-        logger.info(f"✅ Added medicine: {name}")
-        return True, None
-    except Exception as e:
-        logger.error(f"❌ Error adding medicine: {e}")
-        return False, f"Error adding medicine: {str(e)}"
-    finally:
-        conn.close()
+    with get_connection() as (conn, error):
+        if error or not conn:
+            logger.error(f"❌ Failed to add medicine: {error or 'No connection'}")
+            return False, error or "No database connection"
+        try:
+            cur = conn.cursor()
+            # Check if name is unique
+            cur.execute("SELECT retired_at FROM medicines WHERE name = %s", (name,))
+            existing = cur.fetchone()
+            if existing and existing[0] is not None:
+                logger.error(f"❌ Medicine name belongs to a retired medicine: {name}")
+                return False, f"Medicine name belongs to a retired medicine: {name}"
+            if existing:
+                logger.error(f"❌ Medicine name already exists: {name}")
+                return False, f"Medicine name already exists: {name}"
+            # The opening stock goes into stock_logs too, so the ledger accounts for all of it
+            cur.execute("""
+                WITH added AS (
+                    INSERT INTO medicines (name, quantity, price)
+                    VALUES (%(name)s, %(quantity)s, %(price)s)
+                    RETURNING medicine_id, quantity
+                )
+                INSERT INTO stock_logs (medicine_id, change_type, quantity_change)
+                SELECT medicine_id, 'initial', quantity FROM added WHERE quantity <> 0
+            """, {'name': name, 'quantity': quantity, 'price': price})
+            conn.commit()
+            logger.info(f"✅ Added medicine: {name}")
+            return True, None
+        except Exception as e:
+            logger.error(f"❌ Error adding medicine: {e}")
+            return False, f"Error adding medicine: {str(e)}"
 
+@measured()
+@invalidates("medicines")
 def update_medicine(medicine_id, name, quantity, price):
     """Update an existing medicine. Returns (success, error)."""
     if not name or quantity is None or price is None:
@@ -66,64 +81,107 @@ def update_medicine(medicine_id, name, quantity, price):
     if quantity < 0 or price < 0:
         logger.error("❌ Quantity and price must be non-negative")
         return False, "Quantity and price must be non-negative"
-    conn, error = create_connection()
-    if error or not conn:
-        logger.error(f"❌ Failed to update medicine: {error or 'No connection'}")
-        return False, error or "No database connection"
-    try:
-        cur = conn.cursor()
-        # Check if name is unique (excluding current medicine)
-        cur.execute("SELECT medicine_id FROM medicines WHERE name = %s AND medicine_id != %s", (name, medicine_id))
-        if cur.fetchone():
-            logger.error(f"❌ Medicine name already exists: {name}")
-            return False, f"Medicine name already exists: {name}"
-        cur.execute("""
-            UPDATE medicines
-            SET name = %s, quantity = %s, price = %s
-            WHERE medicine_id = %s
-        """, (name, quantity, price, medicine_id))
-        if cur.rowcount == 0:
-            logger.warning(f"❌ No medicine found with medicine_id: {medicine_id}")
-            return False, f"No medicine found with medicine_id: {medicine_id}"
-        conn.commit()
-        logger.info(f"✅ Updated medicine ID: {medicine_id}")
-        return True, None
-    except Exception as e:
-        logger.error(f"❌ Error updating medicine: {e}")
-        return False, f"Error updating medicine: {str(e)}"
-    finally:
-        conn.close()
+    with get_connection() as (conn, error):
+        if error or not conn:
+            logger.error(f"❌ Failed to update medicine: {error or 'No connection'}")
+            return False, error or "No database connection"
+        try:
+            cur = conn.cursor()
+            # Check if name is unique (excluding current medicine)
+            cur.execute("SELECT medicine_id FROM medicines WHERE name = %s AND medicine_id != %s", (name, medicine_id))
+            if cur.fetchone():
+                logger.error(f"❌ Medicine name already exists: {name}")
+                return False, f"Medicine name already exists: {name}"
+            # Log the difference from the stock the row held, so hand corrections appear in the ledger
+            cur.execute("""
+                WITH previous AS (
+                    SELECT medicine_id, quantity FROM medicines
+                    WHERE medicine_id = %(medicine_id)s
+                    FOR UPDATE
+                ),
+                updated AS (
+                    UPDATE medicines m
+                    SET name = %(name)s, quantity = %(quantity)s, price = %(price)s
+                    FROM previous p
+                    WHERE m.medicine_id = p.medicine_id
+                    RETURNING m.medicine_id, m.quantity - p.quantity AS change
+                ),
+                logged AS (
+                    INSERT INTO stock_logs (medicine_id, change_type, quantity_change)
+                    SELECT medicine_id, 'adjustment', change FROM updated WHERE change <> 0
+                )
+                SELECT medicine_id FROM updated
+            """, {'medicine_id': medicine_id, 'name': name, 'quantity': quantity, 'price': price})
+            if cur.fetchone() is None:
+                logger.warning(f"❌ No medicine found with medicine_id: {medicine_id}")
+                return False, f"No medicine found with medicine_id: {medicine_id}"
+            conn.commit()
+            logger.info(f"✅ Updated medicine ID: {medicine_id}")
+            return True, None
+        except Exception as e:
+            logger.error(f"❌ Error updating medicine: {e}")
+            return False, f"Error updating medicine: {str(e)}"
 
+@measured()
+@invalidates("medicines")
 def delete_medicine(medicine_id):
-    """Delete a medicine. Returns (success, error)."""
+    """
+    Delete a medicine, or retire it when stock_logs holds its opening stock or adjustments.
+    Returns (success, error).
+    """
     if not medicine_id:
         logger.error("❌ No medicine_id provided")
         return False, "No medicine_id provided"
-    conn, error = create_connection()
-    if error or not conn:
-        logger.error(f"❌ Failed to delete medicine: {error or 'No connection'}")
-        return False, error or "No database connection"
-    try:
-        cur = conn.cursor()
-        # Check for dependencies in sales_details
-        cur.execute("SELECT sale_id FROM sales_details WHERE medicine_id = %s LIMIT 1", (medicine_id,))
-        if cur.fetchone():
-            logger.error(f"❌ Cannot delete medicine ID {medicine_id}: used in sales")
-            return False, f"Cannot delete medicine: used in sales"
-        # Check for dependencies in purchase_details
-        cur.execute("SELECT purchase_id FROM purchase_details WHERE medicine_id = %s LIMIT 1", (medicine_id,))
-        if cur.fetchone():
-            logger.error(f"❌ Cannot delete medicine ID {medicine_id}: used in purchases")
-            return False, f"Cannot delete medicine: used in purchases"
-        cur.execute("DELETE FROM medicines WHERE medicine_id = %s", (medicine_id,))
-        if cur.rowcount == 0:
-            logger.warning(f"❌ No medicine found with medicine_id: {medicine_id}")
-            return False, f"No medicine found with medicine_id: {medicine_id}"
-        conn.commit()
-        logger.info(f"✅ Deleted medicine ID: {medicine_id}")
-        return True, None
-    except Exception as e:
-        logger.error(f"❌ Error deleting medicine: {e}")
-        return False, f"Error deleting medicine: {str(e)}"
-    finally:
-        conn.close()
\ No newline at end of file
+    with get_connection() as (conn, error):
+        if error or not conn:
+            logger.error(f"❌ Failed to delete medicine: {error or 'No connection'}")
+            return False, error or "No database connection"
+        try:
+            cur = conn.cursor()
+            # Check for dependencies in sales_details
+            cur.execute("SELECT sale_id FROM sales_details WHERE medicine_id = %s LIMIT 1", (medicine_id,))
+            if cur.fetchone():
+                logger.error(f"❌ Cannot delete medicine ID {medicine_id}: used in sales")
+                return False, f"Cannot delete medicine: used in sales"
+            # Check for dependencies in purchase_details
+            cur.execute("SELECT purchase_id FROM purchase_details WHERE medicine_id = %s LIMIT 1", (medicine_id,))
+            if cur.fetchone():
+                logger.error(f"❌ Cannot delete medicine ID {medicine_id}: used in purchases")
+                return False, f"Cannot delete medicine: used in purchases"
+            # stock_logs is the audit trail that point-in-time stock replays and its rows reference
+            # the medicine, so one with opening stock or adjustments on record is retired instead:
+            # a closing adjustment takes its stock to zero and it leaves the lists
+            cur.execute("SELECT log_id FROM stock_logs WHERE medicine_id = %s LIMIT 1", (medicine_id,))
+            if cur.fetchone():
+                cur.execute("""
+                    WITH previous AS (
+                        SELECT medicine_id, quantity FROM medicines
+                        WHERE medicine_id = %(medicine_id)s AND retired_at IS NULL
+                        FOR UPDATE
+                    ),
+                    retired AS (
+                        UPDATE medicines m
+                        SET quantity = 0, retired_at = now()
+                        FROM previous p
+                        WHERE m.medicine_id = p.medicine_id
+                        RETURNING m.medicine_id, -p.quantity AS change
+                    ),
+                    logged AS (
+                        INSERT INTO stock_logs (medicine_id, change_type, quantity_change)
+                        SELECT medicine_id, 'adjustment', change FROM retired WHERE change <> 0
+                    )
+                    SELECT medicine_id FROM retired
+                """, {'medicine_id': medicine_id})
+                action = "Retired"
+            else:
+                cur.execute("DELETE FROM medicines WHERE medicine_id = %s RETURNING medicine_id", (medicine_id,))
+                action = "Deleted"
+            if cur.fetchone() is None:
+                logger.warning(f"❌ No medicine found with medicine_id: {medicine_id}")
+                return False, f"No medicine found with medicine_id: {medicine_id}"
+            conn.commit()
+            logger.info(f"✅ {action} medicine ID: {medicine_id}")
+            return True, None
+        except Exception as e:
+            logger.error(f"❌ Error deleting medicine: {e}")
+            return False, f"Error deleting medicine: {str(e)}"
\ No newline at end of file
@@ -1,13 +1,14 @@
 import tkinter as tk
-from tkinter import messagebox, ttk
+from tkinter import filedialog, messagebox, ttk
 import logging
 from manage_medicines import fetch_all_medicines, add_medicine, update_medicine, delete_medicine
-from connections import get_user_details, create_connection
+from catalog_import import preview_catalog, import_catalog, iter_catalog_csv, describe
+from db_executor import TaskRunner, busy_indicator
 
-# Configure logging (move to dashboard.py)
+# Logging is configured by logging_setup (through connections)
 logger = logging.getLogger(__name__)
 
-def show_manage_medicines(username):
+def show_manage_medicines(session):
     window = tk.Toplevel()
     window.title("Manage Medicines")
     window.geometry("1000x600")
@@ -21,22 +22,19 @@ def show_manage_medicines(username):
     main_frame = tk.Frame(window, bg="#d7f7f2")
     main_frame.pack(pady=10, fill=tk.BOTH, expand=True)
 
-    # Verify owner role
-    user_data = get_user_details(username)
-    if not user_data:
-        error_label.config(text="Failed to fetch user details.")
-        logger.error(f"❌ Failed to fetch user details for {username}")
-        main_frame.pack_forget()
-        tk.Button(window, text="Close", command=window.destroy, bg="#FF4444", fg="white", font=("Helvetica", 14)).pack(pady=10)
-        return
-    user_id, username, role = user_data
-    if role.lower() != 'owner':
-        error_label.config(text="Unauthorized access. Owner privileges required.")
-        logger.error(f"❌ Unauthorized access for {username}: role is {role}")
+    # Verify owner role (the session re-checks its version stamp at most once a minute)
+    allowed, error = session.authorize("manage_medicines")
+    if not allowed:
+        error_label.config(text=error)
         main_frame.pack_forget()
         tk.Button(window, text="Close", command=window.destroy, bg="#FF4444", fg="white", font=("Helvetica", 14)).pack(pady=10)
         return
 
+    # Database calls run in the background; the status label shows when one is in flight
+    status_label = tk.Label(main_frame, text="", bg="#d7f7f2", font=("Helvetica", 10))
+    status_label.pack()
+    runner = TaskRunner(window, on_busy=busy_indicator(window, status_label))
+
     # Treeview
     tree_frame = tk.Frame(main_frame, bg="#d7f7f2")
     tree_frame.pack(pady=10, fill=tk.BOTH, expand=True)
@@ -79,16 +77,21 @@ def show_manage_medicines(username):
     tk.Button(btn_frame, text="Add", bg="#4CAF50", fg="white", font=("Helvetica", 12), command=lambda: handle_add()).grid(row=0, column=0, padx=10)
     tk.Button(btn_frame, text="Update", bg="orange", fg="white", font=("Helvetica", 12), command=lambda: handle_update()).grid(row=0, column=1, padx=10)
     tk.Button(btn_frame, text="Delete", bg="#FF4444", fg="white", font=("Helvetica", 12), command=lambda: handle_delete()).grid(row=0, column=2, padx=10)
+    tk.Button(btn_frame, text="Import Catalog", bg="#2196F3", fg="white", font=("Helvetica", 12), command=lambda: handle_import()).grid(row=0, column=3, padx=10)
 
     def refresh_medicine_list():
+        """Reload the medicine list in the background; repeated clicks share one reload."""
+        runner.submit(fetch_all_medicines, callback=show_medicines, on_error=show_unexpected_error, key="refresh")
+
+    def show_medicines(result):
         try:
-            for row in tree.get_children():
-                tree.delete(row)
-            medicines, error = fetch_all_medicines()
+            medicines, error = result
             if error:
                 error_label.config(text=error)
                 logger.error(f"❌ Failed to fetch medicines: {error}")
                 return
+            for row in tree.get_children():
+                tree.delete(row)
             for med in medicines:
                 tree.insert("", "end", values=med)
             logger.info("✅ Refreshed medicine list")
@@ -96,6 +99,25 @@ def show_manage_medicines(username):
             error_label.config(text=f"Unexpected error: {str(e)}")
             logger.error(f"❌ Unexpected error in refresh_medicine_list: {e}", exc_info=True)
 
+    def show_unexpected_error(e):
+        error_label.config(text=f"Unexpected error: {str(e)}")
+        messagebox.showerror("Error", f"Unexpected error: {str(e)}")
+        logger.error(f"❌ Unexpected error in background call: {e}", exc_info=e)
+
+    def handle_saved(result, message, failure):
+        """Shared completion callback for add, update and delete."""
+        success, error = result
+        if success:
+            refresh_medicine_list()
+            clear_fields()
+            error_label.config(text="")
+            messagebox.showinfo("Success", message)
+            logger.info(f"✅ {message}")
+        else:
+            error_label.config(text=error or failure)
+            messagebox.showerror("Error", error or failure)
+            logger.error(f"❌ {failure} {error}")
+
     def handle_add():
         try:
             name = entry_name.get().strip()
@@ -113,17 +135,8 @@ def show_manage_medicines(username):
                 messagebox.showerror("Error", "Quantity and Price must be non-negative.")
                 logger.warning("❌ Invalid quantity or price")
                 return
-            success, error = add_medicine(name, qty, price)
-            if success:
-                refresh_medicine_list()
-                clear_fields()
-                error_label.config(text="")
-                messagebox.showinfo("Success", "Medicine added successfully.")
-                logger.info(f"✅ Added medicine: {name}")
-            else:
-                error_label.config(text=error or "Failed to add medicine.")
-                messagebox.showerror("Error", error or "Failed to add medicine.")
-                logger.error(f"❌ Failed to add medicine: {error}")
+            runner.submit(add_medicine, name, qty, price, key="save", coalesce=False, on_error=show_unexpected_error,
+                          callback=lambda result: handle_saved(result, f"Medicine {name} added successfully.", "Failed to add medicine."))
         except ValueError:
             error_label.config(text="Quantity and Price must be numbers.")
             messagebox.showerror("Error", "Quantity and Price must be numbers.")
@@ -157,17 +170,8 @@ def show_manage_medicines(username):
                 messagebox.showerror("Error", "Quantity and Price must be non-negative.")
                 logger.warning("❌ Invalid quantity or price")
                 return
-            success, error = update_medicine(med_id, name, qty, price)
-            if success:
-                refresh_medicine_list()
-                clear_fields()
-                error_label.config(text="")
-                messagebox.showinfo("Success", "Medicine updated successfully.")
-                logger.info(f"✅ Updated medicine ID: {med_id}")
-            else:
-                error_label.config(text=error or "Failed to update medicine.")
-                messagebox.showerror("Error", error or "Failed to update medicine.")
-                logger.error(f"❌ Failed to update medicine: {error}")
+            runner.submit(update_medicine, med_id, name, qty, price, key="save", coalesce=False, on_error=show_unexpected_error,
+                          callback=lambda result: handle_saved(result, f"Medicine ID {med_id} updated successfully.", "Failed to update medicine."))
         except ValueError:
             error_label.config(text="Quantity and Price must be numbers.")
             messagebox.showerror("Error", "Quantity and Price must be numbers.")
@@ -189,22 +193,50 @@ def show_manage_medicines(username):
             if not messagebox.askyesno("Confirm", "Are you sure you want to delete this medicine?"):
                 logger.info("✅ Deletion cancelled by user")
                 return
-            success, error = delete_medicine(med_id)
-            if success:
-                refresh_medicine_list()
-                clear_fields()
-                error_label.config(text="")
-                messagebox.showinfo("Success", "Medicine deleted successfully.")
-                logger.info(f"✅ Deleted medicine ID: {med_id}")
-            else:
-                error_label.config(text=error or "Failed to delete medicine.")
-                messagebox.showerror("Error", error or "Failed to delete medicine.")
-                logger.error(f"❌ Failed to delete medicine: {error}")
+            runner.submit(delete_medicine, med_id, key="save", coalesce=False, on_error=show_unexpected_error,
+                          callback=lambda result: handle_saved(result, f"Medicine ID {med_id} deleted successfully.", "Failed to delete medicine."))
         except Exception as e:
             error_label.config(text=f"Unexpected error: {str(e)}")
             messagebox.showerror("Error", f"Unexpected error: {str(e)}")
             logger.error(f"❌ Unexpected error in handle_delete: {e}", exc_info=True)
 
+    def handle_import():
+        """Preview a catalog or price list CSV, then apply it in one transaction once confirmed."""
+        path = filedialog.askopenfilename(parent=window, title="Import catalog or price list",
+                                          filetypes=[("CSV files", "*.csv"), ("All files", "*.*")])
+        if not path:
+            return
+
+        def show_preview(result):
+            summary, error = result
+            if error:
+                error_label.config(text=error)
+                messagebox.showerror("Error", error)
+                return
+            if summary['new'] == 0 and summary['changed'] == 0:
+                messagebox.showinfo("Import Catalog", describe(summary) + "\n\nNothing to import.")
+                return
+            if not messagebox.askyesno("Import Catalog", describe(summary) + "\n\nApply these changes?"):
+                logger.info("✅ Catalog import cancelled by user")
+                return
+            runner.submit(import_catalog, iter_catalog_csv(path), key="save", coalesce=False,
+                          callback=show_imported, on_error=show_unexpected_error)
+
+        def show_imported(result):
+            report, error = result
+            if error:
+                error_label.config(text=error)
+                messagebox.showerror("Error", error)
+                return
+            refresh_medicine_list()
+            error_label.config(text="")
+            messagebox.showinfo("Success", f"Added {report['new']} medicines and updated {report['changed']} prices "
+                                           f"in {report['seconds']:.1f}s ({report['rows_per_sec']:.0f} rows/s); "
+                                           f"{report['conflict']} conflicting rows skipped.")
+
+        runner.submit(preview_catalog, iter_catalog_csv(path), key="save", coalesce=False,
+                      callback=show_preview, on_error=show_unexpected_error)
+
     def clear_fields():
         entry_name.delete(0, tk.END)
         entry_quantity.delete(0, tk.END)
@@ -228,6 +260,7 @@ def show_manage_medicines(username):
     refresh_medicine_list()
 
     def on_close():
+        runner.close()
         window.destroy()
         logger.info("✅ Manage medicines page closed")
     window.protocol("WM_DELETE_WINDOW", on_close)
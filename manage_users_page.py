@@ -1,13 +1,13 @@
 import tkinter as tk
 from tkinter import messagebox, ttk
 import logging
-from manage_users import fetch_all_users, add_user, update_user, delete_user
-from connections import get_user_details, create_connection
+from manage_users import fetch_all_users, fetch_roles, add_user, update_user, delete_user
+from db_executor import TaskRunner, busy_indicator
 
-# Configure logging (move to dashboard.py)
+# Logging is configured by logging_setup (through connections)
 logger = logging.getLogger(__name__)
 
-def show_manage_users(username):
+def show_manage_users(session):
     window = tk.Toplevel()
     window.title("Manage Users")
     window.geometry("1920x1080")
@@ -21,43 +21,28 @@ def show_manage_users(username):
     main_frame = tk.Frame(window, bg="#d7f7f2")
     main_frame.pack(pady=10, fill=tk.BOTH, expand=True)
 
-    # Verify owner role
-    user_data = get_user_details(username)
-    if not user_data:
-        error_label.config(text="Failed to fetch user details.")
-        logger.error(f"❌ Failed to fetch user details for {username}")
-        main_frame.pack_forget()
-        tk.Button(window, text="Close", command=window.destroy, bg="#FF4444", fg="white", font=("Helvetica", 15)).pack(pady=10)
-        return
-    user_id, username, role = user_data
-    if role.lower() != 'owner':
-        error_label.config(text="Unauthorized access. Owner privileges required.")
-        logger.error(f"❌ Unauthorized access for {username}: role is {role}")
+    # Verify owner role (the session re-checks its version stamp at most once a minute)
+    allowed, error = session.authorize("manage_users")
+    if not allowed:
+        error_label.config(text=error)
         main_frame.pack_forget()
         tk.Button(window, text="Close", command=window.destroy, bg="#FF4444", fg="white", font=("Helvetica", 15)).pack(pady=10)
         return
 
     # Fetch roles for dropdown
-    conn, error = create_connection()
-    if error or not conn:
-        error_label.config(text=error or "Failed to connect to database.")
-        logger.error(f"❌ Failed to connect to database: {error or 'No connection'}")
+    roles, error = fetch_roles()
+    if error:
+        error_label.config(text=error)
+        logger.error(f"❌ Failed to fetch roles: {error}")
         main_frame.pack_forget()
         tk.Button(window, text="Close", command=window.destroy, bg="#FF4444", fg="white", font=("Helvetica", 15)).pack(pady=10)
         return
-    try:
-        cur = conn.cursor()
-        cur.execute("SELECT role_id, role_name FROM roles ORDER BY role_id")
-        roles = cur.fetchall()
-        role_dict = {role_name: role_id for role_id, role_name in roles}
-    except Exception as e:
-        error_label.config(text=f"Error fetching roles: {str(e)}")
-        logger.error(f"❌ Error fetching roles: {e}")
-        main_frame.pack_forget()
-        tk.Button(window, text="Close", command=lambda: (conn.close(), window.destroy()), bg="#FF4444", fg="white", font=("Helvetica", 15)).pack(pady=10)
-        return
-    finally:
-        conn.close()
+    role_dict = {role_name: role_id for role_id, role_name in roles}
+
+    # Database calls run in the background; the status label shows when one is in flight
+    status_label = tk.Label(main_frame, text="", bg="#d7f7f2", font=("Helvetica", 12))
+    status_label.pack()
+    runner = TaskRunner(window, on_busy=busy_indicator(window, status_label))
 
     # Treeview
     tree_frame = tk.Frame(main_frame, bg="#d7f7f2")
@@ -104,14 +89,18 @@ def show_manage_users(username):
     tk.Button(btn_frame, text="Delete User", bg="#FF4444", fg="white", font=("Helvetica", 15), command=lambda: handle_delete_user()).grid(row=0, column=2, padx=10)
 
     def refresh_user_list():
+        """Reload the user list in the background; repeated clicks share one reload."""
+        runner.submit(fetch_all_users, callback=show_users, on_error=show_unexpected_error, key="refresh")
+
+    def show_users(result):
         try:
-            for row in tree.get_children():
-                tree.delete(row)
-            users, error = fetch_all_users()
+            users, error = result
             if error:
                 error_label.config(text=error)
                 logger.error(f"❌ Failed to fetch users: {error}")
                 return
+            for row in tree.get_children():
+                tree.delete(row)
             for user in users:
                 tree.insert("", "end", values=user)
             logger.info("✅ Refreshed user list")
@@ -119,6 +108,25 @@ def show_manage_users(username):
             error_label.config(text=f"Unexpected error: {str(e)}")
             logger.error(f"❌ Unexpected error in refresh_user_list: {e}", exc_info=True)
 
+    def show_unexpected_error(e):
+        error_label.config(text=f"Unexpected error: {str(e)}")
+        messagebox.showerror("Error", f"Unexpected error: {str(e)}")
+        logger.error(f"❌ Unexpected error in background call: {e}", exc_info=e)
+
+    def handle_saved(result, message, failure):
+        """Shared completion callback for add, update and delete."""
+        success, error = result
+        if success:
+            refresh_user_list()
+            clear_fields()
+            error_label.config(text="")
+            messagebox.showinfo("Success", message)
+            logger.info(f"✅ {message}")
+        else:
+            error_label.config(text=error or failure)
+            messagebox.showerror("Error", error or failure)
+            logger.error(f"❌ {failure} {error}")
+
     def handle_add_user():
         try:
             username = entry_username.get().strip()
@@ -130,17 +138,8 @@ def show_manage_users(username):
                 logger.warning("❌ Missing required fields")
                 return
             role_id = role_dict.get(role_name)
-            success, error = add_user(username, password, role_id)
-            if success:
-                refresh_user_list()
-                clear_fields()
-                error_label.config(text="")
-                messagebox.showinfo("Success", "User added successfully.")
-                logger.info(f"✅ Added user: {username}")
-            else:
-                error_label.config(text=error or "Failed to add user.")
-                messagebox.showerror("Error", error or "Failed to add user.")
-                logger.error(f"❌ Failed to add user: {error}")
+            runner.submit(add_user, username, password, role_id, key="save", coalesce=False, on_error=show_unexpected_error,
+                          callback=lambda result: handle_saved(result, f"User {username} added successfully.", "Failed to add user."))
         except Exception as e:
             error_label.config(text=f"Unexpected error: {str(e)}")
             messagebox.showerror("Error", f"Unexpected error: {str(e)}")
@@ -164,17 +163,8 @@ def show_manage_users(username):
                 logger.warning("❌ Missing required fields")
                 return
             role_id = role_dict.get(role_name)
-            success, error = update_user(selected_user_id, username, password, role_id)
-            if success:
-                refresh_user_list()
-                clear_fields()
-                error_label.config(text="")
-                messagebox.showinfo("Success", "User updated successfully.")
-                logger.info(f"✅ Updated user ID: {selected_user_id}")
-            else:
-                error_label.config(text=error or "Failed to update user.")
-                messagebox.showerror("Error", error or "Failed to update user.")
-                logger.error(f"❌ Failed to update user: {error}")
+            runner.submit(update_user, selected_user_id, username, password, role_id, key="save", coalesce=False, on_error=show_unexpected_error,
+                          callback=lambda result: handle_saved(result, f"User ID {selected_user_id} updated successfully.", "Failed to update user."))
         except Exception as e:
             error_label.config(text=f"Unexpected error: {str(e)}")
             messagebox.showerror("Error", f"Unexpected error: {str(e)}")
@@ -189,7 +179,7 @@ def show_manage_users(username):
                 logger.warning("❌ No user selected")
                 return
             selected_user_id = tree.item(selected)['values'][0]
-            if selected_user_id == user_id:  # Prevent deleting current user
+            if selected_user_id == session.user_id:  # Prevent deleting current user
                 error_label.config(text="Cannot delete the current user.")
                 messagebox.showerror("Error", "Cannot delete the current user.")
                 logger.warning("❌ Attempted to delete current user")
@@ -197,17 +187,8 @@ def show_manage_users(username):
             if not messagebox.askyesno("Confirm", "Are you sure you want to delete this user?"):
                 logger.info("✅ Deletion cancelled by user")
                 return
-            success, error = delete_user(selected_user_id)
-            if success:
-                refresh_user_list()
-                clear_fields()
-                error_label.config(text="")
-                messagebox.showinfo("Success", "User deleted successfully.")
-                logger.info(f"✅ Deleted user ID: {selected_user_id}")
-            else:
-                error_label.config(text=error or "Failed to delete user.")
-                messagebox.showerror("Error", error or "Failed to delete user.")
-                logger.error(f"❌ Failed to delete user: {error}")
+            runner.submit(delete_user, selected_user_id, key="save", coalesce=False, on_error=show_unexpected_error,
+                          callback=lambda result: handle_saved(result, f"User ID {selected_user_id} deleted successfully.", "Failed to delete user."))
         except Exception as e:
             error_label.config(text=f"Unexpected error: {str(e)}")
             messagebox.showerror("Error", f"Unexpected error: {str(e)}")
@@ -235,6 +216,7 @@ def show_manage_users(username):
     refresh_user_list()
 
     def on_close():
+        runner.close()
         window.destroy()
         logger.info("✅ Manage users page closed")
     window.protocol("WM_DELETE_WINDOW", on_close)
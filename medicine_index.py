@@ -0,0 +1,88 @@
+import bisect
+from collections import defaultdict
+
+# Medicine rows are (medicine_id, name, price, quantity), as returned by fetch_medicines()
+
+def _trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+class MedicineIndex:
+    """
+    In-memory search index over the medicine catalog, built once per page.
+    Supports exact ID lookup, name prefix search (binary search over sorted names)
+    and substring search (trigram posting lists), returning the best matches first.
+    """
+
+    def __init__(self, medicines):
+        rows = sorted(medicines, key=lambda m: (m[1].lower(), m[0]))
+        self._rows = rows  # position in this list is the medicine's rank
+        self._names = [m[1].lower() for m in rows]
+        self._rank_by_id = {m[0]: rank for rank, m in enumerate(rows)}
+        postings = defaultdict(list)
+        for rank, name in enumerate(self._names):
+            for gram in _trigrams(name):
+                postings[gram].append(rank)
+        # Ranks are appended in order, so every posting list is already sorted by name
+        self._postings = {gram: tuple(ranks) for gram, ranks in postings.items()}
+
+    def __len__(self):
+        return len(self._rows)
+
+    def get(self, medicine_id):
+        """Return the row for a medicine ID, or None."""
+        rank = self._rank_by_id.get(medicine_id)
+        return self._rows[rank] if rank is not None else None
+
+    def search(self, query, limit=10):
+        """
+        Return up to limit rows matching query: an exact ID match first, then names
+        starting with the query, then names containing it, each group in name order.
+        """
+        query = query.strip().lower()
+        if not query or limit <= 0:
+            return []
+        ranks = []
+        seen = set()
+
+        def add(rank):
+            if rank not in seen:
+                seen.add(rank)
+                ranks.append(rank)
+            return len(ranks) >= limit
+
+        # isdigit() alone accepts characters such as '²' that int() rejects
+        if query.isascii() and query.isdigit():
+            rank = self._rank_by_id.get(int(query))
+            if rank is not None and add(rank):
+                return self._result(ranks)
+
+        start = bisect.bisect_left(self._names, query)
+        for rank in range(start, len(self._names)):
+            if not self._names[rank].startswith(query):
+                break
+            if add(rank):
+                return self._result(ranks)
+
+        for rank in self._substring_matches(query):
+            if add(rank):
+                break
+        return self._result(ranks)
+
+    def _substring_matches(self, query):
+        """Ranks of names containing query, in name order."""
+        if len(query) < 3:
+            # Too short for trigrams; short queries are served by the prefix search
+            return []
+        shortest = None
+        for gram in _trigrams(query):
+            posting = self._postings.get(gram)
+            if not posting:
+                return []
+            if shortest is None or len(posting) < len(shortest):
+                shortest = posting
+        # Walk the rarest trigram's posting list and verify, stopping as soon as enough match
+        names = self._names
+        return (rank for rank in shortest if query in names[rank])
+
+    def _result(self, ranks):
+        return [self._rows[rank] for rank in ranks]
@@ -0,0 +1,109 @@
+import tkinter as tk
+
+def format_medicine(medicine):
+    """Display text for a (medicine_id, name, price, quantity) row."""
+    medicine_id, name, price, quantity = medicine
+    return f"{name} (ID: {medicine_id}) - ${price:.2f}, {quantity} in stock"
+
+class MedicinePicker(tk.Frame):
+    """
+    Incremental-search entry for choosing a medicine, replacing a full Combobox.
+    search: callable (query, limit) -> list of (medicine_id, name, price, quantity) rows.
+    delay_ms: debounce before searching; keep 0 for in-memory indexes.
+    runner: optional db_executor.TaskRunner; searches that query the database run on it, so
+    a slow database never blocks typing. Leave it out for in-memory indexes.
+    on_select: optional callback receiving the chosen row.
+    """
+
+    def __init__(self, parent, search, limit=10, delay_ms=0, runner=None, on_select=None, font=("Helvetica", 13), **kwargs):
+        super().__init__(parent, **kwargs)
+        self._search = search
+        self._runner = runner
+        self._limit = limit
+        self._delay_ms = delay_ms
+        self._on_select = on_select
+        self._pending = None
+        self._matches = []
+        self._selected = None
+
+        self.query_var = tk.StringVar()
+        self.entry = tk.Entry(self, textvariable=self.query_var, font=font, width=40)
+        self.entry.pack(fill=tk.X)
+        self.listbox = tk.Listbox(self, height=min(limit, 8), font=font, activestyle="dotbox", exportselection=False)
+
+        self.entry.bind("<KeyRelease>", self._on_key)
+        self.entry.bind("<Down>", lambda event: self._move(1))
+        self.entry.bind("<Up>", lambda event: self._move(-1))
+        self.entry.bind("<Return>", lambda event: self._choose())
+        self.entry.bind("<Escape>", lambda event: self._hide())
+        self.listbox.bind("<ButtonRelease-1>", lambda event: self._choose())
+        self.listbox.bind("<Return>", lambda event: self._choose())
+
+    def get(self):
+        """Return the chosen row, or None if nothing has been chosen."""
+        return self._selected
+
+    def set_search(self, search):
+        """Replace the search callable, e.g. once a MedicineIndex has loaded, and redo the current search."""
+        self._search = search
+        if self.query_var.get().strip() and self._selected is None:
+            self._refresh()
+
+    def clear(self):
+        self._selected = None
+        self.query_var.set("")
+        self._hide()
+
+    def _on_key(self, event):
+        if event.keysym in ("Up", "Down", "Return", "Escape", "Tab"):
+            return
+        self._selected = None
+        if self._pending is not None:
+            self.after_cancel(self._pending)
+        self._pending = self.after(self._delay_ms, self._refresh)
+
+    def _refresh(self):
+        self._pending = None
+        query = self.query_var.get()
+        if self._runner is None or not query.strip():
+            self._show(query, self._search(query, self._limit) if query.strip() else [])
+            return
+        # Keystrokes while a search runs coalesce into one more search for the latest text
+        self._runner.submit(self._search, query, self._limit, key="search",
+                            callback=lambda matches: self._show(query, matches))
+
+    def _show(self, query, matches):
+        if query != self.query_var.get() or self._selected is not None:
+            return  # The text changed, or a row was chosen, while the search ran
+        self._matches = matches
+        self.listbox.delete(0, tk.END)
+        for medicine in self._matches:
+            self.listbox.insert(tk.END, format_medicine(medicine))
+        if self._matches:
+            self.listbox.selection_set(0)
+            self.listbox.pack(fill=tk.X)
+        else:
+            self._hide()
+
+    def _move(self, step):
+        if not self._matches:
+            return
+        current = self.listbox.curselection()
+        index = (current[0] + step) if current else 0
+        index = max(0, min(index, len(self._matches) - 1))
+        self.listbox.selection_clear(0, tk.END)
+        self.listbox.selection_set(index)
+        self.listbox.see(index)
+
+    def _choose(self):
+        current = self.listbox.curselection()
+        if not current or not self._matches:
+            return
+        self._selected = self._matches[current[0]]
+        self.query_var.set(f"{self._selected[1]} (ID: {self._selected[0]})")
+        self._hide()
+        if self._on_select:
+            self._on_select(self._selected)
+
+    def _hide(self):
+        self.listbox.pack_forget()
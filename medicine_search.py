@@ -0,0 +1,104 @@
+import logging
+from connections import get_connection
+from config import config
+
+logger = logging.getLogger(__name__)
+
+# Rows considered per ranking bucket; every branch of the search stays an index-bounded scan
+SEARCH_WINDOW_MIN = 50
+
+# Defaults used when database.ini has no [search] section
+SEARCH_DEFAULTS = {
+    'mode': 'local',  # 'local' builds an in-memory MedicineIndex, 'server' queries per keystroke
+    'limit': 10,
+    'delay_ms': 150,
+}
+
+def search_settings():
+    """Read the optional [search] section of database.ini, falling back to SEARCH_DEFAULTS."""
+    settings = dict(SEARCH_DEFAULTS)
+    try:
+        params = config(section='search')
+    except Exception:
+        params = {}
+    for key, default in SEARCH_DEFAULTS.items():
+        if key in params:
+            settings[key] = type(default)(params[key])
+    return settings
+
+def _escape_like(text):
+    return text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+def search_medicines(query, limit=10, offset=0):
+    """
+    Ranked server-side medicine search, for terminals that should not hold the whole catalog.
+    Ranking: exact ID, then names starting with query, then names containing it ordered by
+    trigram distance. Needs the indexes from migrations/002_medicine_search.sql.
+    Returns (medicines, error) with rows (medicine_id, name, price, quantity).
+    """
+    query = (query or "").strip()
+    if not query or limit <= 0:
+        return [], None
+    if offset < 0:
+        logger.error(f"❌ Invalid search offset: {offset}")
+        return [], "Offset must not be negative"
+    params = {
+        'id': int(query) if query.isascii() and query.isdigit() else None,
+        'query': query,
+        'prefix': _escape_like(query.lower()) + '%',
+        'contains': '%' + _escape_like(query) + '%',
+        'window': max(offset + limit, SEARCH_WINDOW_MIN),
+        'limit': limit,
+        'offset': offset,
+    }
+    branches = ["""
+        SELECT medicine_id, name, price, quantity, 0 AS bucket, 0::real AS distance
+        FROM medicines
+        WHERE medicine_id = %(id)s AND retired_at IS NULL
+    """, """
+        (SELECT medicine_id, name, price, quantity, 1, 0::real
+         FROM medicines
+         WHERE lower(name) COLLATE "C" LIKE %(prefix)s AND retired_at IS NULL
+         ORDER BY lower(name) COLLATE "C"
+         LIMIT %(window)s)
+    """]
+    if len(query) >= 3:
+        # Trigram matching needs at least one full trigram
+        branches.append("""
+            (SELECT medicine_id, name, price, quantity, 2, name <-> %(query)s::text
+             FROM medicines
+             WHERE name ILIKE %(contains)s AND retired_at IS NULL
+             ORDER BY name <-> %(query)s::text
+             LIMIT %(window)s)
+        """)
+    sql = f"""
+        SELECT medicine_id, name, price, quantity
+        FROM (
+            SELECT DISTINCT ON (medicine_id) *
+            FROM ({" UNION ALL ".join(branches)}) candidates
+            ORDER BY medicine_id, bucket
+        ) ranked
+        ORDER BY bucket, distance, lower(name), medicine_id
+        LIMIT %(limit)s OFFSET %(offset)s
+    """
+    with get_connection() as (conn, error):
+        if error or not conn:
+            logger.error(f"❌ Failed to search medicines: {error or 'No connection'}")
+            return [], error or "No database connection"
+        try:
+            cur = conn.cursor()
+            cur.execute(sql, params)
+            medicines = cur.fetchall()
+            logger.debug(f"✅ Found {len(medicines)} medicines for {query!r}")
+            return medicines, None
+        except Exception as e:
+            logger.error(f"❌ Error searching medicines: {e}")
+            return [], f"Error searching medicines: {str(e)}"
+
+def picker_search(query, limit):
+    """search_medicines() adapted to MedicinePicker's search(query, limit) -> rows contract."""
+    medicines, error = search_medicines(query, limit)
+    if error:
+        # The picker has no room for an error, so it shows no matches; leave a trace of why
+        logger.error(f"❌ Picker search for {query!r} failed: {error}")
+    return medicines
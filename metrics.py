@@ -0,0 +1,238 @@
+import atexit
+import bisect
+import functools
+import json
+import logging
+import os
+import socket
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from config import config
+
+logger = logging.getLogger(__name__)
+
+# Defaults used when database.ini has no [metrics] section
+METRICS_DEFAULTS = {
+    'port': 0,  # serve Prometheus text on http://host:port/metrics; 0 turns the endpoint off
+    'host': '127.0.0.1',
+    'snapshot_file': '',  # rewrite this JSON file every snapshot_seconds; empty turns it off
+    'snapshot_seconds': 60.0,
+    'terminal': '',  # label that tells terminals apart; defaults to the host name
+}
+
+# Histogram bucket upper bounds in seconds
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+def metrics_settings():
+    """Read the optional [metrics] section of database.ini, falling back to METRICS_DEFAULTS."""
+    settings = dict(METRICS_DEFAULTS)
+    try:
+        params = config(section='metrics')
+    except Exception:
+        params = {}
+    for key, default in METRICS_DEFAULTS.items():
+        if key in params:
+            settings[key] = type(default)(params[key])
+    return settings
+
+class Operation:
+    """Call count, error count and latency histogram of one data function."""
+
+    def __init__(self, name):
+        self.name = name
+        self.calls = 0
+        self.errors = 0
+        self.seconds = 0.0
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)  # the last one is +Inf
+        self._lock = threading.Lock()
+
+    def observe(self, seconds, failed=False):
+        index = bisect.bisect_left(LATENCY_BUCKETS, seconds)
+        with self._lock:
+            self.calls += 1
+            self.errors += failed
+            self.seconds += seconds
+            self.buckets[index] += 1
+
+    def snapshot(self):
+        """Counters plus cumulative bucket counts, read under the lock so they agree."""
+        with self._lock:
+            calls, errors, seconds, buckets = self.calls, self.errors, self.seconds, list(self.buckets)
+        cumulative, total = [], 0
+        for count in buckets:
+            total += count
+            cumulative.append(total)
+        return {'calls': calls, 'errors': errors, 'seconds': seconds, 'cumulative': cumulative}
+
+_operations = {}
+_registry_lock = threading.Lock()
+_started_at = time.time()
+
+def operation(name):
+    """The registry entry for name, created on first use."""
+    entry = _operations.get(name)
+    if entry is None:
+        with _registry_lock:
+            entry = _operations.setdefault(name, Operation(name))
+    return entry
+
+def measured(name=None):
+    """
+    Decorator that records every call's latency, and counts it as an error if it raises or
+    returns the usual (value, error) pair with an error set. Costs about a microsecond.
+    """
+    def decorator(func):
+        entry = operation(name or f"{func.__module__}.{func.__name__}")
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            failed = True
+            try:
+                result = func(*args, **kwargs)
+                failed = type(result) is tuple and len(result) == 2 and bool(result[1])
+                return result
+            finally:
+                entry.observe(time.perf_counter() - started, failed)
+        return wrapper
+    return decorator
+
+def _percentile(cumulative, calls, pct):
+    """Upper bound of the bucket holding the pct-th percentile (None if it is beyond the last)."""
+    if not calls:
+        return 0.0
+    index = bisect.bisect_left(cumulative, calls * pct / 100)
+    return LATENCY_BUCKETS[index] if index < len(LATENCY_BUCKETS) else None
+
+def _pool():
+    from connections import pool_stats  # Late import: connections' logging setup stays first
+    return pool_stats()
+
+def _entries():
+    with _registry_lock:
+        return sorted(_operations.items())
+
+def snapshot(terminal=None):
+    """Everything recorded so far as a dict, with per-operation p50/p95/p99 estimated from the buckets."""
+    uptime = time.time() - _started_at
+    operations = {}
+    for name, entry in _entries():
+        data = entry.snapshot()
+        summary = {
+            'calls': data['calls'],
+            'errors': data['errors'],
+            'calls_per_sec': data['calls'] / uptime if uptime > 0 else 0.0,
+            'mean_ms': data['seconds'] / data['calls'] * 1000 if data['calls'] else 0.0,
+        }
+        for pct in (50, 95, 99):
+            bound = _percentile(data['cumulative'], data['calls'], pct)
+            summary[f'p{pct}_ms'] = None if bound is None else bound * 1000
+        operations[name] = summary
+    return {
+        'terminal': terminal or metrics_settings()['terminal'] or socket.gethostname(),
+        'taken_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'uptime_seconds': uptime,
+        'operations': operations,
+        'pool': _pool(),
+    }
+
+def _labels(**labels):
+    escaped = {key: str(value).replace('\\', '\\\\').replace('"', '\\"') for key, value in labels.items()}
+    return ",".join(f'{key}="{value}"' for key, value in escaped.items())
+
+def render(terminal=None):
+    """Prometheus text exposition of the registry and the connection pool."""
+    terminal = terminal or metrics_settings()['terminal'] or socket.gethostname()
+    calls = ["# HELP pharmacy_operation_calls_total Calls per data function.",
+             "# TYPE pharmacy_operation_calls_total counter"]
+    errors = ["# HELP pharmacy_operation_errors_total Calls that raised or returned an error.",
+              "# TYPE pharmacy_operation_errors_total counter"]
+    latency = ["# HELP pharmacy_operation_duration_seconds Latency per data function.",
+               "# TYPE pharmacy_operation_duration_seconds histogram"]
+    for name, entry in _entries():
+        data = entry.snapshot()
+        labels = _labels(terminal=terminal, operation=name)
+        calls.append(f"pharmacy_operation_calls_total{{{labels}}} {data['calls']}")
+        errors.append(f"pharmacy_operation_errors_total{{{labels}}} {data['errors']}")
+        for bound, count in zip(LATENCY_BUCKETS + ('+Inf',), data['cumulative']):
+            latency.append(f"pharmacy_operation_duration_seconds_bucket{{{labels},le=\"{bound}\"}} {count}")
+        latency.append(f"pharmacy_operation_duration_seconds_sum{{{labels}}} {data['seconds']:.6f}")
+        latency.append(f"pharmacy_operation_duration_seconds_count{{{labels}}} {data['calls']}")
+    pool = ["# HELP pharmacy_pool_connections Pooled database connections by state.",
+            "# TYPE pharmacy_pool_connections gauge"]
+    stats = _pool()
+    for state in ('in_use', 'idle', 'max_size'):
+        if state in stats:
+            pool.append(f"pharmacy_pool_connections{{{_labels(terminal=terminal, state=state)}}} {stats[state]}")
+    for counter in ('checkouts', 'waits', 'exhausted'):
+        if counter in stats:
+            pool.append(f"# TYPE pharmacy_pool_{counter}_total counter")
+            pool.append(f"pharmacy_pool_{counter}_total{{{_labels(terminal=terminal)}}} {stats[counter]}")
+    return "\n".join(calls + errors + latency + pool) + "\n"
+
+def write_snapshot(path, terminal=None):
+    """Write snapshot() as JSON; readers never see a half-written file."""
+    partial = path + '.partial'
+    with open(partial, 'w', encoding='utf-8') as f:
+        json.dump(snapshot(terminal), f, indent=2, default=str)
+    os.replace(partial, path)
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    terminal = None
+
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = render(self.terminal).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # One line per scrape would drown the application log
+
+_exporters = {}
+
+def start_metrics():
+    """
+    Start whatever [metrics] asks for: the localhost /metrics endpoint and/or the periodic
+    snapshot file, each on a daemon thread. Safe to call more than once.
+    Returns the endpoint URL, or None when the endpoint is off or could not start.
+    """
+    settings = metrics_settings()
+    terminal = settings['terminal'] or socket.gethostname()
+    with _registry_lock:
+        if settings['port'] and 'server' not in _exporters:
+            handler = type('MetricsHandler', (_MetricsHandler,), {'terminal': terminal})
+            try:
+                server = ThreadingHTTPServer((settings['host'], settings['port']), handler)
+            except OSError as e:
+                # Usually a second terminal on the same machine; give it its own port in database.ini
+                logger.error(f"❌ Could not serve metrics on {settings['host']}:{settings['port']}: {e}")
+            else:
+                server.daemon_threads = True
+                threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+                _exporters['server'] = server
+                logger.info(f"✅ Serving metrics on http://{settings['host']}:{settings['port']}/metrics")
+        if settings['snapshot_file'] and 'snapshot' not in _exporters:
+            stop = threading.Event()
+            path, interval = settings['snapshot_file'], settings['snapshot_seconds']
+
+            def write_periodically():
+                while not stop.wait(interval):
+                    try:
+                        write_snapshot(path, terminal)
+                    except Exception as e:
+                        logger.error(f"❌ Could not write metrics snapshot to {path}: {e}")
+
+            threading.Thread(target=write_periodically, name="metrics-snapshot", daemon=True).start()
+            _exporters['snapshot'] = stop
+            atexit.register(lambda: write_snapshot(path, terminal))
+            logger.info(f"✅ Writing metrics to {path} every {interval:.0f}s")
+        server = _exporters.get('server')
+    return f"http://{settings['host']}:{settings['port']}/metrics" if server else None
@@ -0,0 +1,163 @@
+import argparse
+import hashlib
+import logging
+import os
+import re
+from connections import get_connection
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+
+# Arbitrary constant shared by every terminal, so only one of them migrates at a time
+MIGRATION_LOCK_ID = 48151623
+
+_FILENAME = re.compile(r'^(\d+)_(\w+)\.sql$')
+
+def discover(directory=MIGRATIONS_DIR):
+    """Migration files as [(version, name, path)], ordered by version."""
+    migrations = []
+    for filename in os.listdir(directory):
+        match = _FILENAME.match(filename)
+        if match:
+            migrations.append((int(match.group(1)), match.group(2), os.path.join(directory, filename)))
+    migrations.sort()
+    versions = [version for version, _, _ in migrations]
+    duplicates = sorted({v for v in versions if versions.count(v) > 1})
+    if duplicates:
+        raise ValueError(f"Duplicate migration versions: {duplicates}")
+    return migrations
+
+def _read(path):
+    with open(path, encoding='utf-8') as f:
+        sql = f.read()
+    return sql, hashlib.sha256(sql.encode('utf-8')).hexdigest()
+
+def _ensure_version_table(cur):
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version    integer PRIMARY KEY,
+            name       text NOT NULL,
+            checksum   text NOT NULL,
+            applied_at timestamptz NOT NULL DEFAULT now()
+        )
+    """)
+
+def _applied(cur):
+    cur.execute("SELECT version, name, checksum, applied_at FROM schema_version ORDER BY version")
+    return {row[0]: row for row in cur.fetchall()}
+
+def upgrade(target=None, directory=MIGRATIONS_DIR):
+    """
+    Apply pending migrations in version order, each in its own transaction, up to target
+    (default: all). Safe to call from several terminals at startup: an advisory lock lets one
+    of them migrate while the others wait and then find nothing left to do.
+    Returns (applied, error): applied lists the (version, name) pairs applied by this call.
+    """
+    try:
+        migrations = discover(directory)
+    except (OSError, ValueError) as e:
+        logger.error(f"❌ Cannot read migrations: {e}")
+        return [], f"Cannot read migrations: {str(e)}"
+    applied_now = []
+    with get_connection() as (conn, error):
+        if error or not conn:
+            logger.error(f"❌ Failed to run migrations: {error or 'No connection'}")
+            return [], error or "No database connection"
+        cur = conn.cursor()
+        try:
+            cur.execute("SELECT pg_advisory_lock(%s)", (MIGRATION_LOCK_ID,))
+            _ensure_version_table(cur)
+            conn.commit()
+            applied = _applied(cur)
+            conn.commit()
+            for version, name, path in migrations:
+                if target is not None and version > target:
+                    break
+                sql, checksum = _read(path)
+                if version in applied:
+                    if applied[version][2] != checksum:
+                        logger.warning(f"❌ Migration {version:03d}_{name} was edited after it was applied")
+                    continue
+                try:
+                    cur.execute(sql)
+                    cur.execute(
+                        "INSERT INTO schema_version (version, name, checksum) VALUES (%s, %s, %s)",
+                        (version, name, checksum)
+                    )
+                    conn.commit()
+                except Exception as e:
+                    conn.rollback()
+                    logger.error(f"❌ Migration {version:03d}_{name} failed: {e}")
+                    return applied_now, f"Migration {version:03d}_{name} failed: {str(e)}"
+                applied_now.append((version, name))
+                logger.info(f"✅ Applied migration {version:03d}_{name}")
+            if not applied_now:
+                logger.info("✅ Database schema is up to date")
+            return applied_now, None
+        except Exception as e:
+            conn.rollback()
+            logger.error(f"❌ Error running migrations: {e}")
+            return applied_now, f"Error running migrations: {str(e)}"
+        finally:
+            try:
+                # Session-level lock: returning the connection to the pool would not release it
+                cur.execute("SELECT pg_advisory_unlock(%s)", (MIGRATION_LOCK_ID,))
+                conn.commit()
+            except Exception:
+                conn.close()  # Closing the session releases the lock; the pool discards it
+
+def status(directory=MIGRATIONS_DIR):
+    """
+    Compare migration files with the schema_version table.
+    Returns (rows, error): rows are (version, name, applied_at or None, modified).
+    """
+    try:
+        migrations = discover(directory)
+    except (OSError, ValueError) as e:
+        return [], f"Cannot read migrations: {str(e)}"
+    with get_connection() as (conn, error):
+        if error or not conn:
+            logger.error(f"❌ Failed to read schema version: {error or 'No connection'}")
+            return [], error or "No database connection"
+        try:
+            cur = conn.cursor()
+            cur.execute("SELECT to_regclass('schema_version') IS NOT NULL")
+            applied = _applied(cur) if cur.fetchone()[0] else {}
+        except Exception as e:
+            logger.error(f"❌ Error reading schema version: {e}")
+            return [], f"Error reading schema version: {str(e)}"
+    rows = []
+    for version, name, path in migrations:
+        row = applied.get(version)
+        rows.append((version, name, row[3] if row else None, bool(row) and row[2] != _read(path)[1]))
+    return rows, None
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply or inspect database migrations")
+    commands = parser.add_subparsers(dest='command', required=True)
+    up = commands.add_parser('upgrade', help="apply pending migrations")
+    up.add_argument('--to', type=int, dest='target', help="stop after this version")
+    commands.add_parser('status', help="list migrations and whether they are applied")
+    args = parser.parse_args()
+
+    if args.command == 'upgrade':
+        applied, error = upgrade(args.target)
+        for version, name in applied:
+            print(f"applied {version:03d}_{name}")
+        if error:
+            print(error)
+            raise SystemExit(1)
+        if not applied:
+            print("Database schema is up to date")
+    else:
+        rows, error = status()
+        if error:
+            print(error)
+            raise SystemExit(1)
+        for version, name, applied_at, modified in rows:
+            state = f"applied {applied_at:%Y-%m-%d %H:%M}" if applied_at else "pending"
+            print(f"{version:03d}_{name:<24} {state}{' (file modified since)' if modified else ''}")
+
+if __name__ == "__main__":
+    main()
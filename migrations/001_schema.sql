@@ -0,0 +1,91 @@
+-- Baseline schema. Every statement is idempotent, so this also runs cleanly against
+-- databases that were created by hand before migrations existed.
+
+CREATE TABLE IF NOT EXISTS roles (
+    role_id   serial PRIMARY KEY,
+    role_name varchar(50) NOT NULL UNIQUE
+);
+
+CREATE TABLE IF NOT EXISTS users (
+    user_id    serial PRIMARY KEY,
+    username   varchar(50) NOT NULL,
+    password   varchar(255) NOT NULL,
+    role_id    integer NOT NULL REFERENCES roles (role_id),
+    created_at timestamp NOT NULL DEFAULT now()
+);
+
+CREATE TABLE IF NOT EXISTS customers (
+    customer_id serial PRIMARY KEY,
+    name        varchar(100)
+);
+
+CREATE TABLE IF NOT EXISTS medicines (
+    medicine_id serial PRIMARY KEY,
+    name        varchar(100) NOT NULL,
+    quantity    integer NOT NULL DEFAULT 0,
+    price       numeric(10, 2) NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS sales (
+    sale_id      serial PRIMARY KEY,
+    customer_id  integer REFERENCES customers (customer_id),
+    user_id      integer REFERENCES users (user_id),
+    total_amount numeric(12, 2) NOT NULL,
+    sale_date    timestamp NOT NULL DEFAULT now()
+);
+
+CREATE TABLE IF NOT EXISTS sales_details (
+    sale_id       integer NOT NULL REFERENCES sales (sale_id),
+    medicine_id   integer NOT NULL REFERENCES medicines (medicine_id),
+    quantity      integer NOT NULL,
+    selling_price numeric(10, 2) NOT NULL,
+    PRIMARY KEY (sale_id, medicine_id)
+);
+
+CREATE TABLE IF NOT EXISTS purchases (
+    purchase_id   serial PRIMARY KEY,
+    user_id       integer REFERENCES users (user_id),
+    total_amount  numeric(12, 2) NOT NULL,
+    purchase_date timestamp NOT NULL DEFAULT now()
+);
+
+CREATE TABLE IF NOT EXISTS purchase_details (
+    purchase_id integer NOT NULL REFERENCES purchases (purchase_id),
+    medicine_id integer NOT NULL REFERENCES medicines (medicine_id),
+    quantity    integer NOT NULL,
+    cost_price  numeric(10, 2) NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS stock_logs (
+    log_id          serial PRIMARY KEY,
+    medicine_id     integer NOT NULL REFERENCES medicines (medicine_id),
+    change_type     varchar(20) NOT NULL,
+    quantity_change integer NOT NULL,
+    created_at      timestamp NOT NULL DEFAULT now()
+);
+
+-- Constraints the application already assumes (checkout's guarded UPDATE never takes stock
+-- below zero); dropped and re-added so reruns stay harmless
+ALTER TABLE medicines DROP CONSTRAINT IF EXISTS medicines_quantity_check;
+ALTER TABLE medicines ADD CONSTRAINT medicines_quantity_check CHECK (quantity >= 0);
+ALTER TABLE medicines DROP CONSTRAINT IF EXISTS medicines_price_check;
+ALTER TABLE medicines ADD CONSTRAINT medicines_price_check CHECK (price >= 0);
+ALTER TABLE sales_details DROP CONSTRAINT IF EXISTS sales_details_quantity_check;
+ALTER TABLE sales_details ADD CONSTRAINT sales_details_quantity_check CHECK (quantity > 0);
+ALTER TABLE purchase_details DROP CONSTRAINT IF EXISTS purchase_details_quantity_check;
+ALTER TABLE purchase_details ADD CONSTRAINT purchase_details_quantity_check CHECK (quantity > 0);
+
+-- Login and the add/update uniqueness checks look users and medicines up by name
+CREATE UNIQUE INDEX IF NOT EXISTS users_username_key ON users (username);
+CREATE UNIQUE INDEX IF NOT EXISTS medicines_name_key ON medicines (name);
+
+-- Sale deletion and detail paging by sale; redundant with the primary key above, but
+-- hand-made databases may not have one
+CREATE INDEX IF NOT EXISTS sales_details_sale_id_idx ON sales_details (sale_id);
+
+-- delete_medicine's dependency checks
+CREATE INDEX IF NOT EXISTS sales_details_medicine_id_idx ON sales_details (medicine_id);
+CREATE INDEX IF NOT EXISTS purchase_details_medicine_id_idx ON purchase_details (medicine_id);
+
+-- Stock history of one medicine, newest first
+CREATE INDEX IF NOT EXISTS stock_logs_medicine_id_created_at_idx ON stock_logs (medicine_id, created_at);
@@ -0,0 +1,10 @@
+-- Indexes behind medicine_search.search_medicines()
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+-- Name prefix search: range scan in byte order, which also serves ORDER BY
+CREATE INDEX IF NOT EXISTS medicines_name_prefix_idx
+    ON medicines ((lower(name) COLLATE "C"));
+
+-- Substring search and nearest-first ranking (GiST supports ORDER BY name <-> query)
+CREATE INDEX IF NOT EXISTS medicines_name_trgm_idx
+    ON medicines USING gist (name gist_trgm_ops);
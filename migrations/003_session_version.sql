@@ -0,0 +1,20 @@
+-- Version stamp behind session.Session.validate(): a primary-key lookup instead of a
+-- users/roles join tells a long-lived session whether its identity is still current
+ALTER TABLE users ADD COLUMN IF NOT EXISTS session_version integer NOT NULL DEFAULT 1;
+
+-- Any change to who the user is or what they may do invalidates existing sessions
+CREATE OR REPLACE FUNCTION bump_session_version() RETURNS trigger AS $$
+BEGIN
+    IF NEW.username IS DISTINCT FROM OLD.username
+       OR NEW.password IS DISTINCT FROM OLD.password
+       OR NEW.role_id IS DISTINCT FROM OLD.role_id THEN
+        NEW.session_version := OLD.session_version + 1;
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS users_session_version ON users;
+CREATE TRIGGER users_session_version
+    BEFORE UPDATE ON users
+    FOR EACH ROW EXECUTE FUNCTION bump_session_version();
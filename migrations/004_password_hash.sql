@@ -0,0 +1,3 @@
+-- Encoded scrypt/PBKDF2 hashes (passwords.hash_password) are longer than most plaintext
+-- passwords; existing plaintext values are rehashed on each user's next login
+ALTER TABLE users ALTER COLUMN password TYPE text;
@@ -0,0 +1,22 @@
+-- Periodic copies of medicines.quantity. stock_history.stock_as_of() starts from the
+-- snapshot nearest the requested time and replays only the stock_logs written since
+-- (or before), instead of summing the whole ledger.
+CREATE TABLE IF NOT EXISTS stock_snapshots (
+    snapshot_id serial PRIMARY KEY,
+    taken_at    timestamp NOT NULL,
+    -- Every stock_logs row up to this id is reflected in the snapshot, none after it
+    last_log_id integer NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS stock_snapshot_items (
+    snapshot_id integer NOT NULL REFERENCES stock_snapshots (snapshot_id) ON DELETE CASCADE,
+    medicine_id integer NOT NULL REFERENCES medicines (medicine_id) ON DELETE CASCADE,
+    quantity    integer NOT NULL,
+    PRIMARY KEY (snapshot_id, medicine_id)
+);
+
+CREATE INDEX IF NOT EXISTS stock_snapshots_taken_at_idx ON stock_snapshots (taken_at);
+
+-- Replaying backwards from a snapshot filters the ledger by time; rows arrive in time
+-- order, so a BRIN index stays tiny however long the ledger grows
+CREATE INDEX IF NOT EXISTS stock_logs_created_at_brin ON stock_logs USING brin (created_at);
@@ -0,0 +1,93 @@
+-- stock_logs grows with every sale and purchase line. Monthly range partitions keep each
+-- index small enough to stay cached for the inserts, and let old months be archived and
+-- dropped whole (stock_partitions.py) instead of deleted row by row.
+
+-- Four bytes per row instead of free text, and typos become errors
+DO $$
+BEGIN
+    IF to_regtype('stock_change_type') IS NULL THEN
+        CREATE TYPE stock_change_type AS ENUM ('sale', 'purchase', 'sale_deletion', 'initial', 'adjustment');
+    END IF;
+END $$;
+
+ALTER TABLE stock_logs RENAME TO stock_logs_unpartitioned;
+
+-- The primary key of a partitioned table must include the partition key; log_id stays
+-- unique through its sequence
+CREATE TABLE stock_logs (
+    log_id          integer NOT NULL,
+    medicine_id     integer NOT NULL REFERENCES medicines (medicine_id),
+    change_type     stock_change_type NOT NULL,
+    quantity_change integer NOT NULL,
+    created_at      timestamp NOT NULL DEFAULT now(),
+    PRIMARY KEY (log_id, created_at)
+) PARTITION BY RANGE (created_at);
+
+-- Keep numbering where the old table left off; stock snapshots refer to log ids
+DO $$
+DECLARE
+    seq text := pg_get_serial_sequence('stock_logs_unpartitioned', 'log_id');
+BEGIN
+    EXECUTE format('ALTER SEQUENCE %s OWNED BY stock_logs.log_id', seq);
+    EXECUTE format('ALTER TABLE stock_logs ALTER COLUMN log_id SET DEFAULT nextval(%L)', seq);
+END $$;
+
+-- Catches rows for a month nobody created a partition for, so a sale never fails on it;
+-- create_stock_log_partition() moves them out when their month is created
+CREATE TABLE stock_logs_default PARTITION OF stock_logs DEFAULT;
+
+-- Create the partition for the month containing month_start, if missing. Returns true if created
+CREATE OR REPLACE FUNCTION create_stock_log_partition(month_start date) RETURNS boolean AS $$
+DECLARE
+    lo timestamp := date_trunc('month', month_start);
+    hi timestamp := date_trunc('month', month_start) + interval '1 month';
+    part text := 'stock_logs_' || to_char(month_start, 'YYYY_MM');
+BEGIN
+    -- Terminals call this at startup; one at a time
+    PERFORM pg_advisory_xact_lock(48151625);
+    IF to_regclass(part) IS NOT NULL THEN
+        RETURN false;
+    END IF;
+    EXECUTE format('CREATE TABLE %I (LIKE stock_logs INCLUDING DEFAULTS)', part);
+    EXECUTE format('ALTER TABLE %I ADD CONSTRAINT %I CHECK (created_at >= %L AND created_at < %L)',
+                   part, part || '_range', lo, hi);
+    EXECUTE format('WITH moved AS (DELETE FROM stock_logs_default WHERE created_at >= %L AND created_at < %L RETURNING *)
+                    INSERT INTO %I SELECT * FROM moved', lo, hi, part);
+    -- The check constraint lets ATTACH skip scanning the new partition
+    EXECUTE format('ALTER TABLE stock_logs ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)', part, lo, hi);
+    EXECUTE format('ALTER TABLE %I DROP CONSTRAINT %I', part, part || '_range');
+    RETURN true;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Partitions for the existing history and the next three months
+SELECT create_stock_log_partition(month::date)
+FROM generate_series(
+    date_trunc('month', LEAST((SELECT MIN(created_at) FROM stock_logs_unpartitioned), localtimestamp)),
+    date_trunc('month', localtimestamp) + interval '3 months',
+    interval '1 month'
+) month;
+
+INSERT INTO stock_logs (log_id, medicine_id, change_type, quantity_change, created_at)
+SELECT log_id, medicine_id, change_type::stock_change_type, quantity_change, created_at
+FROM stock_logs_unpartitioned;
+
+DROP TABLE stock_logs_unpartitioned;
+
+-- Built once after the copy; each partition gets its own
+CREATE INDEX stock_logs_medicine_id_created_at_idx ON stock_logs (medicine_id, created_at);
+CREATE INDEX stock_logs_created_at_brin ON stock_logs USING brin (created_at);
+
+-- Months exported and dropped by the retention policy. Stock before the newest range_end
+-- can no longer be rebuilt from the ledger
+CREATE TABLE IF NOT EXISTS stock_log_archives (
+    partition_name text PRIMARY KEY,
+    range_start    timestamp NOT NULL,
+    range_end      timestamp NOT NULL,
+    rows           bigint NOT NULL,
+    max_log_id     integer,
+    path           text NOT NULL,
+    archived_at    timestamp NOT NULL DEFAULT now()
+);
+
+ANALYZE stock_logs;
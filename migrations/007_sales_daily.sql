@@ -0,0 +1,103 @@
+-- Daily sales rollups kept current by triggers, so reports read one row per day and
+-- cashier or medicine instead of aggregating sales and sales_details.
+-- transactions counts distinct sales; user_id 0 stands for sales without a cashier.
+CREATE TABLE IF NOT EXISTS sales_daily (
+    day          date NOT NULL,
+    user_id      integer NOT NULL,
+    transactions integer NOT NULL,
+    quantity     bigint NOT NULL,
+    revenue      numeric(14, 2) NOT NULL,
+    PRIMARY KEY (day, user_id)
+);
+
+CREATE TABLE IF NOT EXISTS sales_daily_medicines (
+    day          date NOT NULL,
+    medicine_id  integer NOT NULL REFERENCES medicines (medicine_id) ON DELETE CASCADE,
+    transactions integer NOT NULL,
+    quantity     bigint NOT NULL,
+    revenue      numeric(14, 2) NOT NULL,
+    PRIMARY KEY (day, medicine_id)
+);
+
+-- Top sellers over a period look up by medicine first
+CREATE INDEX IF NOT EXISTS sales_daily_medicines_medicine_id_idx ON sales_daily_medicines (medicine_id, day);
+
+-- Once per statement: adds inserted sales lines, subtracts deleted ones (delete_sales removes
+-- the lines before their sale, so the sale's date and cashier are still there to join).
+-- Upserts go in key order; checkout already holds the row locks of its medicines, so
+-- concurrent carts queue here exactly as they do there
+CREATE OR REPLACE FUNCTION sales_daily_apply() RETURNS trigger AS $$
+DECLARE
+    sign integer := CASE TG_OP WHEN 'INSERT' THEN 1 ELSE -1 END;
+BEGIN
+    INSERT INTO sales_daily AS t (day, user_id, transactions, quantity, revenue)
+    SELECT s.sale_date::date, COALESCE(s.user_id, 0),
+           sign * COUNT(DISTINCT c.sale_id), sign * SUM(c.quantity), sign * SUM(c.quantity * c.selling_price)
+    FROM changed c
+    JOIN sales s ON s.sale_id = c.sale_id
+    GROUP BY 1, 2
+    ORDER BY 1, 2
+    ON CONFLICT (day, user_id) DO UPDATE
+    SET transactions = t.transactions + EXCLUDED.transactions,
+        quantity = t.quantity + EXCLUDED.quantity,
+        revenue = t.revenue + EXCLUDED.revenue;
+
+    INSERT INTO sales_daily_medicines AS t (day, medicine_id, transactions, quantity, revenue)
+    SELECT s.sale_date::date, c.medicine_id,
+           sign * COUNT(DISTINCT c.sale_id), sign * SUM(c.quantity), sign * SUM(c.quantity * c.selling_price)
+    FROM changed c
+    JOIN sales s ON s.sale_id = c.sale_id
+    GROUP BY 1, 2
+    ORDER BY 1, 2
+    ON CONFLICT (day, medicine_id) DO UPDATE
+    SET transactions = t.transactions + EXCLUDED.transactions,
+        quantity = t.quantity + EXCLUDED.quantity,
+        revenue = t.revenue + EXCLUDED.revenue;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS sales_details_daily_insert ON sales_details;
+CREATE TRIGGER sales_details_daily_insert
+    AFTER INSERT ON sales_details
+    REFERENCING NEW TABLE AS changed
+    FOR EACH STATEMENT EXECUTE FUNCTION sales_daily_apply();
+
+DROP TRIGGER IF EXISTS sales_details_daily_delete ON sales_details;
+CREATE TRIGGER sales_details_daily_delete
+    AFTER DELETE ON sales_details
+    REFERENCING OLD TABLE AS changed
+    FOR EACH STATEMENT EXECUTE FUNCTION sales_daily_apply();
+
+-- Add sales first_sale_id..last_sale_id from scratch: the backfill below, sales_reports.rebuild()
+-- and bulk loads that bypass triggers (datagen.py) use it
+CREATE OR REPLACE FUNCTION sales_daily_backfill(first_sale_id integer, last_sale_id integer) RETURNS void AS $$
+    INSERT INTO sales_daily AS t (day, user_id, transactions, quantity, revenue)
+    SELECT s.sale_date::date, COALESCE(s.user_id, 0), COUNT(DISTINCT d.sale_id), SUM(d.quantity), SUM(d.quantity * d.selling_price)
+    FROM sales s
+    JOIN sales_details d ON d.sale_id = s.sale_id
+    WHERE s.sale_id BETWEEN first_sale_id AND last_sale_id
+    GROUP BY 1, 2
+    ON CONFLICT (day, user_id) DO UPDATE
+    SET transactions = t.transactions + EXCLUDED.transactions,
+        quantity = t.quantity + EXCLUDED.quantity,
+        revenue = t.revenue + EXCLUDED.revenue;
+
+    INSERT INTO sales_daily_medicines AS t (day, medicine_id, transactions, quantity, revenue)
+    SELECT s.sale_date::date, d.medicine_id, COUNT(DISTINCT d.sale_id), SUM(d.quantity), SUM(d.quantity * d.selling_price)
+    FROM sales s
+    JOIN sales_details d ON d.sale_id = s.sale_id
+    WHERE s.sale_id BETWEEN first_sale_id AND last_sale_id
+    GROUP BY 1, 2
+    ON CONFLICT (day, medicine_id) DO UPDATE
+    SET transactions = t.transactions + EXCLUDED.transactions,
+        quantity = t.quantity + EXCLUDED.quantity,
+        revenue = t.revenue + EXCLUDED.revenue;
+$$ LANGUAGE sql;
+
+-- Existing sales. The triggers above are in place but sales written while this runs wait
+-- for it, so nothing is counted twice or missed
+LOCK TABLE sales_details IN SHARE MODE;
+TRUNCATE sales_daily, sales_daily_medicines;
+SELECT sales_daily_backfill(0, COALESCE((SELECT MAX(sale_id) FROM sales), 0));
+ANALYZE sales_daily, sales_daily_medicines;
@@ -0,0 +1,4 @@
+-- Medicines with stock history cannot be deleted without losing the ledger stock_logs
+-- keeps (its rows reference them), so delete_medicine retires them instead: they keep
+-- their history but leave the pickers and the manage medicines list.
+ALTER TABLE medicines ADD COLUMN IF NOT EXISTS retired_at timestamp;
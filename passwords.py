@@ -0,0 +1,224 @@
+import argparse
+import base64
+import hashlib
+import hmac
+import logging
+import os
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from config import config
+
+logger = logging.getLogger(__name__)
+
+# Defaults used when database.ini has no [security] section; tune them with
+# `python passwords.py calibrate` on the terminals that handle logins
+SECURITY_DEFAULTS = {
+    'algorithm': 'scrypt',  # 'scrypt' or 'pbkdf2_sha256'
+    'scrypt_n': 16384,
+    'scrypt_r': 8,
+    'scrypt_p': 1,
+    'pbkdf2_iterations': 600000,
+}
+
+SALT_BYTES = 16
+HASH_BYTES = 32
+ALGORITHMS = ('scrypt', 'pbkdf2_sha256')
+
+def security_settings():
+    """Read the optional [security] section of database.ini, falling back to SECURITY_DEFAULTS."""
+    settings = dict(SECURITY_DEFAULTS)
+    try:
+        params = config(section='security')
+    except Exception:
+        params = {}
+    for key, default in SECURITY_DEFAULTS.items():
+        if key in params:
+            settings[key] = type(default)(params[key])
+    if settings['algorithm'] not in ALGORITHMS:
+        raise ValueError(f"Unknown password hashing algorithm: {settings['algorithm']}")
+    return settings
+
+def _b64(data):
+    return base64.b64encode(data).decode('ascii')
+
+def _scrypt(password, salt, n, r, p):
+    # OpenSSL needs about 128 * r * (n + p + 2) bytes; hashlib's default limit is 32 MiB
+    return hashlib.scrypt(password.encode('utf-8'), salt=salt, n=n, r=r, p=p,
+                          maxmem=128 * r * (n + p + 2) + (1 << 20), dklen=HASH_BYTES)
+
+def _pbkdf2(password, salt, iterations):
+    return hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), salt, iterations, dklen=HASH_BYTES)
+
+def _params(settings):
+    """Cost parameters for the configured algorithm, in the order they are encoded."""
+    if settings['algorithm'] == 'scrypt':
+        return [settings['scrypt_n'], settings['scrypt_r'], settings['scrypt_p']]
+    return [settings['pbkdf2_iterations']]
+
+def hash_password(password, settings=None):
+    """
+    Hash a password with a random salt. The result encodes algorithm, cost and salt,
+    e.g. scrypt$16384$8$1$<salt>$<hash>, so it verifies even after the settings change.
+    """
+    settings = settings or security_settings()
+    salt = os.urandom(SALT_BYTES)
+    params = _params(settings)
+    if settings['algorithm'] == 'scrypt':
+        digest = _scrypt(password, salt, *params)
+    else:
+        digest = _pbkdf2(password, salt, *params)
+    return '$'.join([settings['algorithm'], *(str(v) for v in params), _b64(salt), _b64(digest)])
+
+def _parse(encoded):
+    """Split an encoded hash into (algorithm, params, salt, digest), or None if it isn't one."""
+    parts = (encoded or '').split('$')
+    expected = {'scrypt': 6, 'pbkdf2_sha256': 4}.get(parts[0])
+    if expected is None or len(parts) != expected:
+        return None
+    try:
+        params = [int(v) for v in parts[1:-2]]
+        return parts[0], params, base64.b64decode(parts[-2]), base64.b64decode(parts[-1])
+    except ValueError:
+        return None
+
+def is_hashed(stored):
+    """False for legacy plaintext passwords stored before hashing was introduced."""
+    return _parse(stored) is not None
+
+def verify_password(password, encoded):
+    """Check a password against an encoded hash in constant time. Returns False for malformed hashes."""
+    parsed = _parse(encoded)
+    if parsed is None:
+        return False
+    algorithm, params, salt, digest = parsed
+    if algorithm == 'scrypt':
+        candidate = _scrypt(password, salt, *params)
+    else:
+        candidate = _pbkdf2(password, salt, *params)
+    return hmac.compare_digest(candidate, digest)
+
+def needs_rehash(encoded, settings=None):
+    """True when a stored password is plaintext or was hashed with other algorithm or cost settings."""
+    parsed = _parse(encoded)
+    if parsed is None:
+        return True
+    settings = settings or security_settings()
+    algorithm, params, _, _ = parsed
+    return algorithm != settings['algorithm'] or params != _params(settings)
+
+# Verified against when the username is unknown, so a miss costs as much as a hit
+_dummy_hash = None
+_dummy_lock = threading.Lock()
+
+def dummy_verify(password, settings=None):
+    global _dummy_hash
+    settings = settings or security_settings()
+    with _dummy_lock:
+        if _dummy_hash is None or needs_rehash(_dummy_hash, settings):
+            _dummy_hash = hash_password('', settings)
+        encoded = _dummy_hash
+    verify_password(password, encoded)
+    return False
+
+def _time_ms(func, rounds):
+    samples = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+def calibrate(target_ms=250.0, algorithm='scrypt', rounds=3):
+    """
+    Pick the cheapest cost that takes at least target_ms per verification on this machine.
+    scrypt doubles n (memory grows with it); PBKDF2 scales iterations linearly.
+    Returns a settings dict suitable for the [security] section.
+    """
+    settings = dict(SECURITY_DEFAULTS, algorithm=algorithm)
+    salt = os.urandom(SALT_BYTES)
+    if algorithm == 'scrypt':
+        n = 1 << 12
+        while True:
+            elapsed = _time_ms(lambda: _scrypt('calibration', salt, n, settings['scrypt_r'], settings['scrypt_p']), rounds)
+            logger.info(f"✅ scrypt n={n}: {elapsed:.1f} ms")
+            if elapsed >= target_ms or n >= 1 << 20:
+                break
+            n *= 2
+        settings['scrypt_n'] = n
+    elif algorithm == 'pbkdf2_sha256':
+        probe = 100000
+        elapsed = _time_ms(lambda: _pbkdf2('calibration', salt, probe), rounds)
+        # Round up to a whole 10k so the configured value stays readable
+        settings['pbkdf2_iterations'] = max(probe, -(-int(probe * target_ms / elapsed) // 10000) * 10000)
+    else:
+        raise ValueError(f"Unknown password hashing algorithm: {algorithm}")
+    settings['verify_ms'] = _time_ms(lambda: verify_password('calibration', hash_password('calibration', settings)), rounds)
+    return settings
+
+def bench(logins=64, threads=8, username=None, password=None):
+    """
+    Simulate a shift change: logins attempts spread over threads concurrent terminals.
+    With username and password, runs the full login.login() against the database;
+    otherwise times verify_password() alone. Returns latency percentiles in ms.
+    """
+    from benchmark import percentile
+    if username:
+        from login import login
+
+        def attempt():
+            session, error = login(username, password)
+            if error:
+                raise RuntimeError(error)
+    else:
+        encoded = hash_password('benchmark')
+
+        def attempt():
+            verify_password('benchmark', encoded)
+
+    def timed(_):
+        started = time.perf_counter()
+        attempt()
+        return (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        samples = list(pool.map(timed, range(logins)))
+    wall = time.perf_counter() - started
+    return {
+        'logins': logins,
+        'threads': threads,
+        'p50_ms': percentile(samples, 50),
+        'p99_ms': percentile(samples, 99),
+        'max_ms': max(samples),
+        'logins_per_sec': logins / wall,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Password hashing calibration and login benchmark")
+    commands = parser.add_subparsers(dest='command', required=True)
+    cal = commands.add_parser('calibrate', help="pick cost parameters for a target verify latency")
+    cal.add_argument('--target-ms', type=float, default=250.0)
+    cal.add_argument('--algorithm', choices=ALGORITHMS, default='scrypt')
+    bch = commands.add_parser('bench', help="login latency under concurrent logins")
+    bch.add_argument('--logins', type=int, default=64)
+    bch.add_argument('--threads', type=int, default=8)
+    bch.add_argument('--username', help="run full logins against the database as this user")
+    bch.add_argument('--password', default='')
+    args = parser.parse_args()
+
+    if args.command == 'calibrate':
+        settings = calibrate(args.target_ms, args.algorithm)
+        print(f"# verify takes {settings.pop('verify_ms'):.1f} ms on this machine; add to database.ini:")
+        print("[security]")
+        for key, value in settings.items():
+            print(f"{key}={value}")
+    else:
+        report = bench(args.logins, args.threads, args.username, args.password)
+        print(f"{report['logins']} logins on {report['threads']} threads: "
+              f"p50 {report['p50_ms']:.1f} ms, p99 {report['p99_ms']:.1f} ms, max {report['max_ms']:.1f} ms, "
+              f"{report['logins_per_sec']:.1f} logins/s")
+
+if __name__ == "__main__":
+    main()
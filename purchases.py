@@ -1,9 +1,16 @@
+import csv
 import logging
-from connections import create_connection
+import time
+from decimal import Decimal, InvalidOperation
+from connections import get_connection
+from metrics import measured
+from query_cache import cached, invalidates
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
+@measured()
+@cached("medicines", key=lambda conn: ())
 def fetch_medicines(conn):
     """Fetch all medicines for the Combobox. Returns (medicines, error)."""
     if not conn:
@@ -11,7 +18,7 @@ def fetch_medicines(conn):
         return [], "No database connection provided"
     try:
         cur = conn.cursor()
-        cur.execute("SELECT medicine_id, name, price, quantity FROM medicines")
+        cur.execute("SELECT medicine_id, name, price, quantity FROM medicines WHERE retired_at IS NULL")
         medicines = cur.fetchall()
         logger.info("✅ Successfully fetched medicines")
         return medicines, None
@@ -19,6 +26,7 @@ def fetch_medicines(conn):
         logger.error(f"❌ Error fetching medicines: {e}")
         return [], f"Error fetching medicines: {str(e)}"
 
+@measured()
 def fetch_user_id(conn, username):
     """Fetch user_id from username. Returns (user_id, error)."""
     if not conn:
@@ -59,60 +67,166 @@ def add_purchase(user_id, cart_items):
             logger.error(f"❌ Inconsistent total_cost in cart item: {item}")
             return False, f"Inconsistent total_cost for medicine ID {item['medicine_id']}"
 
-    conn, error = create_connection()
-    if error or not conn:
-        logger.error(f"❌ Failed to add purchase: {error or 'No connection'}")
-        return False, error or "Failed to connect to database"
-    
-    try:
-        cur = conn.cursor()
-        total_amount = sum(item['total_cost'] for item in cart_items)
+    report, error = receive_purchase(user_id, cart_items)
+    if error:
+        return False, error
+    return True, None
+
+class _InvoiceStream:
+    """
+    File-like adapter that feeds invoice lines to COPY as tab-separated text.
+    Lines are validated and consumed lazily, so the invoice is never held in memory.
+    """
 
-        # Insert into purchases
-        cur.execute("""
-            INSERT INTO purchases (user_id, total_amount)
-            VALUES (%s, %s) RETURNING purchase_id
-        """, (user_id, total_amount))
-        purchase_id = cur.fetchone()[0]
+    def __init__(self, lines):
+        self._lines = iter(lines)
+        self._buffer = ""
+        self.count = 0
+        self.error = None
 
-        # Process each cart item
-        for item in cart_items:
-            medicine_id = item['medicine_id']
-            quantity = item['quantity']
-            cost_price = item['cost_price']
+    def _format(self, item):
+        line_no = self.count + 1
+        try:
+            medicine_id = int(item['medicine_id'])
+            quantity = int(item['quantity'])
+            cost_price = Decimal(str(item['cost_price']))
+        except KeyError:
+            raise ValueError(f"Invalid invoice line {line_no}: medicine_id, quantity and cost_price are required")
+        except (TypeError, ValueError, InvalidOperation):
+            raise ValueError(f"Invalid invoice line {line_no}: {item}")
+        if quantity <= 0:
+            raise ValueError(f"Invalid quantity for medicine ID {medicine_id} on line {line_no}")
+        if cost_price < 0:
+            raise ValueError(f"Invalid cost price for medicine ID {medicine_id} on line {line_no}")
+        total_cost = item.get('total_cost')
+        if total_cost not in (None, "") and abs(Decimal(str(total_cost)) - quantity * cost_price) >= Decimal("0.005"):
+            raise ValueError(f"Inconsistent total_cost for medicine ID {medicine_id} on line {line_no}")
+        self.count = line_no
+        return f"{line_no}\t{medicine_id}\t{quantity}\t{cost_price}\n"
 
-            # Check medicine exists
-            cur.execute("SELECT quantity FROM medicines WHERE medicine_id = %s", (medicine_id,))
-            result = cur.fetchone()
-            if not result:
-                conn.rollback()
-                conn.close()
-                logger.error(f"❌ Medicine ID {medicine_id} not found")
-                return False, f"Medicine ID {medicine_id} not found"
+    def read(self, size=-1):
+        while size < 0 or len(self._buffer) < size:
+            item = next(self._lines, None)
+            if item is None:
+                break
+            try:
+                self._buffer += self._format(item)
+            except ValueError as e:
+                # COPY wraps exceptions raised here, so keep the message for the caller
+                self.error = str(e)
+                raise
+        if size < 0:
+            size = len(self._buffer)
+        chunk, self._buffer = self._buffer[:size], self._buffer[size:]
+        return chunk
 
-            # Insert into purchase_details
+@measured()
+@invalidates("medicines")
+def receive_purchase(user_id, lines):
+    """
+    Receive a supplier invoice of any size in a constant number of round trips.
+    lines: any iterable of dicts with medicine_id, quantity, cost_price (and optionally
+    total_cost); it is streamed into a staging table with COPY, not materialised.
+    Returns (report, error): report is {'purchase_id', 'lines', 'seconds', 'lines_per_sec'}.
+    """
+    started = time.perf_counter()
+    stream = _InvoiceStream(lines)
+    with get_connection() as (conn, error):
+        if error or not conn:
+            logger.error(f"❌ Failed to add purchase: {error or 'No connection'}")
+            return None, error or "Failed to connect to database"
+        try:
+            cur = conn.cursor()
             cur.execute("""
-                INSERT INTO purchase_details (purchase_id, medicine_id, quantity, cost_price)
-                VALUES (%s, %s, %s, %s)
-            """, (purchase_id, medicine_id, quantity, cost_price))
+                CREATE TEMP TABLE purchase_staging (
+                    line_no integer NOT NULL,
+                    medicine_id integer NOT NULL,
+                    quantity integer NOT NULL,
+                    cost_price numeric NOT NULL
+                ) ON COMMIT DROP
+            """)
+            cur.copy_expert("COPY purchase_staging (line_no, medicine_id, quantity, cost_price) FROM STDIN", stream)
+            if stream.count == 0:
+                conn.rollback()
+                logger.error("❌ Cart is empty")
+                return None, "Cart is empty"
 
-            # Update medicine quantity
+            # Validate every medicine ID at once, locking the rows in ID order to avoid deadlocks
             cur.execute("""
-                UPDATE medicines SET quantity = quantity + %s WHERE medicine_id = %s
-            """, (quantity, medicine_id))
+                WITH staged AS (
+                    SELECT DISTINCT medicine_id FROM purchase_staging
+                ),
+                locked AS (
+                    SELECT medicine_id FROM medicines
+                    WHERE medicine_id IN (SELECT medicine_id FROM staged)
+                    ORDER BY medicine_id
+                    FOR UPDATE
+                )
+                SELECT s.medicine_id
+                FROM staged s
+                LEFT JOIN locked l ON l.medicine_id = s.medicine_id
+                WHERE l.medicine_id IS NULL
+                ORDER BY s.medicine_id
+            """)
+            missing = [row[0] for row in cur.fetchall()]
+            if missing:
+                conn.rollback()
+                logger.error(f"❌ Medicine ID(s) not found: {missing}")
+                if len(missing) == 1:
+                    return None, f"Medicine ID {missing[0]} not found"
+                return None, f"Medicine IDs not found: {', '.join(str(m) for m in missing)}"
 
-            # Log to stock_logs
             cur.execute("""
-                INSERT INTO stock_logs (medicine_id, change_type, quantity_change)
-                VALUES (%s, %s, %s)
-            """, (medicine_id, 'purchase', quantity))
+                WITH purchase AS (
+                    INSERT INTO purchases (user_id, total_amount)
+                    SELECT %s, SUM(quantity * cost_price) FROM purchase_staging
+                    RETURNING purchase_id
+                ),
+                details AS (
+                    INSERT INTO purchase_details (purchase_id, medicine_id, quantity, cost_price)
+                    SELECT p.purchase_id, s.medicine_id, s.quantity, s.cost_price
+                    FROM purchase p CROSS JOIN purchase_staging s
+                ),
+                stock AS (
+                    UPDATE medicines m
+                    SET quantity = m.quantity + t.quantity
+                    FROM (
+                        SELECT medicine_id, SUM(quantity) AS quantity
+                        FROM purchase_staging
+                        GROUP BY medicine_id
+                    ) t
+                    WHERE m.medicine_id = t.medicine_id
+                ),
+                logs AS (
+                    INSERT INTO stock_logs (medicine_id, change_type, quantity_change)
+                    SELECT medicine_id, 'purchase', quantity
+                    FROM purchase_staging
+                    ORDER BY line_no
+                )
+                SELECT purchase_id FROM purchase
+            """, (user_id,))
+            purchase_id = cur.fetchone()[0]
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            if stream.error:
+                logger.error(f"❌ {stream.error}")
+                return None, stream.error
+            logger.error(f"❌ Error adding purchase: {e}")
+            return None, f"Error adding purchase: {str(e)}"
+    seconds = time.perf_counter() - started
+    report = {
+        'purchase_id': purchase_id,
+        'lines': stream.count,
+        'seconds': seconds,
+        'lines_per_sec': stream.count / seconds if seconds > 0 else float(stream.count),
+    }
+    logger.info(f"✅ Purchase processed successfully, purchase_id: {purchase_id} "
+                f"({stream.count} lines in {seconds:.2f}s, {report['lines_per_sec']:.0f} lines/s)")
+    return report, None
 
-        conn.commit()
-        conn.close()
-        logger.info(f"✅ Purchase processed successfully, purchase_id: {purchase_id}")
-        return True, None
-    except Exception as e:
-        conn.rollback()
-        conn.close()
-        logger.error(f"❌ Error adding purchase: {e}")
-        return False, f"Error adding purchase: {str(e)}"
\ No newline at end of file
+def iter_invoice_csv(path):
+    """Yield invoice lines from a CSV file with medicine_id, quantity and cost_price columns."""
+    with open(path, newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            yield {key.strip().lower(): (value or "").strip() for key, value in row.items() if key}
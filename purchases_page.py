@@ -1,21 +1,17 @@
 import tkinter as tk
-from tkinter import messagebox, ttk
+from tkinter import filedialog, messagebox, ttk
 import logging
-from purchases import fetch_medicines, fetch_user_id, add_purchase
-from connections import create_connection
-
-# Configure logging (ideally in main script, included here for completeness)
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(levelname)s - %(message)s",
-    handlers=[
-        logging.FileHandler("pharmacy_app.log"),
-        logging.StreamHandler()
-    ]
-)
+from purchases import fetch_medicines, add_purchase, receive_purchase, iter_invoice_csv
+from connections import get_connection
+from medicine_search import search_settings, picker_search
+from db_executor import TaskRunner, busy_indicator
+from medicine_index import MedicineIndex
+from medicine_picker import MedicinePicker
+
+# Logging is configured by logging_setup (through connections)
 logger = logging.getLogger(__name__)
 
-def show_purchases_page(username):
+def show_purchases_page(session):
     window = tk.Toplevel()
     window.title("Purchases")
     window.geometry("800x600")
@@ -29,39 +25,32 @@ def show_purchases_page(username):
     main_frame = tk.Frame(window, bg="#d7f7f2")
     main_frame.pack(pady=10, fill=tk.BOTH, expand=True)
 
-    # Fetch connection
-    conn, error = create_connection()
-    if error or not conn:
-        error_label.config(text=error or "Failed to connect to database. Please check database settings.")
-        logger.error(f"❌ Failed to connect to database: {error or 'No connection'}")
+    # The session already knows the user; only re-check that it is still current
+    allowed, error = session.authorize("purchases")
+    if not allowed:
+        error_label.config(text=error)
         main_frame.pack_forget()
         tk.Button(window, text="Close", command=window.destroy, bg="#FF4444", fg="white", font=("Helvetica", 14)).pack(pady=10)
         return
+    user_id = session.user_id
 
-    # Fetch user_id
-    user_id, error = fetch_user_id(conn, username)
-    if error or not user_id:
-        error_label.config(text=error or "Failed to fetch user details. Please verify username.")
-        logger.error(f"❌ Failed to fetch user_id for {username}: {error or 'No user_id'}")
-        main_frame.pack_forget()
-        tk.Button(window, text="Close", command=lambda: (conn.close(), window.destroy()), bg="#FF4444", fg="white", font=("Helvetica", 14)).pack(pady=10)
-        return
+    search = search_settings()
 
-    # Fetch medicines
-    medicines, error = fetch_medicines(conn)
-    if error or not medicines:
-        error_label.config(text=error or "No medicines available. Please add medicines to the database.")
-        logger.error(f"❌ Failed to fetch medicines: {error or 'No medicines'}")
-        main_frame.pack_forget()
-        tk.Button(window, text="Close", command=lambda: (conn.close(), window.destroy()), bg="#FF4444", fg="white", font=("Helvetica", 14)).pack(pady=10)
-        return
+    # Database calls run in the background; the status label is packed below the cart
+    status_label = tk.Label(main_frame, text="", bg="#d7f7f2", font=("Helvetica", 10))
+    runner = TaskRunner(window, on_busy=busy_indicator(window, status_label))
 
     # Medicine selection
-    medicine_dict = {f"{m[1]} (ID: {m[0]})": m for m in medicines}  # Format: "Name (ID: ID)"
-    tk.Label(main_frame, text="Select Medicine:", bg="#d7f7f2", font=("Helvetica", 14)).pack(pady=5)
-    medicine_var = tk.StringVar()
-    medicine_combobox = ttk.Combobox(main_frame, textvariable=medicine_var, values=list(medicine_dict.keys()), font=("Helvetica", 13), state="readonly")
-    medicine_combobox.pack(pady=5)
+    tk.Label(main_frame, text="Search Medicine (name or ID):", bg="#d7f7f2", font=("Helvetica", 14)).pack(pady=5)
+    if search['mode'] == 'server':
+        # Query the database per keystroke, off the Tk thread
+        medicine_picker = MedicinePicker(main_frame, picker_search, limit=search['limit'], delay_ms=search['delay_ms'],
+                                         runner=runner, bg="#d7f7f2")
+    else:
+        # Searchable once the catalog has loaded in the background (see medicines_loaded)
+        medicine_picker = MedicinePicker(main_frame, MedicineIndex([]).search, limit=search['limit'], bg="#d7f7f2")
+        medicine_picker.entry.config(state="disabled")
+    medicine_picker.pack(pady=5)
 
     # Quantity
     tk.Label(main_frame, text="Quantity:", bg="#d7f7f2", font=("Helvetica", 14)).pack(pady=5)
@@ -92,10 +81,18 @@ def show_purchases_page(username):
     # Cart to store items
     cart_items = []
 
+    # Shows while a purchase or a search is in flight
+    status_label.pack()
+
+    def show_unexpected_error(e, handler):
+        error_label.config(text=f"Unexpected error: {str(e)}")
+        messagebox.showerror("Error", f"Unexpected error: {str(e)}")
+        logger.error(f"❌ Unexpected error in {handler}: {e}", exc_info=e)
+
     def add_to_cart():
         try:
-            selected = medicine_var.get()
-            if not selected:
+            medicine = medicine_picker.get()
+            if not medicine:
                 error_label.config(text="Please select a medicine.")
                 messagebox.showerror("Error", "Please select a medicine.")
                 logger.warning("❌ No medicine selected for cart")
@@ -120,13 +117,6 @@ def show_purchases_page(username):
                 logger.warning("❌ Invalid quantity or cost price: non-numeric")
                 return
 
-            medicine = medicine_dict.get(selected)
-            if not medicine:
-                error_label.config(text="Selected medicine not found.")
-                messagebox.showerror("Error", "Selected medicine not found.")
-                logger.error(f"❌ Selected medicine not found: {selected}")
-                return
-
             medicine_id, name, _, _ = medicine
             for item in cart_items:
                 if item["medicine_id"] == medicine_id:
@@ -147,7 +137,7 @@ def show_purchases_page(username):
             error_label.config(text="")
             messagebox.showinfo("Success", f"Added {name} to cart.")
             logger.info(f"✅ Added {name} (ID: {medicine_id}, Quantity: {quantity}) to cart")
-            medicine_var.set("")
+            medicine_picker.clear()
             qty_entry.delete(0, tk.END)
             cost_price_entry.delete(0, tk.END)
         except Exception as e:
@@ -174,6 +164,19 @@ def show_purchases_page(username):
             messagebox.showerror("Error", f"Unexpected error: {str(e)}")
             logger.error(f"❌ Unexpected error in remove_from_cart: {e}", exc_info=True)
 
+    def purchase_finished(result):
+        success, error = result
+        if success:
+            error_label.config(text="")
+            messagebox.showinfo("Success", "✅ Purchase processed successfully.")
+            logger.info("✅ Purchase confirmed successfully")
+            cart_items.clear()
+            tree.delete(*tree.get_children())
+        else:
+            error_label.config(text=error or "Failed to process purchase.")
+            messagebox.showerror("Error", error or "Failed to process purchase.")
+            logger.error(f"❌ Failed to confirm purchase: {error}")
+
     def confirm_purchase():
         try:
             if not cart_items:
@@ -181,32 +184,95 @@ def show_purchases_page(username):
                 messagebox.showerror("Error", "Cart is empty.")
                 logger.warning("❌ Attempted to confirm empty cart")
                 return
-            success, error = add_purchase(user_id, cart_items)
-            if success:
-                error_label.config(text="")
-                messagebox.showinfo("Success", "✅ Purchase processed successfully.")
-                logger.info("✅ Purchase confirmed successfully")
-                cart_items.clear()
-                tree.delete(*tree.get_children())
-            else:
-                error_label.config(text=error or "Failed to process purchase.")
-                messagebox.showerror("Error", error or "Failed to process purchase.")
-                logger.error(f"❌ Failed to confirm purchase: {error}")
+            # Hand the worker a snapshot so cart edits while it runs cannot change the purchase
+            items = [dict(item) for item in cart_items]
+            if not runner.submit(add_purchase, user_id, items, callback=purchase_finished, key="purchase", coalesce=False,
+                                 on_error=lambda e: show_unexpected_error(e, "confirm_purchase")):
+                error_label.config(text="A purchase is already being processed.")
         except Exception as e:
             error_label.config(text=f"Unexpected error: {str(e)}")
             messagebox.showerror("Error", f"Unexpected error: {str(e)}")
             logger.error(f"❌ Unexpected error in confirm_purchase: {e}", exc_info=True)
 
+    def invoice_received(path, result):
+        report, error = result
+        if error:
+            error_label.config(text=error)
+            messagebox.showerror("Error", error)
+            logger.error(f"❌ Failed to receive invoice {path}: {error}")
+            return
+        error_label.config(text="")
+        messagebox.showinfo("Success", f"✅ Received {report['lines']} lines "
+                                       f"({report['lines_per_sec']:.0f} lines/s).")
+        logger.info(f"✅ Received invoice {path} as purchase ID {report['purchase_id']}")
+
+    def invoice_failed(path, e):
+        if isinstance(e, OSError):
+            error_label.config(text=f"Could not read invoice: {str(e)}")
+            messagebox.showerror("Error", f"Could not read invoice: {str(e)}")
+            logger.error(f"❌ Could not read invoice {path}: {e}")
+        else:
+            show_unexpected_error(e, "receive_invoice")
+
+    def receive_invoice():
+        """Receive a whole supplier invoice from a CSV file (medicine_id, quantity, cost_price)."""
+        try:
+            path = filedialog.askopenfilename(parent=window, title="Select supplier invoice", filetypes=[("CSV files", "*.csv")])
+            if not path:
+                return
+            # The file is read by the worker thread as it streams into COPY
+            if not runner.submit(receive_purchase, user_id, iter_invoice_csv(path), key="purchase", coalesce=False,
+                                 callback=lambda result: invoice_received(path, result),
+                                 on_error=lambda e: invoice_failed(path, e)):
+                error_label.config(text="A purchase is already being processed.")
+        except Exception as e:
+            error_label.config(text=f"Unexpected error: {str(e)}")
+            messagebox.showerror("Error", f"Unexpected error: {str(e)}")
+            logger.error(f"❌ Unexpected error in receive_invoice: {e}", exc_info=True)
+
     # Buttons
     tk.Button(main_frame, text="Add to Cart", command=add_to_cart, bg="#4CAF50", fg="white", font=("Helvetica", 14)).pack(pady=5)
     tk.Button(main_frame, text="Remove Selected", command=remove_from_cart, bg="#FF4444", fg="white", font=("Helvetica", 14)).pack(pady=5)
     tk.Button(main_frame, text="Confirm Purchase", command=confirm_purchase, bg="#2196F3", fg="white", font=("Helvetica", 14)).pack(pady=5)
+    tk.Button(main_frame, text="Receive Invoice (CSV)", command=receive_invoice, bg="#FF9800", fg="white", font=("Helvetica", 14)).pack(pady=5)
 
     def on_close():
-        conn.close()
+        runner.close()
         window.destroy()
         logger.info("✅ Purchases page closed")
     window.protocol("WM_DELETE_WINDOW", on_close)
 
+    def load_medicines():
+        """Runs on a worker thread: the medicine list for the picker. Returns (medicines, error)."""
+        with get_connection() as (conn, error):
+            if error or not conn:
+                return [], error or "Failed to connect to database. Please check database settings."
+            medicines, error = fetch_medicines(conn)
+        if not error and not medicines:
+            error = "No medicines available. Please add medicines to the database."
+        return medicines, error
+
+    def show_load_error(error):
+        error_label.config(text=error)
+        main_frame.pack_forget()
+        tk.Button(window, text="Close", command=on_close, bg="#FF4444", fg="white", font=("Helvetica", 14)).pack(pady=10)
+
+    def medicines_loaded(result):
+        medicines, error = result
+        if error:
+            logger.error(f"❌ Failed to fetch medicines: {error}")
+            show_load_error(error)
+            return
+        medicine_picker.set_search(MedicineIndex(medicines).search)
+        medicine_picker.entry.config(state="normal")
+        medicine_picker.entry.focus_set()
+
+    def medicines_failed(e):
+        logger.error(f"❌ Unexpected error loading medicines: {e}", exc_info=e)
+        show_load_error(f"Unexpected error: {str(e)}")
+
+    if search['mode'] != 'server':
+        runner.submit(load_medicines, callback=medicines_loaded, on_error=medicines_failed, key="medicines")
+
     logger.info("✅ Purchases page opened")
     window.mainloop()
\ No newline at end of file
@@ -0,0 +1,180 @@
+import functools
+import logging
+import threading
+import time
+from collections import OrderedDict
+from config import config
+
+logger = logging.getLogger(__name__)
+
+# Defaults used when database.ini has no [cache] section
+CACHE_DEFAULTS = {
+    'enabled': True,
+    'max_entries': 256,
+    'ttl': 30.0,
+}
+
+class QueryCache:
+    """
+    Thread-safe LRU cache with a time-to-live for results of data functions.
+    Keys are tuples whose first element is a namespace (e.g. 'medicines'), so all
+    entries derived from one table can be invalidated together after a write.
+    """
+
+    def __init__(self, max_entries=256, ttl=30.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._generations = {}  # namespace -> number of invalidations so far
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'expired': 0, 'evictions': 0, 'invalidations': 0}
+
+    def get(self, key):
+        """Return (hit, value); expired entries count as misses."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats['misses'] += 1
+                return False, None
+            expires_at, value = entry
+            if expires_at <= now:
+                del self._entries[key]
+                self._stats['expired'] += 1
+                self._stats['misses'] += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self._stats['hits'] += 1
+            return True, value
+
+    def generation(self, namespace):
+        """How many times namespace has been invalidated; read it before running the query."""
+        with self._lock:
+            return self._generations.get(namespace, 0)
+
+    def set(self, key, value, ttl=None, generation=None):
+        """
+        Store value under key. With generation (from generation() before the query ran), the
+        value is dropped if the key's namespace was invalidated since, as it may predate the write.
+        Returns whether the value was stored.
+        """
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            if generation is not None and self._generations.get(key[0], 0) != generation:
+                return False
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats['evictions'] += 1
+            return True
+
+    def invalidate(self, *namespaces):
+        """Drop every entry belonging to the given namespaces."""
+        with self._lock:
+            for namespace in namespaces:
+                self._generations[namespace] = self._generations.get(namespace, 0) + 1
+            stale = [key for key in self._entries if key[0] in namespaces]
+            for key in stale:
+                del self._entries[key]
+            self._stats['invalidations'] += len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Snapshot of hit/miss counters and current size."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['entries'] = len(self._entries)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+        return stats
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def _cache_settings():
+    """Read the optional [cache] section of database.ini, falling back to CACHE_DEFAULTS."""
+    settings = dict(CACHE_DEFAULTS)
+    try:
+        params = config(section='cache')
+    except Exception:
+        params = {}
+    for key, default in CACHE_DEFAULTS.items():
+        if key in params:
+            if isinstance(default, bool):
+                settings[key] = params[key].strip().lower() in ('1', 'true', 'yes', 'on')
+            else:
+                settings[key] = type(default)(params[key])
+    return settings
+
+def get_cache():
+    """Return the process-wide query cache, or None when caching is disabled."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                settings = _cache_settings()
+                if not settings['enabled']:
+                    logger.info("✅ Query cache disabled")
+                    _cache = False
+                else:
+                    _cache = QueryCache(settings['max_entries'], settings['ttl'])
+    return _cache or None
+
+def cached(namespace, ttl=None, key=None):
+    """
+    Decorator for data functions returning (result, error): successful results are cached
+    under namespace until they expire or a write to the namespace invalidates them.
+    key: optional callable mapping the call's arguments to the cache key (for example to
+    ignore a connection argument); defaults to all arguments.
+    """
+    def decorator(func):
+        name = f"{func.__module__}.{func.__qualname__}"
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            cache = get_cache()
+            if cache is None:
+                return func(*args, **kwargs)
+            call_key = key(*args, **kwargs) if key else (args, tuple(sorted(kwargs.items())))
+            cache_key = (namespace, name, call_key)
+            hit, result = cache.get(cache_key)
+            if not hit:
+                # A write that invalidates the namespace while func runs makes its result stale
+                generation = cache.generation(namespace)
+                result = func(*args, **kwargs)
+                if result[1] is not None:
+                    return result
+                cache.set(cache_key, result, ttl, generation)
+            value, error = result
+            # Hand out copies so callers cannot modify the cached rows list
+            return (list(value) if isinstance(value, list) else value), error
+
+        wrapper.uncached = func
+        return wrapper
+    return decorator
+
+def invalidates(*namespaces):
+    """Decorator for write functions: drop the given namespaces after every call."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            try:
+                return func(*args, **kwargs)
+            finally:
+                invalidate(*namespaces)
+        return wrapper
+    return decorator
+
+def invalidate(*namespaces):
+    """Drop cached entries for the given namespaces."""
+    cache = get_cache()
+    if cache is not None:
+        cache.invalidate(*namespaces)
+
+def cache_stats():
+    """Counters for the process-wide cache, or an empty dict when disabled or unused."""
+    return _cache.stats() if _cache else {}
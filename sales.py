@@ -1,108 +1,207 @@
-#import logging
-from connections import create_connection
+import logging
+from connections import get_connection
+from metrics import measured
+from query_cache import cached, invalidates
 
-# Use existing logger (configured in dashboard.py)
-#logger = logging.getLogger(__name__)
+# Logging goes through logging_setup's background queue; set sales = WARNING under
+# [log_levels] in database.ini to drop the per-sale lines
+logger = logging.getLogger(__name__)
 
+@measured()
+@cached("medicines")
 def fetch_medicines():
     """Fetch all medicines for the Combobox. Returns (medicines, error)."""
-    conn, error = create_connection()
-    if error or not conn:
-        #logger.error(f"❌ Failed to fetch medicines: {error or 'No connection'}")
-        return [], error or "No database connection"
-    try:
-        cur = conn.cursor()
-        cur.execute("SELECT medicine_id, name, price, quantity FROM medicines")
-        medicines = cur.fetchall()
-        #logger.info("✅ Successfully fetched medicines")
-        return medicines, None
-    except Exception as e:
-        #logger.error(f"❌ Error fetching medicines: {e}")
-        return [], f"Error fetching medicines: {str(e)}"
-    finally:
-        conn.close()
+    with get_connection() as (conn, error):
+        if error or not conn:
+            logger.error(f"❌ Failed to fetch medicines: {error or 'No connection'}")
+            return [], error or "No database connection"
+        try:
+            cur = conn.cursor()
+            cur.execute("SELECT medicine_id, name, price, quantity FROM medicines WHERE retired_at IS NULL")
+            medicines = cur.fetchall()
+            logger.debug("✅ Successfully fetched medicines")
+            return medicines, None
+        except Exception as e:
+            logger.error(f"❌ Error fetching medicines: {e}")
+            return [], f"Error fetching medicines: {str(e)}"
 
+@measured()
 def fetch_user_id(username):
     """Fetch user_id from username. Returns (user_id, error)."""
-    conn, error = create_connection()
-    if error or not conn:
-        #logger.error(f"❌ Failed to fetch user_id: {error or 'No connection'}")
-        return None, error or "No database connection"
-    try:
-        cur = conn.cursor()
-        cur.execute("SELECT user_id FROM users WHERE username = %s", (username,))
-        result = cur.fetchone()
-        if result:
-            #logger.info(f"✅ Fetched user_id for {username}")
-            return result[0], None
-        #logger.warning(f"❌ No user found for username {username}")
-        return None, f"No user found for username {username}"
-    except Exception as e:
-        #logger.error(f"❌ Error fetching user_id: {e}")
-        return None, f"Error fetching user_id: {str(e)}"
-    finally:
-        conn.close()
+    with get_connection() as (conn, error):
+        if error or not conn:
+            logger.error(f"❌ Failed to fetch user_id: {error or 'No connection'}")
+            return None, error or "No database connection"
+        try:
+            cur = conn.cursor()
+            cur.execute("SELECT user_id FROM users WHERE username = %s", (username,))
+            result = cur.fetchone()
+            if result:
+                logger.debug(f"✅ Fetched user_id for {username}")
+                return result[0], None
+            logger.warning(f"❌ No user found for username {username}")
+            return None, f"No user found for username {username}"
+        except Exception as e:
+            logger.error(f"❌ Error fetching user_id: {e}")
+            return None, f"Error fetching user_id: {str(e)}"
 
-def add_sale(customer_id, user_id, cart_items):
-    """Process a sale with multiple items, update stock, and log to stock_logs. Returns (success, error)."""
+@measured()
+def customer_exists(customer_id):
+    """Check that a customer ID exists. Returns (exists, error)."""
+    with get_connection() as (conn, error):
+        if error or not conn:
+            logger.error(f"❌ Failed to validate customer ID: {error or 'No connection'}")
+            return False, error or "No database connection"
+        try:
+            cur = conn.cursor()
+            cur.execute("SELECT 1 FROM customers WHERE customer_id = %s", (customer_id,))
+            return cur.fetchone() is not None, None
+        except Exception as e:
+            logger.error(f"❌ Error validating customer ID {customer_id}: {e}")
+            return False, f"Error validating customer ID: {str(e)}"
+
+# One statement for the whole cart: the guarded UPDATE decrements stock only where
+# quantity >= requested, and the header, detail and ledger rows are written only
+# if every medicine was decremented. Duplicate cart lines are summed per medicine
+# (validate_cart makes sure they share a price), since sales_details has one row each.
+CHECKOUT_SQL = """
+    WITH cart AS (
+        SELECT *
+        FROM UNNEST(%(medicine_ids)s::int[], %(quantities)s::int[], %(prices)s::numeric[])
+            AS c(medicine_id, quantity, price)
+    ),
+    wanted AS (
+        SELECT medicine_id, SUM(quantity) AS quantity, MIN(price) AS price
+        FROM cart
+        GROUP BY medicine_id
+    ),
+    -- Lock rows in medicine_id order, as every other stock writer does, so two carts
+    -- sharing medicines queue behind each other instead of deadlocking
+    locked AS (
+        SELECT medicine_id FROM medicines
+        WHERE medicine_id IN (SELECT medicine_id FROM wanted)
+        ORDER BY medicine_id
+        FOR UPDATE
+    ),
+    updated AS (
+        UPDATE medicines m
+        SET quantity = m.quantity - w.quantity
+        FROM wanted w
+        JOIN locked l ON l.medicine_id = w.medicine_id
+        WHERE m.medicine_id = w.medicine_id AND m.quantity >= w.quantity
+        RETURNING m.medicine_id
+    ),
+    complete AS (
+        SELECT (SELECT COUNT(*) FROM updated) = (SELECT COUNT(*) FROM wanted) AS ok
+    ),
+    sale AS (
+        INSERT INTO sales (customer_id, user_id, total_amount)
+        SELECT %(customer_id)s, %(user_id)s, %(total_amount)s
+        FROM complete
+        WHERE ok
+        RETURNING sale_id
+    ),
+    details AS (
+        INSERT INTO sales_details (sale_id, medicine_id, quantity, selling_price)
+        SELECT s.sale_id, w.medicine_id, w.quantity, w.price
+        FROM sale s CROSS JOIN wanted w
+    ),
+    logs AS (
+        INSERT INTO stock_logs (medicine_id, change_type, quantity_change)
+        SELECT w.medicine_id, 'sale', -w.quantity
+        FROM sale s CROSS JOIN wanted w
+        ORDER BY w.medicine_id
+    )
+    SELECT (SELECT sale_id FROM sale), w.medicine_id, w.quantity, u.medicine_id IS NOT NULL
+    FROM wanted w
+    LEFT JOIN updated u ON u.medicine_id = w.medicine_id
+    ORDER BY w.medicine_id
+"""
+
+def validate_cart(cart_items):
+    """Check cart line structure and totals. Returns an error string or None."""
     if not cart_items:
-        #logger.error("❌ Cart is empty")
-        return False, "Cart is empty"
+        logger.error("❌ Cart is empty")
+        return "Cart is empty"
     required_keys = {'medicine_id', 'quantity', 'price', 'total_price'}
+    prices = {}
     for item in cart_items:
         if not all(key in item for key in required_keys):
-            #logger.error(f"❌ Invalid cart item structure: {item}")
-            return False, "Invalid cart item structure"
+            logger.error(f"❌ Invalid cart item structure: {item}")
+            return "Invalid cart item structure"
         if item['quantity'] <= 0:
-            #logger.error(f"❌ Invalid quantity in cart item: {item['quantity']}")
-            return False, f"Invalid quantity for medicine ID {item['medicine_id']}"
+            logger.error(f"❌ Invalid quantity in cart item: {item['quantity']}")
+            return f"Invalid quantity for medicine ID {item['medicine_id']}"
         if item['total_price'] != item['quantity'] * item['price']:
-            #logger.error(f"❌ Inconsistent total_price in cart item: {item}")
-            return False, f"Inconsistent total_price for medicine ID {item['medicine_id']}"
-    conn, error = create_connection()
-    if error or not conn:
-        #logger.error(f"❌ Failed to add sale: {error or 'No connection'}")
-        return False, error or "Failed to connect to database"
-    try:
-        cur = conn.cursor()
-        total_amount = sum(item['total_price'] for item in cart_items)
-        cur.execute("""
-            INSERT INTO sales (customer_id, user_id, total_amount)
-            VALUES (%s, %s, %s) RETURNING sale_id
-        """, (customer_id, user_id, total_amount))
-        sale_id = cur.fetchone()[0]
-        for item in cart_items:
-            medicine_id = item['medicine_id']
-            quantity = item['quantity']
-            price = item['price']
-            cur.execute("SELECT quantity FROM medicines WHERE medicine_id = %s", (medicine_id,))
-            result = cur.fetchone()
-            if not result:
-                conn.rollback()
-                #logger.error(f"❌ Medicine ID {medicine_id} not found")
-                return False, f"Medicine ID {medicine_id} not found"
-            stock = result[0]
-            if quantity > stock:
-                conn.rollback()
-                #logger.error(f"❌ Not enough stock for medicine ID {medicine_id}: requested {quantity}, available {stock}")
-                return False, f"Not enough stock for medicine ID {medicine_id}"
-            cur.execute("""
-                INSERT INTO sales_details (sale_id, medicine_id, quantity, selling_price)
-                VALUES (%s, %s, %s, %s)
-            """, (sale_id, medicine_id, quantity, price))
-            cur.execute("""
-                UPDATE medicines SET quantity = quantity - %s WHERE medicine_id = %s
-            """, (quantity, medicine_id))
-            cur.execute("""
-                INSERT INTO stock_logs (medicine_id, change_type, quantity_change)
-                VALUES (%s, %s, %s)
-            """, (medicine_id, 'sale', -quantity))
-        conn.commit()
-        #logger.info(f"✅ Sale processed successfully, sale_id: {sale_id}")
-        return True, None
-    except Exception as e:
-        conn.rollback()
-        #logger.error(f"❌ Error adding sale: {e}")
-        return False, f"Error adding sale: {str(e)}"
-    finally:
-        conn.close()
\ No newline at end of file
+            logger.error(f"❌ Inconsistent total_price in cart item: {item}")
+            return f"Inconsistent total_price for medicine ID {item['medicine_id']}"
+        # Repeated lines for one medicine are merged into one sales_details row, so they must agree on price
+        if prices.setdefault(item['medicine_id'], item['price']) != item['price']:
+            logger.error(f"❌ Conflicting prices for medicine ID {item['medicine_id']} in cart")
+            return f"Conflicting prices for medicine ID {item['medicine_id']}"
+    return None
+
+@measured()
+@invalidates("medicines")
+def checkout(customer_id, user_id, cart_items):
+    """
+    Process a whole cart in a single statement, whatever its size.
+    Returns (report, error): report is {'sale_id': id or None, 'shortfalls': [...]}, where
+    each shortfall is {'medicine_id', 'requested', 'available'} and available is None for
+    unknown medicines. Nothing is written unless every line can be fulfilled.
+    """
+    error = validate_cart(cart_items)
+    if error:
+        return None, error
+    with get_connection() as (conn, error):
+        if error or not conn:
+            logger.error(f"❌ Failed to add sale: {error or 'No connection'}")
+            return None, error or "Failed to connect to database"
+        try:
+            cur = conn.cursor()
+            cur.execute(CHECKOUT_SQL, {
+                'medicine_ids': [item['medicine_id'] for item in cart_items],
+                'quantities': [item['quantity'] for item in cart_items],
+                'prices': [item['price'] for item in cart_items],
+                'customer_id': customer_id,
+                'user_id': user_id,
+                'total_amount': sum(item['total_price'] for item in cart_items),
+            })
+            rows = cur.fetchall()
+            sale_id = rows[0][0]
+            if sale_id is not None:
+                conn.commit()
+                logger.debug(f"✅ Sale processed successfully, sale_id: {sale_id}")
+                return {'sale_id': sale_id, 'shortfalls': []}, None
+            conn.rollback()
+            # Report stock as it is now, not as the statement's snapshot saw it
+            short = {medicine_id: requested for _, medicine_id, requested, ok in rows if not ok}
+            cur.execute("SELECT medicine_id, quantity FROM medicines WHERE medicine_id = ANY(%s)", (list(short),))
+            available = dict(cur.fetchall())
+            conn.rollback()
+            shortfalls = [
+                {'medicine_id': medicine_id, 'requested': requested, 'available': available.get(medicine_id)}
+                for medicine_id, requested in short.items()
+            ]
+            logger.error(f"❌ Not enough stock for sale: {shortfalls}")
+            return {'sale_id': None, 'shortfalls': shortfalls}, None
+        except Exception as e:
+            conn.rollback()
+            logger.error(f"❌ Error adding sale: {e}")
+            return None, f"Error adding sale: {str(e)}"
+
+def add_sale(customer_id, user_id, cart_items):
+    """Process a sale with multiple items, update stock, and log to stock_logs. Returns (success, error)."""
+    report, error = checkout(customer_id, user_id, cart_items)
+    if error:
+        return False, error
+    if report['shortfalls']:
+        messages = []
+        for line in report['shortfalls']:
+            if line['available'] is None:
+                messages.append(f"Medicine ID {line['medicine_id']} not found")
+            else:
+                messages.append(f"Not enough stock for medicine ID {line['medicine_id']} "
+                                f"(requested {line['requested']}, available {line['available']})")
+        return False, "; ".join(messages)
+    return True, None
@@ -1,13 +1,16 @@
 import tkinter as tk
 from tkinter import messagebox, ttk
 import logging
-from sales import fetch_medicines, fetch_user_id, add_sale
-from connections import create_connection
+from sales import fetch_medicines, customer_exists, add_sale
+from medicine_search import search_settings, picker_search
+from db_executor import TaskRunner, busy_indicator
+from medicine_index import MedicineIndex
+from medicine_picker import MedicinePicker
 
-# Use existing logger (configured in dashboard.py)
+# Logging is configured by logging_setup (through connections)
 logger = logging.getLogger(__name__)
 
-def show_sales_page(username):
+def show_sales_page(session):
     window = tk.Toplevel()
     window.title("Sales")
     window.geometry("800x600")
@@ -22,19 +25,22 @@ def show_sales_page(username):
     customer_entry = tk.Entry(window, font=("Helvetica", 13))
     customer_entry.pack(pady=5)
 
+    # Database calls run in the background; the status label is packed below the cart
+    status_label = tk.Label(window, text="", bg="#d7f7f2", font=("Helvetica", 10))
+    runner = TaskRunner(window, on_busy=busy_indicator(window, status_label))
+
     # Medicine selection
-    tk.Label(window, text="Select Medicine:", bg="#d7f7f2", font=("Helvetica", 14)).pack(pady=5)
-    medicines, error = fetch_medicines()
-    if error:
-        error_label.config(text=error)
-        messagebox.showerror("Error", error)
-        window.destroy()
-        logger.error(f"❌ Failed to fetch medicines: {error}")
-        return
-    medicine_dict = {f"{m[1]} (ID: {m[0]})": m for m in medicines}  # Format: "Name (ID: ID)"
-    medicine_var = tk.StringVar()
-    medicine_combobox = ttk.Combobox(window, textvariable=medicine_var, values=list(medicine_dict.keys()), font=("Helvetica", 13), state="readonly")
-    medicine_combobox.pack(pady=5)
+    tk.Label(window, text="Search Medicine (name or ID):", bg="#d7f7f2", font=("Helvetica", 14)).pack(pady=5)
+    search = search_settings()
+    if search['mode'] == 'server':
+        # Query the database per keystroke, off the Tk thread, instead of holding the whole catalog
+        medicine_picker = MedicinePicker(window, picker_search, limit=search['limit'], delay_ms=search['delay_ms'],
+                                         runner=runner, bg="#d7f7f2")
+    else:
+        # Searchable once the catalog has loaded in the background (see medicines_loaded)
+        medicine_picker = MedicinePicker(window, MedicineIndex([]).search, limit=search['limit'], bg="#d7f7f2")
+        medicine_picker.entry.config(state="disabled")
+    medicine_picker.pack(pady=5)
 
     # Quantity
     tk.Label(window, text="Quantity:", bg="#d7f7f2", font=("Helvetica", 14)).pack(pady=5)
@@ -60,10 +66,13 @@ def show_sales_page(username):
     # Cart to store items
     cart_items = []
 
+    # Shows while checkout or a search is in flight
+    status_label.pack()
+
     def add_to_cart():
         try:
-            selected = medicine_var.get()
-            if not selected:
+            medicine = medicine_picker.get()
+            if not medicine:
                 error_label.config(text="Please select a medicine.")
                 messagebox.showerror("Error", "Please select a medicine.")
                 logger.warning("❌ No medicine selected for cart")
@@ -74,7 +83,6 @@ def show_sales_page(username):
                 messagebox.showerror("Error", "Quantity must be positive.")
                 logger.warning("❌ Invalid quantity entered: non-positive")
                 return
-            medicine = medicine_dict[selected]
             medicine_id, name, price, stock = medicine
             if quantity > stock:
                 error_label.config(text=f"Not enough stock for {name}. Available: {stock}")
@@ -97,7 +105,7 @@ def show_sales_page(username):
             })
             tree.insert("", "end", values=(medicine_id, name, quantity, f"${price:.2f}", f"${total_price:.2f}"))
             logger.info(f"✅ Added {name} (ID: {medicine_id}, Quantity: {quantity}) to cart")
-            medicine_var.set("")
+            medicine_picker.clear()
             qty_entry.delete(0, tk.END)
             error_label.config(text="")
         except ValueError:
@@ -123,6 +131,43 @@ def show_sales_page(username):
             error_label.config(text=f"Unexpected error: {str(e)}")
             logger.error(f"❌ Unexpected error in remove_from_cart: {e}", exc_info=True)
 
+    def process_sale(customer_id, items):
+        """Runs on a worker thread: validate the customer, then check out. Returns (success, error)."""
+        if customer_id:
+            exists, error = customer_exists(customer_id)
+            if error:
+                return False, error
+            if not exists:
+                return False, "Invalid customer ID."
+        valid, error = session.validate()
+        if not valid:
+            return False, error
+        return add_sale(customer_id, session.user_id, items)
+
+    def sale_finished(result, submitted):
+        success, error = result
+        if success:
+            messagebox.showinfo("Success", "✅ Sale processed successfully.")
+            logger.info("✅ Sale confirmed successfully")
+            # Only the lines that were sold leave the cart; lines added during checkout stay
+            rows = tree.get_children()
+            for index in reversed(range(len(cart_items))):
+                if any(cart_items[index] is item for item in submitted):
+                    cart_items.pop(index)
+                    tree.delete(rows[index])
+            if not cart_items:
+                customer_entry.delete(0, tk.END)
+            error_label.config(text="")
+        else:
+            error_label.config(text=error or "Failed to process sale.")
+            messagebox.showerror("Error", error or "Failed to process sale.")
+            logger.error(f"❌ Failed to confirm sale: {error}")
+
+    def sale_failed(e):
+        error_label.config(text=f"Unexpected error: {str(e)}")
+        messagebox.showerror("Error", f"Unexpected error: {str(e)}")
+        logger.error(f"❌ Unexpected error in confirm_sale: {e}", exc_info=e)
+
     def confirm_sale():
         try:
             if not cart_items:
@@ -132,46 +177,17 @@ def show_sales_page(username):
                 return
             customer_id = customer_entry.get().strip()
             customer_id = int(customer_id) if customer_id else None
-            if customer_id:
-                conn, error = create_connection()
-                if error or not conn:
-                    error_label.config(text=error or "Failed to connect to database.")
-                    messagebox.showerror("Error", error or "Failed to connect to database.")
-                    logger.error(f"❌ Failed to validate customer ID: {error or 'No connection'}")
-                    return
-                try:
-                    cur = conn.cursor()
-                    cur.execute("SELECT customer_id FROM customers WHERE customer_id = %s", (customer_id,))
-                    if not cur.fetchone():
-                        error_label.config(text="Invalid customer ID.")
-                        messagebox.showerror("Error", "Invalid customer ID.")
-                        logger.warning(f"❌ Invalid customer ID: {customer_id}")
-                        return
-                except Exception as e:
-                    error_label.config(text=f"Error validating customer ID: {str(e)}")
-                    messagebox.showerror("Error", f"Error validating customer ID: {str(e)}")
-                    logger.error(f"❌ Error validating customer ID {customer_id}: {e}")
-                    return
-                finally:
-                    conn.close()
-            user_id, error = fetch_user_id(username)
-            if error or not user_id:
-                error_label.config(text=error or "Failed to fetch user details.")
-                messagebox.showerror("Error", error or "Failed to fetch user details.")
-                logger.error(f"❌ Failed to fetch user_id for {username}: {error or 'No user_id'}")
-                return
-            success, error = add_sale(customer_id, user_id, cart_items)
-            if success:
-                messagebox.showinfo("Success", "✅ Sale processed successfully.")
-                logger.info("✅ Sale confirmed successfully")
-                cart_items.clear()
-                tree.delete(*tree.get_children())
-                customer_entry.delete(0, tk.END)
-                error_label.config(text="")
-            else:
-                error_label.config(text=error or "Failed to process sale.")
-                messagebox.showerror("Error", error or "Failed to process sale.")
-                logger.error(f"❌ Failed to confirm sale: {error}")
+            # Hand the worker a snapshot so cart edits during checkout cannot change the sale
+            submitted = list(cart_items)
+            items = [dict(item) for item in submitted]
+            if not runner.submit(process_sale, customer_id, items,
+                                 callback=lambda result: sale_finished(result, submitted), on_error=sale_failed,
+                                 key="checkout", coalesce=False):
+                error_label.config(text="A sale is already being processed.")
+        except ValueError:
+            error_label.config(text="Customer ID must be a number.")
+            messagebox.showerror("Error", "Customer ID must be a number.")
+            logger.warning("❌ Invalid customer ID entered: non-numeric")
         except Exception as e:
             error_label.config(text=f"Unexpected error: {str(e)}")
             messagebox.showerror("Error", f"Unexpected error: {str(e)}")
@@ -183,9 +199,30 @@ def show_sales_page(username):
     tk.Button(window, text="Confirm Sale", command=confirm_sale, bg="#2196F3", fg="white", font=("Helvetica", 14)).pack(pady=5)
 
     def on_close():
+        runner.close()
         window.destroy()
         logger.info("✅ Sales page closed")
     window.protocol("WM_DELETE_WINDOW", on_close)
 
+    def medicines_loaded(result):
+        medicines, error = result
+        if error:
+            error_label.config(text=error)
+            messagebox.showerror("Error", error)
+            logger.error(f"❌ Failed to fetch medicines: {error}")
+            on_close()
+            return
+        medicine_picker.set_search(MedicineIndex(medicines).search)
+        medicine_picker.entry.config(state="normal")
+        medicine_picker.entry.focus_set()
+
+    def medicines_failed(e):
+        messagebox.showerror("Error", f"Unexpected error: {str(e)}")
+        logger.error(f"❌ Unexpected error loading medicines: {e}", exc_info=e)
+        on_close()
+
+    if search['mode'] != 'server':
+        runner.submit(fetch_medicines, callback=medicines_loaded, on_error=medicines_failed, key="medicines")
+
     logger.info("✅ Sales page opened")
     window.mainloop()
\ No newline at end of file
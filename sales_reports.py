@@ -0,0 +1,127 @@
+import argparse
+import logging
+from datetime import date, timedelta
+from connections import get_connection
+
+logger = logging.getLogger(__name__)
+
+def _read(what, sql, params):
+    with get_connection() as (conn, error):
+        if error or not conn:
+            logger.error(f"❌ Failed to fetch {what}: {error or 'No connection'}")
+            return [], error or "No database connection"
+        try:
+            cur = conn.cursor()
+            cur.execute(sql, params)
+            rows = cur.fetchall()
+            logger.info(f"✅ Fetched {what} ({len(rows)} rows)")
+            return rows, None
+        except Exception as e:
+            logger.error(f"❌ Error fetching {what}: {e}")
+            return [], f"Error fetching {what}: {str(e)}"
+
+def daily_sales(start, end):
+    """
+    Totals per day from start to end inclusive, read from the sales_daily rollup.
+    Returns (rows, error): rows are (day, transactions, quantity, revenue).
+    """
+    return _read("daily sales", """
+        SELECT day, SUM(transactions), SUM(quantity), SUM(revenue)
+        FROM sales_daily
+        WHERE day BETWEEN %s AND %s
+        GROUP BY day
+        HAVING SUM(transactions) > 0
+        ORDER BY day
+    """, (start, end))
+
+def sales_by_medicine(start, end, limit=None):
+    """
+    Best sellers by revenue from start to end inclusive.
+    Returns (rows, error): rows are (medicine_id, name, transactions, quantity, revenue).
+    """
+    return _read("sales by medicine", """
+        SELECT t.medicine_id, m.name, t.transactions, t.quantity, t.revenue
+        FROM (
+            SELECT medicine_id, SUM(transactions) AS transactions, SUM(quantity) AS quantity, SUM(revenue) AS revenue
+            FROM sales_daily_medicines
+            WHERE day BETWEEN %s AND %s
+            GROUP BY medicine_id
+            HAVING SUM(transactions) > 0
+            ORDER BY SUM(revenue) DESC, medicine_id
+            LIMIT %s
+        ) t
+        JOIN medicines m ON m.medicine_id = t.medicine_id
+        ORDER BY t.revenue DESC, t.medicine_id
+    """, (start, end, limit))
+
+def sales_by_cashier(start, end):
+    """
+    Sales per cashier from start to end inclusive.
+    Returns (rows, error): rows are (user_id, username, transactions, quantity, revenue);
+    username is None for sales without a cashier.
+    """
+    return _read("sales by cashier", """
+        SELECT t.user_id, u.username, t.transactions, t.quantity, t.revenue
+        FROM (
+            SELECT user_id, SUM(transactions) AS transactions, SUM(quantity) AS quantity, SUM(revenue) AS revenue
+            FROM sales_daily
+            WHERE day BETWEEN %s AND %s
+            GROUP BY user_id
+            HAVING SUM(transactions) > 0
+        ) t
+        LEFT JOIN users u ON u.user_id = t.user_id
+        ORDER BY t.revenue DESC, t.user_id
+    """, (start, end))
+
+def rebuild():
+    """
+    Recompute the rollups from sales and sales_details, e.g. after restoring a backup taken
+    without them. Sales wait while it runs. Returns (success, error).
+    """
+    with get_connection() as (conn, error):
+        if error or not conn:
+            logger.error(f"❌ Failed to rebuild sales rollups: {error or 'No connection'}")
+            return False, error or "No database connection"
+        try:
+            cur = conn.cursor()
+            cur.execute("LOCK TABLE sales_details IN SHARE MODE")
+            cur.execute("TRUNCATE sales_daily, sales_daily_medicines")
+            cur.execute("SELECT sales_daily_backfill(0, COALESCE((SELECT MAX(sale_id) FROM sales), 0))")
+            conn.commit()
+            logger.info("✅ Rebuilt sales rollups")
+            return True, None
+        except Exception as e:
+            conn.rollback()
+            logger.error(f"❌ Error rebuilding sales rollups: {e}")
+            return False, f"Error rebuilding sales rollups: {str(e)}"
+
+def main():
+    parser = argparse.ArgumentParser(description="Sales reports from the daily rollups")
+    commands = parser.add_subparsers(dest='command', required=True)
+    for name in ('daily', 'medicines', 'cashiers'):
+        report = commands.add_parser(name)
+        report.add_argument('--from', dest='start', type=date.fromisoformat, default=date.today() - timedelta(days=30))
+        report.add_argument('--to', dest='end', type=date.fromisoformat, default=date.today())
+        if name == 'medicines':
+            report.add_argument('--limit', type=int, default=20)
+    commands.add_parser('rebuild', help="recompute the rollups from the sales tables")
+    args = parser.parse_args()
+
+    if args.command == 'rebuild':
+        ok, error = rebuild()
+        print(error or "Sales rollups rebuilt")
+        raise SystemExit(0 if ok else 1)
+    if args.command == 'daily':
+        rows, error = daily_sales(args.start, args.end)
+    elif args.command == 'medicines':
+        rows, error = sales_by_medicine(args.start, args.end, args.limit)
+    else:
+        rows, error = sales_by_cashier(args.start, args.end)
+    if error:
+        print(error)
+        raise SystemExit(1)
+    for row in rows:
+        print("  ".join(str(value) for value in row))
+
+if __name__ == "__main__":
+    main()
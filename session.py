@@ -0,0 +1,78 @@
+import logging
+import time
+from connections import get_connection
+
+logger = logging.getLogger(__name__)
+
+# Seconds a session is trusted before validate() checks its version stamp again
+SESSION_MAX_AGE = 60.0
+
+# Pages each role may open; roles not listed here get DEFAULT_PERMISSIONS
+ROLE_PERMISSIONS = {
+    'owner': frozenset({'sales', 'purchases', 'manage_medicines', 'manage_users', 'delete_data', 'reports'}),
+}
+DEFAULT_PERMISSIONS = frozenset({'sales'})
+
+def permissions_for(role):
+    return ROLE_PERMISSIONS.get(role.lower(), DEFAULT_PERMISSIONS)
+
+class Session:
+    """
+    Identity of the logged-in user, created once by login.login() and passed to every page
+    so pages don't look the user up again.
+    version is users.session_version at login; a trigger bumps it whenever the user's name,
+    password or role changes (migrations/003_session_version.sql), which is how validate()
+    detects a stale session with a single primary-key lookup.
+    """
+
+    def __init__(self, user_id, username, role, version):
+        self.user_id = user_id
+        self.username = username
+        self.role = role
+        self.version = version
+        self.permissions = permissions_for(role)
+        self.validated_at = time.monotonic()
+
+    def __repr__(self):
+        return f"Session(user_id={self.user_id}, username={self.username!r}, role={self.role!r})"
+
+    @property
+    def is_owner(self):
+        return self.role.lower() == 'owner'
+
+    def can(self, permission):
+        return permission in self.permissions
+
+    def validate(self, max_age=SESSION_MAX_AGE):
+        """
+        Check that the session still matches the users table. Free when it was checked within
+        max_age seconds; otherwise one indexed lookup. Returns (valid, error).
+        """
+        if time.monotonic() - self.validated_at < max_age:
+            return True, None
+        with get_connection() as (conn, error):
+            if error or not conn:
+                logger.error(f"❌ Failed to validate session: {error or 'No connection'}")
+                return False, error or "No database connection"
+            try:
+                cur = conn.cursor()
+                cur.execute("SELECT session_version FROM users WHERE user_id = %s", (self.user_id,))
+                row = cur.fetchone()
+            except Exception as e:
+                logger.error(f"❌ Error validating session: {e}")
+                return False, f"Error validating session: {str(e)}"
+        if row is None or row[0] != self.version:
+            logger.warning(f"❌ Session for {self.username} is no longer valid")
+            return False, "Your account was changed or removed. Please log in again."
+        self.validated_at = time.monotonic()
+        return True, None
+
+    def authorize(self, permission):
+        """validate() plus a permission check. Returns (allowed, error)."""
+        valid, error = self.validate()
+        if not valid:
+            return False, error
+        if not self.can(permission):
+            logger.error(f"❌ Unauthorized access for {self.username}: role {self.role} lacks {permission}")
+            return False, "Unauthorized access. Owner privileges required."
+        return True, None
@@ -0,0 +1,235 @@
+import atexit
+import logging
+import re
+import sys
+import threading
+import time
+from collections import deque
+import psycopg2.extensions
+from config import config
+
+logger = logging.getLogger(__name__)
+
+# Defaults used when database.ini has no [tracing] section
+TRACING_DEFAULTS = {
+    'enabled': False,  # connections are only traced when this is on; off costs nothing
+    'slow_ms': 100.0,  # statements slower than this are logged as slow
+    'repeat_threshold': 5,  # one statement shape run this often in a transaction is an N+1 pattern
+    'log_transactions': False,  # log a summary line for every transaction, not only flagged ones
+}
+
+# Transaction summaries kept for transactions()
+HISTORY = 200
+
+_SHAPE_CACHE_SIZE = 1024
+
+_COMMENT = re.compile(r"--[^\n]*|/\*.*?\*/", re.S)
+_LITERAL = re.compile(r"'(?:[^']|'')*'|\$\$.*?\$\$|%\(\w+\)s|%s|\b\d+(?:\.\d+)?\b", re.S)
+_LIST = re.compile(r"\?(?:\s*,\s*\?)+")
+_SPACE = re.compile(r"\s+")
+
+_shapes = {}
+_history = deque(maxlen=HISTORY)
+_history_lock = threading.Lock()
+_report_registered = False
+
+def tracing_settings():
+    """Read the optional [tracing] section of database.ini, falling back to TRACING_DEFAULTS."""
+    settings = dict(TRACING_DEFAULTS)
+    try:
+        params = config(section='tracing')
+    except Exception:
+        params = {}
+    for key, default in TRACING_DEFAULTS.items():
+        if key in params:
+            if isinstance(default, bool):
+                settings[key] = str(params[key]).strip().lower() in ('1', 'true', 'yes', 'on')
+            else:
+                settings[key] = type(default)(params[key])
+    return settings
+
+def normalize(sql):
+    """
+    The statement's shape: comments, literals, numbers and placeholders become ?, lists of
+    them collapse to one, and whitespace is squeezed, so a query run in a loop with
+    different values has a single shape.
+    """
+    if isinstance(sql, bytes):
+        sql = sql.decode(errors='replace')
+    elif not isinstance(sql, str):
+        sql = sql.as_string(None) if hasattr(sql, 'as_string') else str(sql)
+    shape = _shapes.get(sql)
+    if shape is None:
+        shape = _SPACE.sub(" ", _LIST.sub("?", _LITERAL.sub("?", _COMMENT.sub(" ", sql)))).strip()
+        if len(_shapes) >= _SHAPE_CACHE_SIZE:
+            _shapes.clear()
+        _shapes[sql] = shape
+    return shape
+
+def _caller():
+    """module.function of the first frame outside this module and psycopg2."""
+    frame = sys._getframe(2)
+    while frame is not None:
+        module = frame.f_globals.get('__name__', '')
+        if module != __name__ and not module.startswith('psycopg2'):
+            return f"{module}.{frame.f_code.co_name}"
+        frame = frame.f_back
+    return "?"
+
+class Transaction:
+    """Statements run between one commit or rollback and the next, grouped by shape."""
+
+    def __init__(self):
+        self.started_at = time.time()
+        self.statements = 0
+        self.seconds = 0.0
+        self.rows = 0
+        self.shapes = {}  # shape -> {'count', 'seconds', 'rows', 'callers': set}
+
+    def record(self, shape, seconds, rows, caller):
+        self.statements += 1
+        self.seconds += seconds
+        self.rows += max(rows, 0)
+        entry = self.shapes.get(shape)
+        if entry is None:
+            entry = self.shapes[shape] = {'count': 0, 'seconds': 0.0, 'rows': 0, 'callers': set()}
+        entry['count'] += 1
+        entry['seconds'] += seconds
+        entry['rows'] += max(rows, 0)
+        entry['callers'].add(caller)
+
+    def summary(self, outcome, threshold):
+        """The report kept by transactions(): totals plus the shapes repeated threshold times or more."""
+        shapes = sorted(self.shapes.items(), key=lambda item: item[1]['seconds'], reverse=True)
+        return {
+            'outcome': outcome,
+            'started_at': self.started_at,
+            'statements': self.statements,
+            'shapes': len(self.shapes),
+            'ms': self.seconds * 1000,
+            'rows': self.rows,
+            'callers': sorted(set().union(*(entry['callers'] for _, entry in shapes))),
+            'top': [{'shape': shape, 'count': entry['count'], 'ms': entry['seconds'] * 1000, 'rows': entry['rows']}
+                    for shape, entry in shapes[:5]],
+            'n_plus_one': [{'shape': shape, 'count': entry['count'], 'ms': entry['seconds'] * 1000,
+                            'callers': sorted(entry['callers'])}
+                           for shape, entry in shapes if entry['count'] >= threshold],
+        }
+
+class TracingCursor(psycopg2.extensions.cursor):
+    """Cursor that times every statement and records it on its TracingConnection."""
+
+    def _traced(self, sql, run):
+        started = time.perf_counter()
+        try:
+            return run()
+        finally:
+            self.connection._record(normalize(sql), time.perf_counter() - started, self.rowcount, _caller())
+
+    def execute(self, query, vars=None):
+        return self._traced(query, lambda: super(TracingCursor, self).execute(query, vars))
+
+    def executemany(self, query, vars_list):
+        return self._traced(query, lambda: super(TracingCursor, self).executemany(query, vars_list))
+
+    def copy_expert(self, sql, file, size=8192):
+        return self._traced(sql, lambda: super(TracingCursor, self).copy_expert(sql, file, size))
+
+class TracingConnection(psycopg2.extensions.connection):
+    """
+    Connection whose cursors are TracingCursors. Pass it as connection_factory to
+    psycopg2.connect; create_connection() does when [tracing] enabled is on. Slow statements
+    are logged as they finish; at commit or rollback the transaction's statements are
+    summarised and N+1 patterns (one shape repeated repeat_threshold times) are logged.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.cursor_factory = TracingCursor
+        settings = tracing_settings()
+        self.slow_seconds = settings['slow_ms'] / 1000
+        self.repeat_threshold = settings['repeat_threshold']
+        self.log_transactions = settings['log_transactions']
+        self.trace = Transaction()
+        _report_at_exit()
+
+    def _record(self, shape, seconds, rows, caller):
+        if seconds >= self.slow_seconds:
+            logger.warning(f"❌ Slow statement ({seconds * 1000:.1f} ms, {rows} rows) in {caller}: {shape[:500]}",
+                           extra={'operation': caller, 'duration_ms': seconds * 1000})
+        if self.autocommit:
+            return  # Every statement is its own transaction; there is nothing to group
+        self.trace.record(shape, seconds, rows, caller)
+
+    def _finish(self, outcome):
+        trace, self.trace = self.trace, Transaction()
+        if not trace.statements:
+            return
+        summary = trace.summary(outcome, self.repeat_threshold)
+        with _history_lock:
+            _history.append(summary)
+        callers = ", ".join(summary['callers'])
+        for pattern in summary['n_plus_one']:
+            logger.warning(f"❌ N+1 pattern: {pattern['count']} runs ({pattern['ms']:.1f} ms) of one statement "
+                           f"in a transaction from {', '.join(pattern['callers'])}: {pattern['shape'][:300]}")
+        if self.log_transactions:
+            logger.info(f"✅ Transaction {outcome}: {summary['statements']} statements, {summary['shapes']} shapes, "
+                        f"{summary['rows']} rows, {summary['ms']:.1f} ms in {callers}",
+                        extra={'operation': callers, 'duration_ms': summary['ms']})
+
+    def commit(self):
+        try:
+            super().commit()
+        finally:
+            self._finish('commit')
+
+    def rollback(self):
+        try:
+            super().rollback()
+        finally:
+            self._finish('rollback')
+
+def transactions():
+    """Summaries of the most recent traced transactions, oldest first."""
+    with _history_lock:
+        return list(_history)
+
+def report(limit=20):
+    """
+    Aggregate the recent transaction summaries by calling function, worst total time first.
+    Returns rows of (callers, transactions, statements, ms, n_plus_one_shapes).
+    """
+    totals = {}
+    for summary in transactions():
+        key = ", ".join(summary['callers'])
+        row = totals.setdefault(key, [0, 0, 0.0, set()])
+        row[0] += 1
+        row[1] += summary['statements']
+        row[2] += summary['ms']
+        row[3].update(pattern['shape'] for pattern in summary['n_plus_one'])
+    rows = [(key, count, statements, ms, len(shapes)) for key, (count, statements, ms, shapes) in totals.items()]
+    return sorted(rows, key=lambda row: row[3], reverse=True)[:limit]
+
+def describe(rows):
+    """Human-readable report(), one line per calling function."""
+    if not rows:
+        return "No traced transactions"
+    lines = [f"{'transactions':>12} {'statements':>10} {'total ms':>10} {'N+1':>4}  callers"]
+    lines += [f"{count:12d} {statements:10d} {ms:10.1f} {n_plus_one:4d}  {callers}"
+              for callers, count, statements, ms, n_plus_one in rows]
+    return "\n".join(lines)
+
+def log_report(limit=20):
+    """Log report() for this process; registered to run at exit once a traced connection exists."""
+    rows = report(limit)
+    if rows:
+        logger.info(f"✅ SQL tracing report for the last {len(transactions())} transactions:\n{describe(rows)}")
+
+def _report_at_exit():
+    global _report_registered
+    with _history_lock:
+        if _report_registered:
+            return
+        _report_registered = True
+    # Registered after setup_logging(), so it runs before the log queue is flushed and closed
+    atexit.register(log_report)
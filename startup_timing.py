@@ -0,0 +1,141 @@
+import os
+import sys
+import threading
+import time
+
+# Set PHARMACY_IMPORT_TIMING=1 (or pass --import-timing) to time startup
+ENV_FLAG = 'PHARMACY_IMPORT_TIMING'
+
+# Modules listed in the report, slowest cumulative first
+REPORT_LIMIT = 25
+
+_finder = None
+_started = None
+_records = []  # (name, self_seconds, cumulative_seconds, depth, thread name), in completion order
+_marks = []  # (label, seconds since enable())
+_local = threading.local()
+
+class _TimedLoader:
+    """
+    Stands in for a module's loader during its import and records the load time, minus the
+    imports it triggers. The timing frame opens at create_module because extension modules
+    (e.g. psycopg2._psycopg) load, and may import others, there. Only this import's spec
+    points at the proxy, so loaders shared between modules (e.g. a zipimporter) are never
+    modified; everything else is delegated to the real loader, which is put back once the
+    module has run.
+    """
+
+    def __init__(self, name, loader, find_seconds):
+        self._name = name
+        self._loader = loader
+        self._find_seconds = find_seconds
+        self._children = None
+        self._started = None
+
+    def __getattr__(self, attr):
+        return getattr(self._loader, attr)
+
+    def _begin(self):
+        stack = _local.__dict__.setdefault('stack', [])
+        self._children = [0.0]
+        self._started = time.perf_counter()
+        stack.append(self._children)
+        return stack
+
+    def _end(self, stack):
+        elapsed = time.perf_counter() - self._started + self._find_seconds
+        self._started = None
+        stack.pop()
+        if stack:
+            stack[-1][0] += elapsed
+        _records.append((self._name, elapsed - self._children[0], elapsed, len(stack), threading.current_thread().name))
+
+    def create_module(self, spec):
+        stack = self._begin()
+        try:
+            create_module = getattr(self._loader, 'create_module', None)
+            return create_module(spec) if create_module is not None else None
+        except BaseException:
+            self._end(stack)
+            raise
+
+    def exec_module(self, module):
+        stack = _local.stack if self._started is not None else self._begin()
+        try:
+            self._loader.exec_module(module)
+        finally:
+            self._end(stack)
+            if getattr(module, '__loader__', None) is self:
+                module.__loader__ = self._loader
+            spec = getattr(module, '__spec__', None)
+            if spec is not None and spec.loader is self:
+                spec.loader = self._loader
+
+class _TimingFinder:
+    """
+    Meta path finder that asks the real finders for each module's spec, then times the
+    module's execution like python -X importtime: self time and cumulative time including
+    the imports it triggers.
+    """
+
+    def find_spec(self, name, path, target=None):
+        started = time.perf_counter()
+        for finder in sys.meta_path:
+            find = getattr(finder, 'find_spec', None)
+            if finder is self or find is None:
+                continue
+            spec = find(name, path, target)
+            if spec is not None:
+                break
+        else:
+            return None
+        loader = spec.loader
+        # Built-in and frozen modules share one loader class; leave those alone
+        if loader is not None and not isinstance(loader, type) and hasattr(loader, 'exec_module'):
+            spec.loader = _TimedLoader(name, loader, time.perf_counter() - started)
+        return spec
+
+def enable():
+    """Start timing imports; everything imported before this call is not in the report."""
+    global _finder, _started
+    if _finder is None:
+        _started = time.perf_counter()
+        _finder = _TimingFinder()
+        sys.meta_path.insert(0, _finder)
+
+def enable_from_environment():
+    """enable() if PHARMACY_IMPORT_TIMING is set or --import-timing was passed. Returns whether timing is on."""
+    if '--import-timing' in sys.argv:
+        sys.argv.remove('--import-timing')
+        os.environ[ENV_FLAG] = '1'
+    if os.environ.get(ENV_FLAG, '') not in ('', '0'):
+        enable()
+    return enabled()
+
+def enabled():
+    return _finder is not None
+
+def mark(label):
+    """Record a startup milestone (e.g. the login window appearing) relative to enable()."""
+    if _finder is not None:
+        _marks.append((label, time.perf_counter() - _started))
+
+def report(limit=REPORT_LIMIT):
+    """
+    Milestones, then the slowest imports by cumulative time in the -X importtime layout
+    (self and cumulative in microseconds, nesting shown by indentation).
+    """
+    lines = [f"startup: {seconds * 1000:8.1f} ms  {label}" for label, seconds in _marks]
+    total = sum(self_seconds for _, self_seconds, _, _, _ in _records)
+    lines.append(f"startup: {total * 1000:8.1f} ms  importing {len(_records)} modules")
+    lines.append("import time: self [us] | cumulative | imported package")
+    slowest = sorted(_records, key=lambda record: record[2], reverse=True)[:limit]
+    for name, self_seconds, cumulative, depth, thread in slowest:
+        where = "" if thread == 'MainThread' else f"  [{thread}]"
+        lines.append(f"import time: {self_seconds * 1e6:9.0f} | {cumulative * 1e6:10.0f} | {'  ' * depth}{name}{where}")
+    return "\n".join(lines)
+
+def print_report(limit=REPORT_LIMIT):
+    """Write report() to stderr, where python -X importtime writes too."""
+    if _finder is not None:
+        print(report(limit), file=sys.stderr, flush=True)
@@ -0,0 +1,189 @@
+import argparse
+import logging
+from datetime import datetime
+from connections import get_connection
+from config import config
+
+logger = logging.getLogger(__name__)
+
+# Defaults used when database.ini has no [snapshots] section
+SNAPSHOT_DEFAULTS = {
+    'interval_hours': 24.0,  # ensure_snapshot() takes a new one once the newest is this old
+}
+
+# Arbitrary constant shared by every terminal, so only one of them snapshots at a time
+SNAPSHOT_LOCK_ID = 48151624
+
+def snapshot_settings():
+    """Read the optional [snapshots] section of database.ini, falling back to SNAPSHOT_DEFAULTS."""
+    settings = dict(SNAPSHOT_DEFAULTS)
+    try:
+        params = config(section='snapshots')
+    except Exception:
+        params = {}
+    for key, default in SNAPSHOT_DEFAULTS.items():
+        if key in params:
+            settings[key] = type(default)(params[key])
+    return settings
+
+def _take(cur):
+    # SHARE mode waits for in-flight stock writers to commit and holds new ones back until
+    # we commit. Every writer updates medicines and logs in one statement, so the copy and
+    # last_log_id agree exactly
+    cur.execute("LOCK TABLE stock_logs IN SHARE MODE")
+    cur.execute("""
+        INSERT INTO stock_snapshots (taken_at, last_log_id)
+        SELECT clock_timestamp()::timestamp, COALESCE(MAX(log_id), 0) FROM stock_logs
+        RETURNING snapshot_id, taken_at, last_log_id
+    """)
+    snapshot_id, taken_at, last_log_id = cur.fetchone()
+    cur.execute("""
+        INSERT INTO stock_snapshot_items (snapshot_id, medicine_id, quantity)
+        SELECT %s, medicine_id, quantity FROM medicines
+    """, (snapshot_id,))
+    return {'snapshot_id': snapshot_id, 'taken_at': taken_at, 'last_log_id': last_log_id, 'medicines': cur.rowcount}
+
+def take_snapshot(max_age_hours=None):
+    """
+    Copy every medicine's stock into a new snapshot. Sales wait for the duration of the copy.
+    With max_age_hours, does nothing if the newest snapshot is younger than that.
+    Returns (snapshot, error): snapshot is {'snapshot_id', 'taken_at', 'last_log_id', 'medicines'},
+    or None when no snapshot was needed.
+    """
+    with get_connection() as (conn, error):
+        if error or not conn:
+            logger.error(f"❌ Failed to take stock snapshot: {error or 'No connection'}")
+            return None, error or "No database connection"
+        try:
+            cur = conn.cursor()
+            cur.execute("SELECT pg_advisory_xact_lock(%s)", (SNAPSHOT_LOCK_ID,))
+            if max_age_hours is not None:
+                cur.execute("""
+                    SELECT COALESCE(MAX(taken_at) > localtimestamp - make_interval(secs => %s), false)
+                    FROM stock_snapshots
+                """, (max_age_hours * 3600,))
+                if cur.fetchone()[0]:
+                    conn.rollback()
+                    return None, None
+            snapshot = _take(cur)
+            conn.commit()
+            logger.info(f"✅ Stock snapshot {snapshot['snapshot_id']} taken ({snapshot['medicines']} medicines)")
+            return snapshot, None
+        except Exception as e:
+            conn.rollback()
+            logger.error(f"❌ Error taking stock snapshot: {e}")
+            return None, f"Error taking stock snapshot: {str(e)}"
+
+def ensure_snapshot():
+    """Take a snapshot if the newest is older than the configured interval. Returns (snapshot or None, error)."""
+    return take_snapshot(snapshot_settings()['interval_hours'])
+
+def stock_as_of(timestamp, medicine_ids=None):
+    """
+    Stock per medicine at a point in time, rebuilt from the snapshot nearest to it (or from
+    current stock, if that is nearer) plus the stock_logs written in between.
+    Lists every current medicine, or those in medicine_ids; ones added after timestamp show 0.
+    Returns ({medicine_id: quantity}, error).
+    """
+    if isinstance(timestamp, str):
+        try:
+            timestamp = datetime.fromisoformat(timestamp)
+        except ValueError:
+            return {}, f"Invalid timestamp: {timestamp}"
+    ids = None if medicine_ids is None else [int(m) for m in medicine_ids]
+    with get_connection() as (conn, error):
+        if error or not conn:
+            logger.error(f"❌ Failed to rebuild stock: {error or 'No connection'}")
+            return {}, error or "No database connection"
+        try:
+            cur = conn.cursor()
+            # One snapshot of the database for the anchor and the ledger
+            cur.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ")
+            cur.execute("SELECT localtimestamp, (SELECT MAX(range_end) FROM stock_log_archives)")
+            now, horizon = cur.fetchone()
+            if horizon and timestamp < horizon:
+                conn.rollback()
+                return {}, f"Stock logs before {horizon:%Y-%m-%d} are archived (see stock_partitions.py)"
+            cur.execute("""
+                (SELECT snapshot_id, taken_at, last_log_id FROM stock_snapshots
+                 WHERE taken_at <= %(ts)s ORDER BY taken_at DESC LIMIT 1)
+                UNION ALL
+                (SELECT snapshot_id, taken_at, last_log_id FROM stock_snapshots
+                 WHERE taken_at > %(ts)s ORDER BY taken_at LIMIT 1)
+            """, {'ts': timestamp})
+            # Current stock is an anchor too: at now, covering every visible log row
+            anchors = cur.fetchall() + [(None, now, None)]
+            snapshot_id, taken_at, last_log_id = min(anchors, key=lambda a: abs(a[1] - timestamp))
+            params = {'ts': timestamp, 'ids': ids, 'snapshot_id': snapshot_id, 'last_log_id': last_log_id}
+            if snapshot_id is None:
+                base = "SELECT medicine_id, quantity FROM medicines"
+            else:
+                base = "SELECT medicine_id, quantity FROM stock_snapshot_items WHERE snapshot_id = %(snapshot_id)s"
+            if snapshot_id is None and taken_at <= timestamp:
+                sign, replay = 1, "false"  # A future timestamp: current stock is the answer
+            elif taken_at <= timestamp:
+                # Forward: add what was logged after the anchor, up to the timestamp
+                sign, replay = 1, "log_id > %(last_log_id)s AND created_at <= %(ts)s"
+            else:
+                # Backward: undo what was logged after the timestamp, up to the anchor
+                sign, replay = -1, "created_at > %(ts)s" + ("" if last_log_id is None else " AND log_id <= %(last_log_id)s")
+            cur.execute(f"""
+                WITH base AS (
+                    SELECT * FROM ({base}) b
+                    WHERE %(ids)s::int[] IS NULL OR medicine_id = ANY(%(ids)s::int[])
+                ),
+                delta AS (
+                    SELECT medicine_id, SUM(quantity_change) AS quantity
+                    FROM stock_logs
+                    WHERE {replay}
+                      AND (%(ids)s::int[] IS NULL OR medicine_id = ANY(%(ids)s::int[]))
+                    GROUP BY medicine_id
+                )
+                SELECT m.medicine_id, COALESCE(b.quantity, 0) + {sign} * COALESCE(d.quantity, 0)
+                FROM medicines m
+                LEFT JOIN base b ON b.medicine_id = m.medicine_id
+                LEFT JOIN delta d ON d.medicine_id = m.medicine_id
+                WHERE %(ids)s::int[] IS NULL OR m.medicine_id = ANY(%(ids)s::int[])
+                ORDER BY 1
+            """, params)
+            stock = dict(cur.fetchall())
+            conn.rollback()
+            logger.info(f"✅ Rebuilt stock as of {timestamp} from "
+                        f"{'current stock' if snapshot_id is None else f'snapshot {snapshot_id}'}")
+            return stock, None
+        except Exception as e:
+            conn.rollback()
+            logger.error(f"❌ Error rebuilding stock: {e}")
+            return {}, f"Error rebuilding stock: {str(e)}"
+
+def main():
+    parser = argparse.ArgumentParser(description="Stock snapshots and point-in-time stock")
+    commands = parser.add_subparsers(dest='command', required=True)
+    snap = commands.add_parser('snapshot', help="take a stock snapshot (e.g. nightly from cron)")
+    snap.add_argument('--if-older-than', type=float, metavar='HOURS', help="skip if a newer snapshot exists")
+    as_of = commands.add_parser('as-of', help="print stock at a point in time")
+    as_of.add_argument('timestamp', help="e.g. 2025-03-31T23:59:59")
+    as_of.add_argument('medicine_ids', nargs='*', type=int)
+    args = parser.parse_args()
+
+    if args.command == 'snapshot':
+        snapshot, error = take_snapshot(args.if_older_than)
+        if error:
+            print(error)
+            raise SystemExit(1)
+        if snapshot:
+            print(f"snapshot {snapshot['snapshot_id']}: {snapshot['medicines']} medicines, "
+                  f"log id {snapshot['last_log_id']}, {snapshot['taken_at']:%Y-%m-%d %H:%M:%S}")
+        else:
+            print("A recent snapshot already exists")
+    else:
+        stock, error = stock_as_of(args.timestamp, args.medicine_ids or None)
+        if error:
+            print(error)
+            raise SystemExit(1)
+        for medicine_id, quantity in stock.items():
+            print(f"{medicine_id:>8} {quantity:>10}")
+        print(f"{len(stock)} medicines, {sum(stock.values())} units")
+
+if __name__ == "__main__":
+    main()
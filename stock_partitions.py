@@ -0,0 +1,213 @@
+import argparse
+import gzip
+import logging
+import os
+import re
+from datetime import date, datetime
+from connections import get_connection
+from config import config
+from stock_history import take_snapshot
+
+logger = logging.getLogger(__name__)
+
+# Defaults used when database.ini has no [partitions] section
+PARTITION_DEFAULTS = {
+    'months_ahead': 3,  # empty monthly partitions kept ready beyond the current month
+    'retention_months': 24,  # full months kept online before archive_partitions() exports them
+    'archive_dir': 'archive',  # relative paths are resolved against the application directory
+}
+
+_BOUNDS = re.compile(r"FROM \('([^']+)'\) TO \('([^']+)'\)")
+
+def partition_settings():
+    """Read the optional [partitions] section of database.ini, falling back to PARTITION_DEFAULTS."""
+    settings = dict(PARTITION_DEFAULTS)
+    try:
+        params = config(section='partitions')
+    except Exception:
+        params = {}
+    for key, default in PARTITION_DEFAULTS.items():
+        if key in params:
+            settings[key] = type(default)(params[key])
+    return settings
+
+def _add_months(day, months):
+    index = day.year * 12 + day.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+def _month_start(day):
+    return date(day.year, day.month, 1)
+
+def ensure_partitions(months_ahead=None, since=None):
+    """
+    Create the monthly stock_logs partitions from since (default: this month) through
+    months_ahead months from now. Rows that fell into the default partition move into theirs.
+    Returns (created, error): created lists the partition names added by this call.
+    """
+    if months_ahead is None:
+        months_ahead = partition_settings()['months_ahead']
+    first = _month_start(since or date.today())
+    last = _add_months(_month_start(date.today()), months_ahead)
+    created = []
+    with get_connection() as (conn, error):
+        if error or not conn:
+            logger.error(f"❌ Failed to create stock_logs partitions: {error or 'No connection'}")
+            return [], error or "No database connection"
+        try:
+            cur = conn.cursor()
+            month = first
+            while month <= last:
+                cur.execute("SELECT create_stock_log_partition(%s)", (month,))
+                if cur.fetchone()[0]:
+                    created.append(f"stock_logs_{month:%Y_%m}")
+                conn.commit()
+                month = _add_months(month, 1)
+            if created:
+                logger.info(f"✅ Created stock_logs partitions: {', '.join(created)}")
+            return created, None
+        except Exception as e:
+            conn.rollback()
+            logger.error(f"❌ Error creating stock_logs partitions: {e}")
+            return created, f"Error creating stock_logs partitions: {str(e)}"
+
+def _partitions(cur):
+    """[(name, range_start, range_end)] of the monthly partitions, oldest first."""
+    cur.execute("""
+        SELECT c.relname, pg_get_expr(c.relpartbound, c.oid)
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = 'stock_logs'::regclass
+    """)
+    partitions = []
+    for name, bound in cur.fetchall():
+        match = _BOUNDS.search(bound)
+        if match:  # The default partition has no bounds
+            partitions.append((name, datetime.fromisoformat(match.group(1)), datetime.fromisoformat(match.group(2))))
+    return sorted(partitions, key=lambda p: p[1])
+
+def list_partitions():
+    """
+    Returns (rows, error): rows are (name, range_start, range_end, estimated_rows, bytes),
+    oldest first, with the default partition last (its range is None).
+    """
+    with get_connection() as (conn, error):
+        if error or not conn:
+            logger.error(f"❌ Failed to list stock_logs partitions: {error or 'No connection'}")
+            return [], error or "No database connection"
+        try:
+            cur = conn.cursor()
+            bounds = {name: (start, end) for name, start, end in _partitions(cur)}
+            cur.execute("""
+                SELECT c.relname, GREATEST(c.reltuples, 0)::bigint, pg_total_relation_size(c.oid)
+                FROM pg_inherits i
+                JOIN pg_class c ON c.oid = i.inhrelid
+                WHERE i.inhparent = 'stock_logs'::regclass
+            """)
+            rows = [(name, *bounds.get(name, (None, None)), estimate, size) for name, estimate, size in cur.fetchall()]
+            rows.sort(key=lambda r: (r[1] is None, r[1] or datetime.min))
+            return rows, None
+        except Exception as e:
+            logger.error(f"❌ Error listing stock_logs partitions: {e}")
+            return [], f"Error listing stock_logs partitions: {str(e)}"
+
+def _archive_path(directory, name):
+    if not os.path.isabs(directory):
+        directory = os.path.join(os.path.dirname(os.path.abspath(__file__)), directory)
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, f"{name}.csv.gz")
+
+def archive_partitions(retention_months=None, directory=None):
+    """
+    Export each stock_logs partition older than retention_months full months to a gzipped CSV,
+    then detach and drop it. A stock snapshot covering its rows is taken first if none exists,
+    so stock_as_of() keeps working for every time after the archived months.
+    Returns (archived, error): archived lists {'partition', 'rows', 'path'} dicts.
+    """
+    settings = partition_settings()
+    if retention_months is None:
+        retention_months = settings['retention_months']
+    directory = directory or settings['archive_dir']
+    cutoff = datetime.combine(_add_months(_month_start(date.today()), -retention_months), datetime.min.time())
+    archived = []
+    with get_connection() as (conn, error):
+        if error or not conn:
+            logger.error(f"❌ Failed to archive stock_logs: {error or 'No connection'}")
+            return [], error or "No database connection"
+        try:
+            cur = conn.cursor()
+            expired = [p for p in _partitions(cur) if p[2] <= cutoff]
+            conn.commit()
+            for name, range_start, range_end in expired:
+                cur.execute(f'SELECT COUNT(*), MAX(log_id) FROM "{name}"')
+                rows, max_log_id = cur.fetchone()
+                cur.execute("SELECT EXISTS (SELECT 1 FROM stock_snapshots WHERE last_log_id >= %s)", (max_log_id or 0,))
+                covered = cur.fetchone()[0]
+                conn.commit()
+                if not covered:
+                    snapshot, error = take_snapshot()
+                    if error:
+                        return archived, error
+                # Write to a temporary name first, so a file under the final name is always complete
+                path = _archive_path(directory, name)
+                with gzip.open(path + '.partial', 'wb') as f:
+                    cur.copy_expert(f"""
+                        COPY (SELECT log_id, medicine_id, change_type, quantity_change, created_at
+                              FROM "{name}" ORDER BY log_id) TO STDOUT WITH (FORMAT csv, HEADER)
+                    """, f)
+                conn.commit()
+                os.replace(path + '.partial', path)
+                cur.execute(f'ALTER TABLE stock_logs DETACH PARTITION "{name}"')
+                # Forward replays from older snapshots would need the rows being dropped
+                cur.execute("DELETE FROM stock_snapshots WHERE last_log_id < %s", (max_log_id or 0,))
+                cur.execute("""
+                    INSERT INTO stock_log_archives (partition_name, range_start, range_end, rows, max_log_id, path)
+                    VALUES (%s, %s, %s, %s, %s, %s)
+                """, (name, range_start, range_end, rows, max_log_id, path))
+                cur.execute(f'DROP TABLE "{name}"')
+                conn.commit()
+                archived.append({'partition': name, 'rows': rows, 'path': path})
+                logger.info(f"✅ Archived {name} ({rows} rows) to {path}")
+            return archived, None
+        except Exception as e:
+            conn.rollback()
+            logger.error(f"❌ Error archiving stock_logs: {e}")
+            return archived, f"Error archiving stock_logs: {str(e)}"
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the monthly stock_logs partitions")
+    commands = parser.add_subparsers(dest='command', required=True)
+    ensure = commands.add_parser('ensure', help="create upcoming partitions")
+    ensure.add_argument('--months-ahead', type=int)
+    commands.add_parser('list', help="list partitions with their size")
+    archive = commands.add_parser('archive', help="export and drop partitions past the retention period")
+    archive.add_argument('--retention-months', type=int)
+    archive.add_argument('--dir', help="directory for the .csv.gz files")
+    args = parser.parse_args()
+
+    if args.command == 'ensure':
+        created, error = ensure_partitions(args.months_ahead)
+        for name in created:
+            print(f"created {name}")
+        if error:
+            print(error)
+            raise SystemExit(1)
+    elif args.command == 'list':
+        rows, error = list_partitions()
+        if error:
+            print(error)
+            raise SystemExit(1)
+        for name, range_start, range_end, estimate, size in rows:
+            span = f"{range_start:%Y-%m-%d} .. {range_end:%Y-%m-%d}" if range_start else "default"
+            print(f"{name:<24} {span:<24} ~{estimate:>10} rows {size / 1048576:>9.1f} MiB")
+    else:
+        archived, error = archive_partitions(args.retention_months, args.dir)
+        for entry in archived:
+            print(f"archived {entry['partition']}: {entry['rows']} rows -> {entry['path']}")
+        if error:
+            print(error)
+            raise SystemExit(1)
+        if not archived:
+            print("Nothing to archive")
+
+if __name__ == "__main__":
+    main()